@@ -0,0 +1,191 @@
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Iterable, AsyncIterator, Callable, Tuple
+
+from auto_data import AutoSells, City, AutoMarket, Auto, BulkInsertResult, PriceStats
+
+
+class AsyncAutoSells:
+    """Asyncio counterpart of AbstractAutoSells on top of an AutoSells instance.
+
+    Anything that touches SQLite runs on a bounded thread pool, at most
+    max_in_flight calls at a time, so the event loop never blocks on the
+    database. Index lookups on an in-memory catalog run directly on the
+    loop. Cancelling a call that is already running interrupts its SQL.
+    """
+
+    def __init__(self, auto_sells: Optional[AutoSells] = None, max_workers: int = 8,
+                 max_in_flight: Optional[int] = None):
+        self.auto_sells = auto_sells if auto_sells is not None else AutoSells()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="autosells")
+        self._slots = asyncio.Semaphore(max_in_flight or max_workers * 4)
+
+    @classmethod
+    async def open(cls, *args, max_workers: int = 8, max_in_flight: Optional[int] = None, **kwargs):
+        """Builds the AutoSells off the loop, since loading the catalog blocks."""
+        auto_sells = await asyncio.to_thread(AutoSells, *args, **kwargs)
+        return cls(auto_sells, max_workers=max_workers, max_in_flight=max_in_flight)
+
+    async def _run_blocking(self, func: Callable, *args, **kwargs):
+        """Runs func on the executor; cancellation interrupts the worker's SQL statement.
+
+        The call holds its slot until the worker is done with it, cancelled or not.
+        """
+        loop = asyncio.get_running_loop()
+        lock = threading.Lock()
+        running = []  # the worker thread's pooled connection, only while func runs
+
+        def call():
+            conn = self.auto_sells.conn
+            with lock:
+                running.append(conn)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with lock:
+                    running.clear()
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(self._slots.release)
+            except RuntimeError:
+                pass  # the loop is closed, and its semaphore with it
+
+        await self._slots.acquire()
+        try:
+            future = self._executor.submit(call)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # A queued call simply never starts; a running one is stopped at its next SQLite step.
+            # Once it has returned, the worker's connection belongs to the next call
+            with lock:
+                if running:
+                    running[0].interrupt()
+            raise
+
+    async def _run_lookup(self, func: Callable, *args, **kwargs):
+        """Runs an in-memory lookup on the loop unless it would block."""
+        if not self.auto_sells.lazy and self.auto_sells._lock.acquire(blocking=False):
+            # A writer holding the catalog lock may be inside a long transaction, so only
+            # stay on the loop when the lock is free
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.auto_sells._lock.release()
+        return await self._run_blocking(func, *args, **kwargs)
+
+    async def add_city(self, city: City):
+        return await self._run_blocking(self.auto_sells.add_city, city)
+
+    async def add_automarket(self, automarket: AutoMarket):
+        return await self._run_blocking(self.auto_sells.add_automarket, automarket)
+
+    async def add_auto(self, auto: Auto):
+        return await self._run_blocking(self.auto_sells.add_auto, auto)
+
+    async def add_cities_bulk(self, cities: Iterable[City]) -> BulkInsertResult:
+        return await self._run_blocking(self.auto_sells.add_cities_bulk, cities)
+
+    async def add_automarkets_bulk(self, automarkets: Iterable[AutoMarket]) -> BulkInsertResult:
+        return await self._run_blocking(self.auto_sells.add_automarkets_bulk, automarkets)
+
+    async def add_autos_bulk(self, autos: Iterable[Auto]) -> BulkInsertResult:
+        return await self._run_blocking(self.auto_sells.add_autos_bulk, autos)
+
+    async def get_auto(self, auto_id: int) -> Optional[Auto]:
+        return await self._run_lookup(self.auto_sells.get_auto, auto_id)
+
+    async def find_autos_by_city(self, city_name: str) -> List[Auto]:
+        return await self._run_lookup(self.auto_sells.find_autos_by_city, city_name)
+
+    async def find_autos_by_price_range(self, min_price: float, max_price: float) -> List[Auto]:
+        return await self._run_lookup(self.auto_sells.find_autos_by_price_range, min_price, max_price)
+
+    async def find_cheapest_autos(self, count: int) -> List[Auto]:
+        return await self._run_lookup(self.auto_sells.find_cheapest_autos, count)
+
+    async def find_most_expensive_autos(self, count: int) -> List[Auto]:
+        return await self._run_lookup(self.auto_sells.find_most_expensive_autos, count)
+
+    async def find_autos_by_automarket(self, automarket_name: str) -> List[Auto]:
+        return await self._run_lookup(self.auto_sells.find_autos_by_automarket, automarket_name)
+
+    async def find_autos_by_year(self, year: int) -> List[Auto]:
+        return await self._run_lookup(self.auto_sells.find_autos_by_year, year)
+
+    async def search_names(self, kind: str, text: str, mode: str = "prefix", limit: int = 10) -> List[str]:
+        return await self._run_lookup(self.auto_sells.search_names, kind, text, mode, limit)
+
+    async def price_stats(self, by: str, key: int) -> PriceStats:
+        return await self._run_lookup(self.auto_sells.price_stats, by, key)
+
+    async def price_stats_by(self, by: str) -> Dict[int, PriceStats]:
+        # One entry per group, tens of thousands for automarkets
+        return await self._run_blocking(self.auto_sells.price_stats_by, by)
+
+    async def top_autos(self, by: str, key: int, count: int = AutoSells.TOP_N,
+                        most_expensive: bool = False) -> List[Auto]:
+        return await self._run_lookup(self.auto_sells.top_autos, by, key, count, most_expensive)
+
+    async def similar_autos(self, auto_id: int, count: Optional[int] = AutoSells.SIMILAR_COUNT,
+                            radius: Optional[float] = None, same_city: bool = False) -> List[Auto]:
+        return await self._run_lookup(self.auto_sells.similar_autos, auto_id, count, radius, same_city)
+
+    async def query(self, city: Optional[str] = None, automarket: Optional[str] = None,
+                    price: Optional[Tuple[Optional[float], Optional[float]]] = None,
+                    years: Optional[Tuple[int, int]] = None, order_by: Optional[str] = None,
+                    limit: Optional[int] = None) -> List[Auto]:
+        # A full column scan, too long to hold the loop on a big catalog
+        return await self._run_blocking(self.auto_sells.query, city=city, automarket=automarket, price=price,
+                                        years=years, order_by=order_by, limit=limit)
+
+    async def _iter_pages(self, fetch_page: Callable, pk_column: str, after_pk: Optional[int],
+                          page_size: int) -> AsyncIterator:
+        while True:
+            page = await self._run_blocking(fetch_page, after_pk, page_size)
+            for item in page:
+                yield item
+            if len(page) < page_size:
+                return
+            after_pk = getattr(page[-1], pk_column)
+
+    def iter_autos(self, after_pk: Optional[int] = None,
+                   page_size: int = AutoSells.PAGE_SIZE) -> AsyncIterator[Auto]:
+        return self._iter_pages(self.auto_sells.page_autos, "pk_auto", after_pk, page_size)
+
+    def iter_automarkets(self, after_pk: Optional[int] = None,
+                         page_size: int = AutoSells.PAGE_SIZE) -> AsyncIterator[AutoMarket]:
+        return self._iter_pages(self.auto_sells.page_automarkets, "pk_automarket", after_pk, page_size)
+
+    def iter_cities(self, after_pk: Optional[int] = None,
+                    page_size: int = AutoSells.PAGE_SIZE) -> AsyncIterator[City]:
+        return self._iter_pages(self.auto_sells.page_cities, "pk_city", after_pk, page_size)
+
+    async def list_all_autos(self) -> List[str]:
+        return await self._run_blocking(self.auto_sells.list_all_autos)
+
+    async def list_all_automarkets(self) -> List[str]:
+        return await self._run_blocking(self.auto_sells.list_all_automarkets)
+
+    async def list_all_cities(self) -> List[str]:
+        return await self._run_blocking(self.auto_sells.list_all_cities)
+
+    async def close(self):
+        """Stops the executor; queued calls are cancelled, running ones finish."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def __str__(self):
+        return f"AsyncAutoSells({self.auto_sells.db_path}, lazy={self.auto_sells.lazy})"
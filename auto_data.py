@@ -1,546 +1,3552 @@
-
-import sqlite3
-from datetime import date
-import os
-from dataclasses import dataclass
-from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
-
-# Custom Exceptions
-class BaseError(Exception):
-    """Base class for custom exceptions."""
-    pass
-
-class DatabaseError(BaseError):
-    """Exception raised for database-related errors."""
-    pass
-
-class InvalidInputError(BaseError):
-    """Exception raised for invalid input."""
-    pass
-
-class DataNotFoundError(BaseError):
-    """Exception raised when data is not found."""
-    pass
-
-
-@dataclass
-class City:
-    pk_city: int
-    name: str
-
-    def __str__(self):
-        return f"City(pk_city={self.pk_city}, name='{self.name}')"
-
-    def __eq__(self, other):
-        if isinstance(other, City):
-            return self.pk_city == other.pk_city and self.name == other.name
-        return False
-
-
-@dataclass
-class AutoMarket:
-    pk_automarket: int
-    name: str
-    fk_city: int
-
-    def __str__(self):
-        return f"AutoMarket(pk_automarket={self.pk_automarket}, name='{self.name}', fk_city={self.fk_city})"
-
-    def __eq__(self, other):
-        if isinstance(other, AutoMarket):
-            return (self.pk_automarket == other.pk_automarket and
-                    self.name == other.name and
-                    self.fk_city == other.fk_city)
-        return False
-
-
-@dataclass
-class Auto:
-    pk_auto: int
-    name: str
-    fk_automarket: int
-    price: float
-    year_of_release: date
-
-    def __str__(self):
-        return f"{self.pk_auto}. {self.name}, Автосалон - {self.fk_automarket}, {self.price}, {self.year_of_release}"
-
-    def __eq__(self, other):
-        if isinstance(other, Auto):
-            return (self.pk_auto == other.pk_auto and
-                    self.name == other.name and
-                    self.fk_automarket == other.fk_automarket and
-                    self.price == other.price and
-                    self.year_of_release == other.year_of_release)
-        return False
-
-    def __lt__(self, other):
-        if isinstance(other, Auto):
-            return self.price < other.price
-        return NotImplemented
-
-
-class AbstractAutoSells(ABC):
-    @abstractmethod
-    def add_city(self, city: City):
-        pass
-
-    @abstractmethod
-    def add_automarket(self, automarket: AutoMarket):
-        pass
-
-    @abstractmethod
-    def add_auto(self, auto: Auto):
-        pass
-
-    @abstractmethod
-    def find_autos_by_city(self, city_name: str):
-        pass
-
-    @abstractmethod
-    def find_autos_by_price_range(self, min_price: float, max_price: float):
-        pass
-
-    @abstractmethod
-    def find_autos_by_automarket(self, automarket_name: str):
-        pass
-
-    @abstractmethod
-    def find_autos_by_year(self, year: int):
-        pass
-
-    @abstractmethod
-    def list_all_autos(self):
-        pass
-
-    @abstractmethod
-    def list_all_automarkets(self):
-        pass
-
-    @abstractmethod
-    def list_all_cities(self):
-        pass
-
-    @abstractmethod
-    def menu(self):
-        pass
-
-
-class AutoSells(AbstractAutoSells):
-
-    _instance = None  # Static field to hold the singleton instance
-    DATABASE_VERSION = 1.0  # Static field for database version
-
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            cls._instance = super().__new__(cls, *args, **kwargs)
-        return cls._instance
-
-
-    def __init__(self, db_path="autosells.db"): # Changed extension to .db
-        if hasattr(self, '_is_initialized'):
-            return  # Prevent re-initialization
-        self.db_path = db_path
-        try:
-            self.conn = sqlite3.connect(self.db_path)  # Connect to SQLite database
-            self.cursor = self.conn.cursor()  # Create a cursor object
-            self._create_tables() # Creates Tables.
-
-            self.cities: Dict[int, City] = {}
-            self.automarkets: Dict[int, AutoMarket] = {}
-            self.autos: Dict[int, Auto] = {}
-            self._load_data() # Load data from the database into the dictionaries
-
-            self._is_initialized = True
-        except sqlite3.Error as e:
-            raise DatabaseError(f"Failed to connect to database: {e}")
-        finally:
-            # Ensure cursor exists even if connection fails
-            if hasattr(self, 'cursor') and self.cursor:
-                self.cursor.close()
-            # No need to close connection here, as it might not be established
-
-    def _load_data(self):
-        """Loads data from the database into the dictionaries."""
-        try:
-            self.cities = self._load_cities()
-            self.automarkets = self._load_automarkets()
-            self.autos = self._load_autos()
-        except DatabaseError as e:
-            print(f"Error loading data: {e}")
-
-
-    def _load_cities(self):
-        try:
-            self.cursor.execute("SELECT pk_city, name FROM Cities")
-            rows = self.cursor.fetchall()
-            return {row[0]: City(pk_city=row[0], name=row[1]) for row in rows}
-        except sqlite3.Error as e:
-            raise DatabaseError(f"Failed to load cities: {e}")
-
-    def _load_automarkets(self):
-        try:
-            self.cursor.execute("SELECT pk_automarket, name, fk_city FROM AutoMarkets")
-            rows = self.cursor.fetchall()
-            return {row[0]: AutoMarket(pk_automarket=row[0], name=row[1], fk_city=row[2]) for row in rows}
-        except sqlite3.Error as e:
-            raise DatabaseError(f"Failed to load automarkets: {e}")
-
-    def _load_autos(self):
-        try:
-            self.cursor.execute("SELECT pk_auto, name, fk_automarket, price, year_of_release FROM Autos")
-            rows = self.cursor.fetchall()
-            return {row[0]: Auto(pk_auto=row[0], name=row[1], fk_automarket=row[2], price=row[3], year_of_release=date.fromisoformat(row[4])) for row in rows}
-        except sqlite3.Error as e:
-            raise DatabaseError(f"Failed to load autos: {e}")
-        except ValueError as e:
-            raise DatabaseError(f"Failed to parse date: {e}")
-
-
-    def _create_tables(self):
-        try:
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS Cities (
-                    pk_city INTEGER PRIMARY KEY,
-                    name TEXT NOT NULL
-                )
-            """)
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS AutoMarkets (
-                    pk_automarket INTEGER PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    fk_city INTEGER NOT NULL,
-                    FOREIGN KEY (fk_city) REFERENCES Cities (pk_city)
-                )
-            """)
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS Autos (
-                    pk_auto INTEGER PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    fk_automarket INTEGER NOT NULL,
-                    price REAL NOT NULL,
-                    year_of_release TEXT NOT NULL,  -- Store date as TEXT (ISO format)
-                    FOREIGN KEY (fk_automarket) REFERENCES AutoMarkets (pk_automarket)
-                )
-            """)
-            self.conn.commit()
-        except sqlite3.Error as e:
-            raise DatabaseError(f"Failed to create tables: {e}")
-
-    def _check_if_exists(self, table_name: str, pk_column: str, pk_value):
-        try:
-            self.cursor.execute(f"SELECT 1 FROM {table_name} WHERE {pk_column} = ?", (pk_value,))
-            return self.cursor.fetchone() is not None
-        except sqlite3.Error as e:
-            raise DatabaseError(f"Failed to check if exists: {e}")
-
-    def add_city(self, city: City):
-        if not self._check_if_exists("Cities", "pk_city", city.pk_city):
-            try:
-                self.cursor.execute("INSERT INTO Cities (pk_city, name) VALUES (?, ?)",
-                                    (city.pk_city, city.name))
-                self.conn.commit()
-                self.cities[city.pk_city] = city  # Add to the dictionary
-            except sqlite3.Error as e:
-                raise DatabaseError(f"Database error: {e}")
-        else:
-            print(f"City with pk_city {city.pk_city} already exists.")
-
-    def add_automarket(self, automarket: AutoMarket):
-        if not self._check_if_exists("AutoMarkets", "pk_automarket", automarket.pk_automarket):
-            try:
-                self.cursor.execute("INSERT INTO AutoMarkets (pk_automarket, name, fk_city) VALUES (?, ?, ?)",
-                                    (automarket.pk_automarket, automarket.name, automarket.fk_city))
-                self.conn.commit()
-                self.automarkets[automarket.pk_automarket] = automarket  # Add to the dictionary
-            except sqlite3.Error as e:
-                raise DatabaseError(f"Database error: {e}")
-        else:
-            print(f"AutoMarket with pk_automarket {automarket.pk_automarket} already exists.")
-
-
-    def add_auto(self, auto: Auto):
-        if not self._check_if_exists("Autos", "pk_auto", auto.pk_auto):
-            try:
-                self.cursor.execute("INSERT INTO Autos (pk_auto, name, fk_automarket, price, year_of_release) VALUES (?, ?, ?, ?, ?)",
-                                    (auto.pk_auto, auto.name, auto.fk_automarket, auto.price, auto.year_of_release.isoformat()))  # Store date as ISO format string
-                self.conn.commit()
-                self.autos[auto.pk_auto] = auto  # Add to the dictionary
-            except sqlite3.Error as e:
-                raise DatabaseError(f"Database error: {e}")
-        else:
-            print(f"Auto with pk_auto {auto.pk_auto} already exists.")
-
-    def find_autos_by_city(self, city_name: str) -> List[Auto]:
-        result: List[Auto] = []
-        for auto_id, auto in self.autos.items():
-            automarket: Optional[AutoMarket] = self.automarkets.get(auto.fk_automarket)
-            if automarket:
-                city: Optional[City] = self.cities.get(automarket.fk_city)
-                if city and city.name.lower() == city_name.lower():
-                    result.append(auto)
-        if not result:
-            raise DataNotFoundError(f"No autos found in city {city_name}")
-        return result
-
-    def find_autos_by_price_range(self, min_price: float, max_price: float) -> List[Auto]:
-         # Input validation
-        if not isinstance(min_price, (int, float)) or not isinstance(max_price, (int, float)):
-            raise InvalidInputError("Price must be a number.")
-        if min_price > max_price:
-            raise InvalidInputError("Min price cannot be greater than max price.")
-        result = [auto for auto_id, auto in self.autos.items() if min_price <= auto.price <= max_price]
-        if not result:
-            raise DataNotFoundError(f"No autos found in the price range from {min_price} to {max_price}")
-        return result
-
-    def find_autos_by_automarket(self, automarket_name: str) -> List[Auto]:
-        result: List[Auto] = []
-        for auto_id, auto in self.autos.items():
-            automarket: Optional[AutoMarket] = next((am for am_id, am in self.automarkets.items() if am.pk_automarket == auto.fk_automarket), None)
-            if automarket and automarket.name.lower() == automarket_name.lower():
-                result.append(auto)
-
-        if not result:
-            raise DataNotFoundError(f"No autos found in the automarket {automarket_name}")
-        return result
-
-    def find_autos_by_year(self, year: int) -> List[Auto]:
-        if not isinstance(year, int):
-            raise InvalidInputError("Year must be an integer.")
-
-        result = [auto for auto_id, auto in self.autos.items() if auto.year_of_release.year == year]
-
-        if not result:
-             raise DataNotFoundError(f"No autos found in the year {year}")
-        return result
-
-    def list_all_autos(self) -> List[str]:
-        if not self.autos:
-            raise DataNotFoundError("No autos found in the database.")
-        return [str(auto) for auto_id, auto in self.autos.items()]
-
-    def list_all_automarkets(self) -> List[str]:
-        if not self.automarkets:
-            raise DataNotFoundError("No automarkets found in the database.")
-        return [str(automarket) for automarket_id, automarket in self.automarkets.items()]
-
-    def list_all_cities(self) -> List[str]:
-        if not self.cities:
-            raise DataNotFoundError("No cities found in the database.")
-        return [str(city) for city_id, city in self.cities.items()]
-
-    def clear_console(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
-
-    def scip(self):
-        input("\nНажмите Enter чтобы выйти")
-
-    def menu(self):
-        while True:
-            self.clear_console()
-            print("\nМеню AutoSells:")
-            print("1. Поиск автомобилей по городу")
-            print("2. Поиск автомобилей по диапазону цен")
-            print("3. Поиск автомобилей по автосалону")
-            print("4. Поиск автомобилей по году выпуска")
-            print("5. Список всех автомобилей")
-            print("6. Список всех автосалонов")
-            print("7. Список всех городов")
-            print("8. Вывести всю базу данных")
-            print("9. Сравнить два автомобиля по цене")
-            print("0. Выход")
-
-            choice = input("Выберите опцию: ")
-
-            if choice == '1':
-                self.clear_console()
-                try:
-                    city_name = input("Введите название города: ")
-                    autos = self.find_autos_by_city(city_name)
-                    print(f"Автомобили в городе {city_name}:")
-                    for auto in autos:
-                        print(auto)
-                except DataNotFoundError as e:
-                    print(e)
-                except Exception as e:
-                    print(f"An unexpected error occurred: {e}")
-                finally:
-                    self.scip()
-
-            elif choice == '2':
-                self.clear_console()
-                try:
-                    min_price = float(input("Введите минимальную цену: "))
-                    max_price = float(input("Введите максимальную цену: "))
-                    autos = self.find_autos_by_price_range(min_price, max_price)
-                    print(f"Автомобили в диапазоне цен от {min_price} до {max_price}:")
-                    for auto in autos:
-                        print(auto)
-                except InvalidInputError as e:
-                    print(e)
-                except DataNotFoundError as e:
-                    print(e)
-                except ValueError:
-                    print("Неверный ввод цены. Пожалуйста, введите число.")
-                except Exception as e:
-                    print(f"An unexpected error occurred: {e}")
-                finally:
-                    self.scip()
-
-            elif choice == '3':
-                self.clear_console()
-                try:
-                    automarket_name = input("Введите название автосалона: ")
-                    autos = self.find_autos_by_automarket(automarket_name)
-                    print(f"Автомобили в автосалоне {automarket_name}:")
-                    for auto in autos:
-                        print(auto)
-                except DataNotFoundError as e:
-                    print(e)
-                except Exception as e:
-                    print(f"An unexpected error occurred: {e}")
-                finally:
-                    self.scip()
-
-            elif choice == '4':
-                self.clear_console()
-                try:
-                    year = int(input("Введите год выпуска: "))
-                    autos = self.find_autos_by_year(year)
-                    print(f"Автомобили {year} года выпуска:")
-                    for auto in autos:
-                        print(auto)
-                except InvalidInputError as e:
-                    print(e)
-                except DataNotFoundError as e:
-                    print(e)
-                except ValueError:
-                    print("Неверный ввод года. Пожалуйста, введите целое число.")
-                except Exception as e:
-                    print(f"An unexpected error occurred: {e}")
-                finally:
-                    self.scip()
-
-            elif choice == '5':
-                self.clear_console()
-                try:
-                    autos = self.list_all_autos()
-                    print("Все автомобили:")
-                    for auto in autos:
-                        print(auto)
-                except DataNotFoundError as e:
-                    print(e)
-                except Exception as e:
-                    print(f"An unexpected error occurred: {e}")
-                finally:
-                    self.scip()
-
-            elif choice == '6':
-                self.clear_console()
-                try:
-                    automarkets = self.list_all_automarkets()
-                    print("Все автосалоны:")
-                    for automarket in automarkets:
-                        print(automarket)
-                except DataNotFoundError as e:
-                    print(e)
-                except Exception as e:
-                    print(f"An unexpected error occurred: {e}")
-                finally:
-                    self.scip()
-
-            elif choice == '7':
-                self.clear_console()
-                try:
-                    cities = self.list_all_cities()
-                    print("Все города:")
-                    for city in cities:
-                        print(city)
-                except DataNotFoundError as e:
-                    print(e)
-                except Exception as e:
-                    print(f"An unexpected error occurred: {e}")
-                finally:
-                    self.scip()
-
-            elif choice == '8': # Displays data from db
-                try:
-                    print("Cities:")
-                    for city in self.list_all_cities():
-                        print(city)
-
-                    print("\nAutomarkets:")
-                    for automarket in self.list_all_automarkets():
-                        print(automarket)
-
-                    print("\nAutos:")
-                    for auto in self.list_all_autos():
-                        print(auto)
-                except DataNotFoundError as e:
-                    print(e)
-                except Exception as e:
-                    print(f"An unexpected error occurred: {e}")
-                finally:
-                    self.scip()
-
-            elif choice == '9':
-                self.clear_console()
-                try:
-                    auto_id1 = int(input("Введите ID первого автомобиля для сравнения: "))
-                    auto1: Optional[Auto] = self.autos.get(auto_id1)
-                    auto_id2 = int(input("Введите ID второго автомобиля для сравнения: "))
-                    auto2: Optional[Auto] = self.autos.get(auto_id2)
-
-                    if auto1 and auto2:
-                        if auto1 < auto2:
-                            print(f"{auto1.name} дешевле, чем {auto2.name}")
-                        elif auto2 < auto1:
-                            print(f"{auto2.name} дешевле, чем {auto1.name}")
-                        else:
-                            print(f"{auto1.name} и {auto2.name} стоят одинаково")
-                    else:
-                        print("Один или оба автомобиля не найдены.")
-                except ValueError:
-                    print("Неверный ввод ID автомобиля. Пожалуйста, введите число.")
-                except Exception as e:
-                    print(f"An unexpected error occurred: {e}")
-                finally:
-                    self.scip()
-
-            elif choice == '0':
-                break
-
-            else:
-                print("Неверный выбор. Попробуйте снова.")
-                self.scip()
-
-    def __str__(self):
-        return f"AutoSells(cities={self.cities}, automarkets={self.automarkets}, autos={self.autos})"
-
-    def __del__(self):  # Close the connection when the object is deleted
-        if hasattr(self, 'conn') and self.conn:
-            try:
-                self.conn.close()
-            except sqlite3.Error as e:
-                print(f"Error closing database connection: {e}")
-
-    @staticmethod
-    def get_database_version():
-        return AutoSells.DATABASE_VERSION
-
-    @staticmethod
-    def print_database_version():
-        print(f"Database Version: {AutoSells.DATABASE_VERSION}")
-
-# Example usage:
-if __name__ == '__main__':
-    try:
-        auto_sells = AutoSells()
-        auto_sells.menu()
-
-    except DatabaseError as e:
-        print(f"A database error occurred: {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred during initialization: {e}")
+
+import sqlite3
+from datetime import date, MINYEAR, MAXYEAR
+import atexit
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, OrderedDict, deque
+from collections.abc import MutableMapping, Hashable
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps
+from multiprocessing import resource_tracker, shared_memory
+from abc import ABC, abstractmethod
+from heapq import heapify, heappush, heapreplace, nlargest, nsmallest
+from itertools import chain, groupby, islice
+from operator import itemgetter
+from types import GeneratorType
+from typing import List, Dict, Optional, Iterable, Iterator, Callable, Tuple, Set
+
+try:
+    import numpy as np  # Optional: vectorizes AutoSells.query over the auto columns
+except ImportError:
+    np = None
+
+# Custom Exceptions
+class BaseError(Exception):
+    """Base class for custom exceptions."""
+    pass
+
+class DatabaseError(BaseError):
+    """Exception raised for database-related errors."""
+    pass
+
+class InvalidInputError(BaseError):
+    """Exception raised for invalid input."""
+    pass
+
+class DataNotFoundError(BaseError):
+    """Exception raised when data is not found."""
+    pass
+
+
+@dataclass
+class City:
+    pk_city: int
+    name: str
+
+    def __str__(self):
+        return f"City(pk_city={self.pk_city}, name='{self.name}')"
+
+    def __eq__(self, other):
+        if isinstance(other, City):
+            return self.pk_city == other.pk_city and self.name == other.name
+        return False
+
+
+@dataclass
+class AutoMarket:
+    pk_automarket: int
+    name: str
+    fk_city: int
+
+    def __str__(self):
+        return f"AutoMarket(pk_automarket={self.pk_automarket}, name='{self.name}', fk_city={self.fk_city})"
+
+    def __eq__(self, other):
+        if isinstance(other, AutoMarket):
+            return (self.pk_automarket == other.pk_automarket and
+                    self.name == other.name and
+                    self.fk_city == other.fk_city)
+        return False
+
+
+@dataclass
+class Auto:
+    pk_auto: int
+    name: str
+    fk_automarket: int
+    price: float
+    year_of_release: date
+
+    def __str__(self):
+        return f"{self.pk_auto}. {self.name}, Автосалон - {self.fk_automarket}, {self.price}, {self.year_of_release}"
+
+    def __eq__(self, other):
+        if isinstance(other, Auto):
+            return (self.pk_auto == other.pk_auto and
+                    self.name == other.name and
+                    self.fk_automarket == other.fk_automarket and
+                    self.price == other.price and
+                    self.year_of_release == other.year_of_release)
+        return False
+
+    def __lt__(self, other):
+        if isinstance(other, Auto):
+            return self.price < other.price
+        return NotImplemented
+
+
+@dataclass
+class BulkInsertResult:
+    inserted: int
+    skipped: int
+
+    def __str__(self):
+        return f"BulkInsertResult(inserted={self.inserted}, skipped={self.skipped})"
+
+
+@dataclass
+class PriceStats:
+    count: int
+    min_price: Optional[float]  # None for an empty group
+    max_price: Optional[float]
+    avg_price: Optional[float]
+
+    def __str__(self):
+        return (f"PriceStats(count={self.count}, min_price={self.min_price}, max_price={self.max_price}, "
+                f"avg_price={self.avg_price})")
+
+
+class _Descending:
+    """Reverses Auto.__lt__, so a heapq heap keeps the most expensive auto on top."""
+
+    __slots__ = ("auto",)
+
+    def __init__(self, auto: Auto):
+        self.auto = auto
+
+    def __lt__(self, other: '_Descending'):
+        return other.auto < self.auto
+
+
+class AutoAggregate:
+    """Count, price sum and the top_size cheapest and most expensive autos of one group.
+
+    add() costs O(log top_size): both heaps are bounded and ordered by
+    Auto.__lt__, so an auto only goes in when it beats the worst one kept.
+    A heap cannot give back what it dropped, so remove() of a kept auto
+    marks the aggregate stale and its owner rebuilds it from the group.
+    """
+
+    __slots__ = ("count", "total", "top_size", "stale", "_cheapest", "_expensive")
+
+    def __init__(self, top_size: int):
+        self.count = 0
+        self.total = 0.0
+        self.top_size = top_size
+        self.stale = False
+        self._cheapest: List[_Descending] = []  # max-heap: the dearest of the cheapest on top
+        self._expensive: List[Auto] = []  # min-heap: the cheapest of the dearest on top
+
+    @classmethod
+    def from_prices(cls, prices: List[float], auto_at: Callable[[int], Auto], top_size: int) -> 'AutoAggregate':
+        """Builds the aggregate of a whole group from its prices; auto_at(i) is called for kept autos only."""
+        aggregate = cls(top_size)
+        aggregate.count = len(prices)
+        aggregate.total = sum(prices)
+        # Selecting by price is the Auto.__lt__ order, compared in C instead of through __lt__
+        cheapest = nsmallest(top_size, range(len(prices)), key=prices.__getitem__)
+        expensive = nlargest(top_size, range(len(prices)), key=prices.__getitem__)
+        kept = {i: auto_at(i) for i in set(cheapest).union(expensive)}
+        aggregate._cheapest = [_Descending(kept[i]) for i in cheapest]
+        aggregate._expensive = [kept[i] for i in expensive]
+        heapify(aggregate._cheapest)
+        heapify(aggregate._expensive)
+        return aggregate
+
+    def admits(self, price: float) -> bool:
+        """Whether an auto at this price would enter one of the heaps."""
+        return (len(self._expensive) < self.top_size or price < self._cheapest[0].auto.price
+                or price > self._expensive[0].price)
+
+    def offer(self, auto: Auto):
+        """Puts the auto into the heaps it beats, without counting it."""
+        if len(self._cheapest) < self.top_size:
+            heappush(self._cheapest, _Descending(auto))
+        elif auto < self._cheapest[0].auto:
+            heapreplace(self._cheapest, _Descending(auto))
+        if len(self._expensive) < self.top_size:
+            heappush(self._expensive, auto)
+        elif self._expensive[0] < auto:
+            heapreplace(self._expensive, auto)
+
+    def add(self, auto: Auto):
+        self.count += 1
+        self.total += auto.price
+        if self.admits(auto.price):
+            self.offer(auto)
+
+    def merge(self, other: 'AutoAggregate'):
+        self.count += other.count
+        self.total += other.total
+        # An auto kept in both of other's heaps is offered once
+        kept = {auto.pk_auto: auto for auto in other._expensive}
+        kept.update((item.auto.pk_auto, item.auto) for item in other._cheapest)
+        for auto in kept.values():
+            self.offer(auto)
+
+    def remove(self, auto: Auto):
+        self.count -= 1
+        self.total -= auto.price
+        if (any(kept.auto.pk_auto == auto.pk_auto for kept in self._cheapest)
+                or any(kept.pk_auto == auto.pk_auto for kept in self._expensive)):
+            self.stale = True
+
+    def cheapest(self, count: int) -> List[Auto]:
+        return sorted(kept.auto for kept in self._cheapest)[:count]
+
+    def most_expensive(self, count: int) -> List[Auto]:
+        return sorted(self._expensive, reverse=True)[:count]
+
+    def stats(self) -> PriceStats:
+        if not self.count:
+            return PriceStats(count=0, min_price=None, max_price=None, avg_price=None)
+        return PriceStats(count=self.count, min_price=min(kept.auto.price for kept in self._cheapest),
+                          max_price=max(auto.price for auto in self._expensive), avg_price=self.total / self.count)
+
+
+class PriceIndex:
+    """Auto ids kept in price order (the Auto.__lt__ ordering) for bisect lookups.
+
+    An insert into the middle of an array moves its whole tail, so single
+    adds are queued and merged into the arrays in one pass by the next read,
+    or once PENDING_LIMIT of them pile up: streaming n autos in costs
+    O(n / PENDING_LIMIT) array copies instead of n. remove() still moves
+    the tail of the arrays.
+    """
+
+    PENDING_LIMIT = 1024
+
+    def __init__(self, autos: Iterable[Auto] = ()):
+        ordered = sorted(autos)  # Auto.__lt__ compares by price
+        self._prices = array('d', (auto.price for auto in ordered))
+        self._ids = array('q', (auto.pk_auto for auto in ordered))
+        self._pending: List[Tuple[float, int]] = []  # (price, pk_auto) added since the last merge
+
+    @classmethod
+    def from_columns(cls, prices: array, ids: array) -> 'PriceIndex':
+        """Builds the index from parallel price/id columns without creating Auto objects."""
+        index = cls()
+        order = sorted(range(len(ids)), key=prices.__getitem__)  # stable, same order as sorted(autos)
+        index._prices = array('d', (prices[pos] for pos in order))
+        index._ids = array('q', (ids[pos] for pos in order))
+        return index
+
+    @classmethod
+    def from_sorted(cls, prices: array, ids: array) -> 'PriceIndex':
+        """Adopts columns that are already in index order, e.g. from arrays()."""
+        index = cls()
+        index._prices, index._ids = prices, ids
+        return index
+
+    def arrays(self) -> Tuple[array, array]:
+        self._merge_pending()
+        return self._prices, self._ids
+
+    def add(self, auto: Auto):
+        self._pending.append((auto.price, auto.pk_auto))
+        if len(self._pending) >= self.PENDING_LIMIT:
+            self._merge_pending()
+
+    def _merge_pending(self):
+        """Merges the queued adds: a bisect per add, the runs between them copied as slices."""
+        if not self._pending:
+            return
+        # A stable sort and bisect_right keep equal prices in insertion order, existing entries first
+        pending = sorted(self._pending, key=itemgetter(0))
+        self._pending = []
+        prices, ids = array('d'), array('q')
+        start = 0
+        for price, auto_id in pending:
+            pos = bisect_right(self._prices, price, lo=start)
+            prices += self._prices[start:pos]
+            ids += self._ids[start:pos]
+            prices.append(price)
+            ids.append(auto_id)
+            start = pos
+        prices += self._prices[start:]
+        ids += self._ids[start:]
+        self._prices, self._ids = prices, ids
+
+    def remove(self, auto: Auto) -> bool:
+        if self._pending:
+            try:
+                self._pending.remove((auto.price, auto.pk_auto))
+                return True
+            except ValueError:
+                pass
+        start = bisect_left(self._prices, auto.price)
+        stop = bisect_right(self._prices, auto.price, lo=start)
+        for pos in range(start, stop):
+            if self._ids[pos] == auto.pk_auto:
+                del self._prices[pos]
+                del self._ids[pos]
+                return True
+        return False
+
+    def add_many(self, autos: Iterable[Auto]):
+        """Merges a batch in one linear pass instead of one insert per auto."""
+        self._pending.extend((auto.price, auto.pk_auto) for auto in autos)
+        self._merge_pending()
+
+    def range(self, min_price: float, max_price: float) -> List[int]:
+        """Returns ids with min_price <= price <= max_price, cheapest first."""
+        self._merge_pending()
+        start = bisect_left(self._prices, min_price)
+        stop = bisect_right(self._prices, max_price, lo=start)
+        return self._ids[start:stop].tolist()
+
+    def cheapest(self, count: int) -> List[int]:
+        self._merge_pending()
+        return self._ids[:count].tolist()
+
+    def most_expensive(self, count: int) -> List[int]:
+        if count <= 0:
+            return []
+        self._merge_pending()
+        return self._ids[:-count - 1:-1].tolist()
+
+    def __iter__(self) -> Iterator[int]:
+        self._merge_pending()
+        return iter(self._ids)
+
+    def __reversed__(self) -> Iterator[int]:
+        self._merge_pending()
+        return reversed(self._ids)
+
+    def __len__(self):
+        return len(self._ids) + len(self._pending)
+
+
+class NameIndex:
+    """Distinct lower-cased names with prefix, substring and typo-tolerant lookups.
+
+    Every word start of a name is kept in one sorted list, so a prefix is
+    a bisect away, and the trigrams and bigrams of " " + name map back to
+    the names for substring and fuzzy candidates. Names are counted, not
+    listed per row: 10 million autos of 500 models cost 500 entries.
+    """
+
+    def __init__(self, names: Iterable[str] = (), counts: Optional[Dict[str, int]] = None):
+        self._counts: Dict[str, int] = {}  # lower-cased name -> rows carrying it
+        self._display: Dict[str, str] = {}  # lower-cased name -> name as first added
+        self._starts: List[Tuple[str, str]] = []  # (name from a word start on, name), sorted
+        self._grams: Dict[str, Set[str]] = {}  # trigram -> names
+        self._pairs: Dict[str, Set[str]] = {}  # bigram -> names, for fuzzy() on texts too short for trigrams
+        for name, count in (counts if counts is not None else Counter(names)).items():
+            self.add(name, count, _sort=False)
+        self._starts.sort()  # one sort instead of an insort per name
+
+    FUZZY_CANDIDATES = 256  # Names with the most shared grams that fuzzy() checks the edit distance of
+
+    @staticmethod
+    def _word_starts(key: str) -> Iterator[int]:
+        # "санкт-петербург" starts words at "санкт" and "петербург"
+        return (pos for pos, char in enumerate(key) if char.isalnum() and (pos == 0 or not key[pos - 1].isalnum()))
+
+    @staticmethod
+    def _trigrams(text: str) -> Set[str]:
+        return {text[pos:pos + 3] for pos in range(len(text) - 2)}
+
+    @staticmethod
+    def _bigrams(text: str) -> Set[str]:
+        return {text[pos:pos + 2] for pos in range(len(text) - 1)}
+
+    def add(self, name: str, count: int = 1, _sort: bool = True):
+        key = name.lower()
+        known = self._counts.get(key, 0)
+        self._counts[key] = known + count
+        if known:
+            return
+        self._display[key] = name
+        for pos in self._word_starts(key):
+            if _sort:
+                insort(self._starts, (key[pos:], key))
+            else:
+                self._starts.append((key[pos:], key))
+        for gram in self._trigrams(" " + key):
+            self._grams.setdefault(gram, set()).add(key)
+        for gram in self._bigrams(" " + key):
+            self._pairs.setdefault(gram, set()).add(key)
+
+    def remove(self, name: str):
+        key = name.lower()
+        count = self._counts.get(key, 0)
+        if count > 1:
+            self._counts[key] = count - 1
+            return
+        if not count:
+            return
+        del self._counts[key], self._display[key]
+        for pos in self._word_starts(key):
+            del self._starts[bisect_left(self._starts, (key[pos:], key))]
+        for grams, index in ((self._trigrams(" " + key), self._grams), (self._bigrams(" " + key), self._pairs)):
+            for gram in grams:
+                keys = index[gram]
+                keys.discard(key)
+                if not keys:
+                    del index[gram]
+
+    def prefix(self, text: str, limit: int) -> List[str]:
+        """Names with a word starting with text, shortest match first."""
+        text = text.lower()
+        found = {}
+        for pos in range(bisect_left(self._starts, (text, "")), len(self._starts)):
+            start, key = self._starts[pos]
+            if not start.startswith(text) or len(found) >= limit * 4:
+                break
+            found.setdefault(key, (key != start, len(key), key))  # whole-name matches before word matches
+        return [self._display[key] for key in sorted(found, key=found.get)[:limit]]
+
+    def substring(self, text: str, limit: int) -> List[str]:
+        text = text.lower()
+        grams = sorted((self._grams.get(gram, set()) for gram in self._trigrams(text)), key=len)
+        candidates = set.intersection(*grams) if grams else self._counts  # under three characters: every name
+        found = nsmallest(limit, ((key.find(text), len(key), key) for key in candidates if text in key))
+        return [self._display[key] for _, _, key in found]
+
+    @staticmethod
+    def _prefix_distance(query: str, text: str, limit: int) -> int:
+        """Edit distance (adjacent swaps count once) from query to the closest prefix of text.
+
+        Prefixes longer than len(query) + limit cannot be within limit, callers cut text to that.
+        """
+        previous, row = None, list(range(len(query) + 1))
+        best = row[-1]
+        for j, char in enumerate(text, 1):
+            current = [j]
+            for i, query_char in enumerate(query, 1):
+                value = min(row[i] + 1, current[i - 1] + 1, row[i - 1] + (query_char != char))
+                if previous is not None and i > 1 and query_char == text[j - 2] and query[i - 2] == char:
+                    value = min(value, previous[i - 2] + 1)
+                current.append(value)
+            previous, row = row, current
+            best = min(best, row[-1])
+            if min(row) > limit:
+                break  # a row's minimum never goes down again
+        return best
+
+    def fuzzy(self, text: str, limit: int, max_distance: Optional[int] = None) -> List[str]:
+        """Names with a word start within max_distance edits of text, closest first.
+
+        max_distance defaults to 0 up to two characters, 1 up to five and 2
+        beyond. An edit breaks at most three trigrams of " " + text, so a
+        match shares one of the 3 * max_distance + 1 rarest; of the names
+        sharing them, the FUZZY_CANDIDATES sharing the most are checked.
+        A text too short for that ("lda" has two) uses its bigrams, two per
+        edit, and failing those too every name is a candidate.
+        """
+        text = text.lower()
+        exact = self.prefix(text, limit)
+        if len(exact) == limit:
+            return exact  # typed without typos: nothing closer than distance 0
+        if max_distance is None:
+            max_distance = 0 if len(text) <= 2 else 1 if len(text) <= 5 else 2
+        shared = None
+        for grams, index, per_edit in ((self._trigrams(" " + text), self._grams, 3),
+                                       (self._bigrams(" " + text), self._pairs, 2)):
+            if len(grams) > per_edit * max_distance:
+                postings = sorted((index.get(gram, ()) for gram in grams), key=len)
+                shared = Counter(chain.from_iterable(postings[:per_edit * max_distance + 1]))
+                break
+        if shared is None:
+            shared = dict.fromkeys(self._counts, 0)
+        candidates = nlargest(self.FUZZY_CANDIDATES, ((count, key) for key, count in shared.items()))
+        found = []
+        distances: Dict[str, int] = {}  # names share words, and only len(text) + max_distance chars count
+        for count, key in candidates:
+            distance = max_distance + 1
+            for pos in self._word_starts(key):
+                word = key[pos:pos + len(text) + max_distance]
+                if word not in distances:
+                    distances[word] = self._prefix_distance(text, word, max_distance)
+                distance = min(distance, distances[word])
+            if distance <= max_distance:
+                found.append((distance, -count, len(key), key))
+        return [self._display[key] for _, _, _, key in nsmallest(limit, found)]
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._counts
+
+    def __len__(self):
+        return len(self._counts)
+
+
+class SimilarityGrid:
+    """Autos as points (price, release date) in a uniform grid for nearest-neighbour and radius lookups.
+
+    One unit of distance is a year between release dates or a price
+    PRICE_STEP (10%) apart, so a car a year newer and 10% dearer is about
+    1.41 away. A lookup visits the cells in rings around the point and
+    stops once no unvisited cell can hold anything closer, touching a few
+    cells instead of every auto. The cell size follows the density of the
+    points and is recomputed when the grid grows past four times its size.
+    """
+
+    PRICE_STEP = math.log(1.1)
+    YEAR_DAYS = 365.25
+    CELL_AUTOS = 16  # Autos per cell the cell size aims at
+
+    def __init__(self, points: Iterable[Tuple[int, float, int]] = ()):
+        """points are (pk_auto, price, release day as date.toordinal())."""
+        self._cells: Dict[Tuple[int, int], Tuple[array, array, array]] = {}  # cell -> ids, xs, ys
+        self._bounds: Optional[List[int]] = None  # min x, min y, max x, max y of the cells ever used
+        self._count = 0
+        self._regrid([(auto_id, *self.point(price, day)) for auto_id, price, day in points])
+
+    @classmethod
+    def point(cls, price: float, day: int) -> Tuple[float, float]:
+        return math.log1p(max(price, 0.0)) / cls.PRICE_STEP, day / cls.YEAR_DAYS
+
+    def _regrid(self, points: List[Tuple[int, float, float]]):
+        self.cell_size = 1.0
+        if points:
+            width = max(x for _, x, _ in points) - min(x for _, x, _ in points)
+            height = max(y for _, _, y in points) - min(y for _, _, y in points)
+            self.cell_size = math.sqrt(max(width, 1.0) * max(height, 1.0) * self.CELL_AUTOS / len(points))
+            # Prices cluster around the popular models: shrink the cells until the cell of an average
+            # auto (not of an average cell) holds about CELL_AUTOS
+            for _ in range(8):
+                crowding = sum(count * count for count in Counter(self._cell(x, y) for _, x, y in points).values())
+                if crowding <= 2 * self.CELL_AUTOS * len(points):
+                    break
+                self.cell_size /= 2
+        self._cells, self._bounds, self._count = {}, None, 0
+        self._regrid_at = 4 * len(points) + 1024
+        for auto_id, x, y in points:
+            self._add_point(auto_id, x, y)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _add_point(self, auto_id: int, x: float, y: float):
+        key = self._cell(x, y)
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = self._cells[key] = (array('q'), array('d'), array('d'))
+            if self._bounds is None:
+                self._bounds = [key[0], key[1], key[0], key[1]]
+            else:
+                bounds = self._bounds
+                bounds[0], bounds[1] = min(bounds[0], key[0]), min(bounds[1], key[1])
+                bounds[2], bounds[3] = max(bounds[2], key[0]), max(bounds[3], key[1])
+        cell[0].append(auto_id)
+        cell[1].append(x)
+        cell[2].append(y)
+        self._count += 1
+
+    def add(self, auto_id: int, price: float, day: int):
+        self._add_point(auto_id, *self.point(price, day))
+        if self._count >= self._regrid_at:
+            self._regrid([(ids[pos], xs[pos], ys[pos]) for ids, xs, ys in self._cells.values()
+                          for pos in range(len(ids))])
+
+    def remove(self, auto_id: int, price: float, day: int) -> bool:
+        key = self._cell(*self.point(price, day))
+        cell = self._cells.get(key)
+        if cell is None:
+            return False
+        try:
+            pos = cell[0].index(auto_id)
+        except ValueError:
+            return False
+        for column in cell:
+            del column[pos]
+        if not cell[0]:
+            del self._cells[key]
+        self._count -= 1
+        return True
+
+    def _ring(self, cx: int, cy: int, ring: int) -> Iterator[Tuple[array, array, array]]:
+        """The occupied cells at Chebyshev distance ring from cell (cx, cy)."""
+        min_x, min_y, max_x, max_y = self._bounds
+        if ring == 0:
+            keys = [(cx, cy)]
+        else:
+            keys = [(i, j) for j in (cy - ring, cy + ring) if min_y <= j <= max_y
+                    for i in range(max(cx - ring, min_x), min(cx + ring, max_x) + 1)]
+            keys += [(i, j) for i in (cx - ring, cx + ring) if min_x <= i <= max_x
+                     for j in range(max(cy - ring + 1, min_y), min(cy + ring - 1, max_y) + 1)]
+        return (self._cells[key] for key in keys if key in self._cells)
+
+    def nearest(self, price: float, day: int, count: Optional[int], radius: Optional[float] = None,
+                exclude: Optional[int] = None) -> List[Tuple[float, int]]:
+        """Up to count (distance, pk_auto) pairs closest to the point, nearest (then lowest pk) first.
+
+        radius limits the distance, count None returns everything within it.
+        """
+        if not self._cells or count == 0:
+            return []
+        x, y = self.point(price, day)
+        cx, cy = self._cell(x, y)
+        min_x, min_y, max_x, max_y = self._bounds
+        heap: List[Tuple[float, int]] = []  # (-distance, -pk_auto): the farthest kept auto on top
+        ring = 0
+        while True:
+            for ids, xs, ys in self._ring(cx, cy, ring):
+                for pos in range(len(ids)):
+                    distance = math.hypot(xs[pos] - x, ys[pos] - y)
+                    if radius is not None and distance > radius or ids[pos] == exclude:
+                        continue
+                    entry = (-distance, -ids[pos])
+                    if count is None or len(heap) < count:
+                        heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapreplace(heap, entry)
+            # Every unvisited cell is at least ring cells away
+            reach = ring * self.cell_size
+            if (count is not None and len(heap) == count and -heap[0][0] <= reach
+                    or radius is not None and radius < reach
+                    or cx - ring <= min_x and cy - ring <= min_y and cx + ring >= max_x and cy + ring >= max_y):
+                break
+            ring += 1
+        return [(-distance, -auto_id) for distance, auto_id in sorted(heap, reverse=True)]
+
+    def __len__(self):
+        return self._count
+
+
+class AutoColumns(MutableMapping):
+    """Compact column store for autos that behaves like Dict[int, Auto].
+
+    Rows live in typed arrays kept sorted by pk_auto, names are interned in
+    a string table and release dates are stored as ordinals. Auto objects are
+    built on access, so changing a returned Auto does not change the store.
+    Appending a higher pk is O(1); storing a row below the highest pk, or
+    deleting one, moves the tail of every column, so batches go through
+    add_many(), which merges them in one pass.
+    """
+
+    def __init__(self):
+        self.pks = array('q')
+        self.fk_automarkets = array('q')
+        self.prices = array('d')
+        self.days = array('i')  # date.toordinal()
+        self.name_ids = array('i')
+        self._names: List[str] = []
+        self._name_ids: Dict[str, int] = {}
+
+    def _intern(self, name: str) -> int:
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        return name_id
+
+    def _position(self, pk_auto: int) -> int:
+        pos = bisect_left(self.pks, pk_auto)
+        if pos < len(self.pks) and self.pks[pos] == pk_auto:
+            return pos
+        return -1
+
+    def append_row(self, pk_auto: int, name: str, fk_automarket: int, price: float, day: int):
+        """Stores one row; appending in pk order (as SQLite returns them) is O(1)."""
+        pos = len(self.pks)
+        if pos and self.pks[-1] >= pk_auto:
+            pos = bisect_left(self.pks, pk_auto)
+            if self.pks[pos] == pk_auto:
+                self.fk_automarkets[pos] = fk_automarket
+                self.prices[pos] = price
+                self.days[pos] = day
+                self.name_ids[pos] = self._intern(name)
+                return
+        self.pks.insert(pos, pk_auto)
+        self.fk_automarkets.insert(pos, fk_automarket)
+        self.prices.insert(pos, price)
+        self.days.insert(pos, day)
+        self.name_ids.insert(pos, self._intern(name))
+
+    def add_many(self, autos: Iterable[Auto]):
+        """Stores a batch of autos; new pks are merged into the columns in one pass, not one insert each."""
+        rows = {auto.pk_auto: auto for auto in autos}  # the last copy of a pk wins, as with item assignment
+        last = self.pks[-1] if self.pks else None
+        new = []
+        for pk_auto in sorted(rows):
+            if last is not None and pk_auto <= last and self._position(pk_auto) >= 0:
+                self[pk_auto] = rows[pk_auto]  # in place
+            else:
+                new.append(rows[pk_auto])
+        if not new:
+            return
+        columns = (self.pks, self.fk_automarkets, self.prices, self.days, self.name_ids)
+        fresh = (array('q', (auto.pk_auto for auto in new)), array('q', (auto.fk_automarket for auto in new)),
+                 array('d', (auto.price for auto in new)),
+                 array('i', (auto.year_of_release.toordinal() for auto in new)),
+                 array('i', (self._intern(auto.name) for auto in new)))
+        # Only the part from the first new pk on is rebuilt, so appending a batch copies nothing
+        first = bisect_left(self.pks, fresh[0][0])
+        tails = [column[first:] for column in columns]
+        for column in columns:
+            del column[first:]
+        start = fresh_start = 0
+        # New rows that land in the same gap go in as one slice
+        for pos, group in groupby(bisect_left(tails[0], pk_auto) for pk_auto in fresh[0]):
+            fresh_stop = fresh_start + sum(1 for _ in group)
+            for column, tail, rows in zip(columns, tails, fresh):
+                column.extend(tail[start:pos])
+                column.extend(rows[fresh_start:fresh_stop])
+            start, fresh_start = pos, fresh_stop
+        for column, tail in zip(columns, tails):
+            column.extend(tail[start:])
+
+    def _auto_at(self, pos: int) -> Auto:
+        return Auto(pk_auto=self.pks[pos], name=self._names[self.name_ids[pos]],
+                    fk_automarket=self.fk_automarkets[pos], price=self.prices[pos],
+                    year_of_release=date.fromordinal(self.days[pos]))
+
+    @classmethod
+    def from_arrays(cls, pks: array, fk_automarkets: array, prices: array, days: array, name_ids: array,
+                    names: List[str]) -> 'AutoColumns':
+        """Adopts ready columns (sorted by pk_auto) and their name table."""
+        columns = cls()
+        columns.pks, columns.fk_automarkets, columns.prices = pks, fk_automarkets, prices
+        columns.days, columns.name_ids = days, name_ids
+        columns._names = list(names)
+        columns._name_ids = {name: name_id for name_id, name in enumerate(columns._names)}
+        return columns
+
+    def index_keys(self) -> Iterator[Tuple[int, int, int]]:
+        """Yields (pk_auto, fk_automarket, year) for index building without creating Auto objects."""
+        for pk_auto, fk_automarket, day in zip(self.pks, self.fk_automarkets, self.days):
+            yield pk_auto, fk_automarket, date.fromordinal(day).year
+
+    def __getitem__(self, pk_auto: int) -> Auto:
+        pos = self._position(pk_auto)
+        if pos < 0:
+            raise KeyError(pk_auto)
+        return self._auto_at(pos)
+
+    def __setitem__(self, pk_auto: int, auto: Auto):
+        self.append_row(pk_auto, auto.name, auto.fk_automarket, auto.price, auto.year_of_release.toordinal())
+
+    def __delitem__(self, pk_auto: int):
+        pos = self._position(pk_auto)
+        if pos < 0:
+            raise KeyError(pk_auto)
+        for column in (self.pks, self.fk_automarkets, self.prices, self.days, self.name_ids):
+            del column[pos]
+
+    def __contains__(self, pk_auto) -> bool:
+        return self._position(pk_auto) >= 0
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.pks)
+
+    def __len__(self):
+        return len(self.pks)
+
+    def values(self):
+        return (self._auto_at(pos) for pos in range(len(self.pks)))
+
+    def items(self):
+        return ((self.pks[pos], self._auto_at(pos)) for pos in range(len(self.pks)))
+
+    def __str__(self):
+        return f"AutoColumns(autos={len(self.pks)}, names={len(self._names)})"
+
+
+class CatalogSnapshot:
+    """Snapshot file of a loaded catalog: a JSON header, then raw arrays on 8-byte boundaries.
+
+    views() maps a snapshot in memory without copying; read() copies each
+    array of a file out of them with one frombytes(), so the catalog can
+    grow the arrays in place. Neither parses rows or creates objects. The header carries the
+    ChangeLog sequence and table counts the catalog reflected, so the
+    reader can tell whether the snapshot is stale.
+    """
+
+    MAGIC = b"AUTOSNAP"
+    FORMAT_VERSION = 1
+    _PREFIX = struct.Struct("<8sII")  # magic, format version, header length
+
+    @staticmethod
+    def _aligned(size: int) -> int:
+        return (size + 7) & ~7
+
+    @staticmethod
+    def _typecode(values) -> str:
+        # Arrays of a shared catalog are memoryviews cast to the array typecode
+        return values.typecode if isinstance(values, array) else values.format
+
+    @classmethod
+    def encode(cls, header: Dict, arrays: Dict[str, array]) -> Tuple[bytes, int]:
+        """The prefix and header, padded to where the arrays start, and the size of the whole snapshot."""
+        sections, offset = {}, 0
+        for name, values in arrays.items():
+            sections[name] = [offset, len(values), cls._typecode(values)]
+            offset += cls._aligned(len(values) * values.itemsize)
+        header = dict(header, sections=sections, byteorder=sys.byteorder,
+                      itemsizes={cls._typecode(values): values.itemsize for values in arrays.values()})
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        head = cls._PREFIX.pack(cls.MAGIC, cls.FORMAT_VERSION, len(header_bytes)) + header_bytes
+        head += bytes(cls._aligned(len(head)) - len(head))
+        return head, len(head) + offset
+
+    @classmethod
+    def write(cls, path: str, header: Dict, arrays: Dict[str, array]):
+        """Writes atomically: readers see the old file or the complete new one."""
+        head, _ = cls.encode(header, arrays)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(head)
+            for values in arrays.values():
+                size = len(values) * values.itemsize
+                f.write(values.tobytes())
+                f.write(bytes(cls._aligned(size) - size))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def write_into(cls, buffer, head: bytes, arrays: Dict[str, array]):
+        """Copies an encoded snapshot into a buffer of the size encode() returned, e.g. shared memory."""
+        buffer[:len(head)] = head
+        offset = len(head)
+        for values in arrays.values():
+            size = len(values) * values.itemsize
+            with memoryview(values) as view, view.cast('B') as raw:
+                buffer[offset:offset + size] = raw
+            offset += cls._aligned(size)
+
+    @classmethod
+    def _parse(cls, buffer) -> Tuple[Dict, Dict[str, Tuple[int, int, str]]]:
+        """Checks the prefix and header; returns (header, name -> (start, stop, typecode) of each array)."""
+        magic, version, header_length = cls._PREFIX.unpack_from(buffer, 0)
+        if magic != cls.MAGIC or version != cls.FORMAT_VERSION:
+            raise ValueError("not a snapshot of this format version")
+        header = json.loads(bytes(buffer[cls._PREFIX.size:cls._PREFIX.size + header_length]))
+        if header["byteorder"] != sys.byteorder or any(array(typecode).itemsize != size
+                                                       for typecode, size in header["itemsizes"].items()):
+            raise ValueError("written on a platform with another byte order or item sizes")
+        data_start = cls._aligned(cls._PREFIX.size + header_length)
+        sections = {}
+        for name, (offset, length, typecode) in header["sections"].items():
+            start = data_start + offset
+            stop = start + length * array(typecode).itemsize
+            if stop > len(buffer):
+                raise ValueError("truncated")
+            sections[name] = (start, stop, typecode)
+        return header, sections
+
+    @classmethod
+    def read(cls, path: str) -> Tuple[Dict, Dict[str, array]]:
+        """Returns (header, arrays) copied out of views(); raises ValueError for a foreign or damaged file."""
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            header, views = cls.views(mapped)
+            try:
+                arrays = {}
+                for name, view in views.items():
+                    arrays[name] = values = array(view.format)
+                    with view.cast('B') as raw:
+                        values.frombytes(raw)
+            finally:
+                for view in views.values():
+                    view.release()  # the map can only close once nothing views it
+        return header, arrays
+
+    @classmethod
+    def views(cls, buffer) -> Tuple[Dict, Dict[str, memoryview]]:
+        """Returns (header, arrays) of a snapshot in memory as read-only views into buffer, copying nothing."""
+        header, sections = cls._parse(buffer)
+        with memoryview(buffer) as view:
+            readonly = view.toreadonly()
+        return header, {name: readonly[start:stop].cast(typecode)
+                        for name, (start, stop, typecode) in sections.items()}
+
+
+class SharedCatalog:
+    """Snapshots of a catalog in shared memory, replaced whole by generation.
+
+    Segment name holds a control block with the current generation, and
+    generation g lives in segment "name.g" in the CatalogSnapshot layout.
+    publish() writes a new generation completely before it switches the
+    control block to it and unlinks the previous one, so a reader never
+    sees a half-written catalog, and processes still mapping an old
+    generation keep it until they close it.
+    """
+
+    MAGIC = b"AUTOSHMC"
+    _CONTROL = struct.Struct("<8sQ")  # magic, current generation (0: nothing published yet)
+    ATTACH_RETRIES = 10  # Tries when generations are replaced faster than a reader opens them
+    _created_here: Set[str] = set()  # segments this process (or the one it forked from) created
+
+    def __init__(self, name: str, create: bool = False):
+        """create makes the control block (the publisher's side); otherwise it must exist."""
+        self.name = name
+        self._created = create
+        self._segments: Dict[int, shared_memory.SharedMemory] = {}  # the published generation, publisher only
+        if create:
+            self._control = self._create(name, self._CONTROL.size)
+            self._CONTROL.pack_into(self._control.buf, 0, self.MAGIC, 0)
+        else:
+            self._control = self._open(name)
+            if self._CONTROL.unpack_from(self._control.buf, 0)[0] != self.MAGIC:
+                self._control.close()
+                raise ValueError(f"{name} is not a shared catalog")
+
+    @classmethod
+    def _create(cls, name: str, size: int) -> shared_memory.SharedMemory:
+        segment = shared_memory.SharedMemory(name, create=True, size=size)
+        cls._created_here.add(name)
+        return segment
+
+    @classmethod
+    def _unlink(cls, segment: shared_memory.SharedMemory, name: str):
+        segment.close()
+        segment.unlink()
+        cls._created_here.discard(name)
+
+    @classmethod
+    def _open(cls, name: str) -> shared_memory.SharedMemory:
+        if sys.version_info >= (3, 13):
+            return shared_memory.SharedMemory(name, track=False)
+        # Before 3.13 opening a segment also registers it with the resource tracker, which then unlinks
+        # it when the process exits, under the publisher's feet. The tracker keeps one entry per name, so
+        # a segment created here stays registered: unlink() unregisters it once more itself.
+        segment = shared_memory.SharedMemory(name)
+        if name not in cls._created_here:
+            resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+    @property
+    def generation(self) -> int:
+        return self._CONTROL.unpack_from(self._control.buf, 0)[1]
+
+    def publish(self, header: Dict, arrays: Dict[str, array]) -> int:
+        """Makes header and arrays the next generation; returns its number."""
+        generation = self.generation + 1
+        head, size = CatalogSnapshot.encode(dict(header, generation=generation), arrays)
+        segment = self._create(f"{self.name}.{generation}", size)
+        try:
+            CatalogSnapshot.write_into(segment.buf, head, arrays)
+        except BaseException:
+            self._unlink(segment, f"{self.name}.{generation}")
+            raise
+        self._CONTROL.pack_into(self._control.buf, 0, self.MAGIC, generation)  # the swap
+        for previous_generation, previous in self._segments.items():
+            self._unlink(previous, f"{self.name}.{previous_generation}")
+        self._segments = {generation: segment}
+        return generation
+
+    def attach(self) -> Tuple[shared_memory.SharedMemory, Dict, Dict[str, memoryview]]:
+        """Maps the current generation: (segment, header, read-only views of the arrays).
+
+        The views keep the segment open; close it once they are all gone.
+        """
+        for _ in range(self.ATTACH_RETRIES):
+            generation = self.generation
+            if not generation:
+                raise ValueError(f"nothing published as {self.name} yet")
+            try:
+                segment = self._open(f"{self.name}.{generation}")
+            except FileNotFoundError:
+                continue  # replaced between reading the generation and opening it
+            try:
+                header, views = CatalogSnapshot.views(segment.buf)
+            except BaseException:
+                segment.close()
+                raise
+            if header.get("generation") == generation:
+                return segment, header, views
+            views = None
+            segment.close()
+        raise ValueError(f"{self.name} changed {self.ATTACH_RETRIES} times while attaching")
+
+    def close(self):
+        """Closes the control block; the publisher also unlinks it and its generation."""
+        for generation, segment in self._segments.items():
+            self._unlink(segment, f"{self.name}.{generation}")
+        self._segments = {}
+        if self._created:
+            self._unlink(self._control, self.name)
+        else:
+            self._control.close()
+
+
+class QueryCache:
+    """Bounded LRU cache (with optional TTL) for find_* results.
+
+    Every entry belongs to a tag, e.g. ("city", "москва"). Writes call
+    invalidate() with the tags they affect, which drops those entries and
+    bumps the tag's generation. put() refuses results computed against an
+    older generation, so a query racing with a write can't cache stale rows.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        if not isinstance(maxsize, int) or maxsize < 0:
+            raise InvalidInputError("Cache size must be a non-negative integer.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # key -> (tag, result, stored_at)
+        self._keys_by_tag: Dict[Hashable, set] = {}
+        self._generations: Dict[Hashable, int] = {}
+        self.generation_total = 0  # bumped by every invalidation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def generation(self, tag: Hashable) -> int:
+        return self._generations.get(tag, 0)
+
+    def get(self, key: Hashable) -> Optional[tuple]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            tag, result, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                self._discard(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: Hashable, tag: Hashable, generation: int, result: Iterable):
+        with self._lock:
+            if not self.maxsize or self._generations.get(tag, 0) != generation:
+                return
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (tag, tuple(result), time.monotonic())
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tag: Hashable, predicate: Optional[Callable[[Hashable], bool]] = None):
+        """Drops the entries of a tag (only those whose key matches predicate, if given)."""
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            self.generation_total += 1
+            for key in list(self._keys_by_tag.get(tag, ())):
+                if predicate is None or predicate(key):
+                    self._discard(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for tag in self._keys_by_tag:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            self.generation_total += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def _discard(self, key: Hashable):
+        tag = self._entries.pop(key)[0]
+        keys = self._keys_by_tag[tag]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_tag[tag]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "expirations": self.expirations,
+                    "invalidations": self.invalidations, "generation": self.generation_total}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ConnectionPool:
+    """Hands every thread its own SQLite connection, opened on first use.
+
+    Connections run in WAL mode, so readers keep going while a writer
+    commits. Writers are serialized through write_lock instead of
+    bouncing off SQLITE_BUSY.
+    """
+
+    PRAGMAS = {
+        "busy_timeout": 5000,  # ms to wait for other processes' locks; first, so the others wait too
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",  # durable across application crashes, fsync only at checkpoints
+        "cache_size": -65536,  # KiB, i.e. 64 MiB page cache per connection
+        "mmap_size": 268435456,  # read through a 256 MiB memory map
+        "temp_store": "MEMORY",
+    }
+
+    def __init__(self, db_path: str, setup: Optional[Callable[[sqlite3.Connection], None]] = None,
+                 pragmas: Optional[Dict[str, object]] = None, uri: bool = False):
+        self.db_path = db_path
+        self.uri = uri
+        self.pragmas = dict(self.PRAGMAS, **(pragmas or {}))
+        self._setup = setup
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self.write_lock = threading.RLock()
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread is off only so close_all() can run from any thread
+            conn = sqlite3.connect(self.db_path, uri=self.uri, check_same_thread=False)
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            if self._setup:
+                self._setup(conn)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def apply(self, setup: Callable[[sqlite3.Connection], None]):
+        """Runs setup on every connection opened so far."""
+        with self._connections_lock:
+            for conn in self._connections:
+                setup(conn)
+
+    @contextmanager
+    def cursor(self) -> Iterator[sqlite3.Cursor]:
+        """A short-lived cursor on the calling thread's connection."""
+        cursor = self.connection().cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """A cursor for writing; commits on success, rolls back on error."""
+        with self.write_lock:
+            conn = self.connection()
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def close_all(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class Histogram:
+    """Cumulative bucket counts (for Prometheus) plus a window of recent samples (for percentiles)."""
+
+    LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                       2.5, 5.0, 10.0)
+    SIZE_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, bounds: Tuple[float, ...], window: int = 1024):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def percentiles(self) -> Dict[str, Optional[float]]:
+        ordered = sorted(self.recent)
+        return {f"p{round(q * 100)}": ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+                for q in self.QUANTILES}
+
+    def snapshot(self) -> Dict:
+        return dict(count=self.count, sum=self.total, **self.percentiles())
+
+
+class Metrics:
+    """Opt-in instrumentation for AutoSells (see AutoSells.enable_metrics).
+
+    wrap() times a method and counts its calls, errors and result sizes.
+    install() hooks a connection: the trace callback marks where each SQL
+    statement starts, so a statement is timed until the next one starts on
+    that thread or the instrumented call returns, and the progress handler
+    counts the virtual machine steps it took.
+    """
+
+    SQL_STATEMENT_LIMIT = 500  # distinct statements tracked, the rest are counted under "other"
+    PROGRESS_STEPS = 1000  # VM instructions between progress handler calls
+    _LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+    def __init__(self, slow_query_seconds: float = 0.1, slow_log_size: int = 100):
+        self.slow_query_seconds = slow_query_seconds
+        self.methods: Dict[str, Dict] = {}
+        self.sql: Dict[str, Dict] = {}
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self._statement = threading.local()  # [sql, started, vm_steps] of the thread's running statement
+
+    def wrap(self, name: str, method: Callable) -> Callable:
+        @wraps(method)
+        def instrumented(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                self.finish_statement()
+                self.record_call(name, time.perf_counter() - started, error=type(e).__name__)
+                raise
+            if isinstance(result, GeneratorType):
+                return self._instrumented_iterator(name, result, started)
+            self.finish_statement()
+            self.record_call(name, time.perf_counter() - started,
+                             size=len(result) if hasattr(result, "__len__") else None)
+            return result
+        return instrumented
+
+    def _instrumented_iterator(self, name: str, iterator: Iterator, started: float) -> Iterator:
+        # Streaming methods are timed until the consumer finishes or drops the iterator
+        count, error = 0, None
+        try:
+            for item in iterator:
+                count += 1
+                yield item
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.finish_statement()
+            self.record_call(name, time.perf_counter() - started, size=count, error=error)
+
+    def record_call(self, name: str, seconds: float, size: Optional[int] = None, error: Optional[str] = None):
+        with self._lock:
+            stats = self.methods.get(name)
+            if stats is None:
+                stats = self.methods[name] = {"calls": 0, "errors": {}, "latency": Histogram(Histogram.LATENCY_BUCKETS),
+                                              "result_size": Histogram(Histogram.SIZE_BUCKETS)}
+            stats["calls"] += 1
+            stats["latency"].observe(seconds)
+            if error is not None:
+                stats["errors"][error] = stats["errors"].get(error, 0) + 1
+            elif size is not None:
+                stats["result_size"].observe(size)
+
+    def install(self, conn: sqlite3.Connection):
+        conn.set_trace_callback(self._on_statement)
+        conn.set_progress_handler(self._on_progress, self.PROGRESS_STEPS)
+
+    @staticmethod
+    def uninstall(conn: sqlite3.Connection):
+        conn.set_trace_callback(None)
+        conn.set_progress_handler(None, 0)
+
+    def _on_statement(self, sql: str):
+        now = time.perf_counter()
+        self.finish_statement(now)
+        self._statement.current = [sql, now, 0]
+
+    def _on_progress(self) -> int:
+        current = getattr(self._statement, "current", None)
+        if current is not None:
+            current[2] += self.PROGRESS_STEPS
+        return 0  # non-zero would abort the statement
+
+    def finish_statement(self, now: Optional[float] = None):
+        """Closes the calling thread's running statement, if any."""
+        current = getattr(self._statement, "current", None)
+        if current is None:
+            return
+        self._statement.current = None
+        sql, started, steps = current
+        seconds = (now or time.perf_counter()) - started
+        statement = self._LITERALS.sub("?", " ".join(sql.split()))
+        with self._lock:
+            if statement not in self.sql and len(self.sql) >= self.SQL_STATEMENT_LIMIT:
+                statement = "other"
+            stats = self.sql.get(statement)
+            if stats is None:
+                stats = self.sql[statement] = {"calls": 0, "vm_steps": 0,
+                                               "latency": Histogram(Histogram.LATENCY_BUCKETS)}
+            stats["calls"] += 1
+            stats["vm_steps"] += steps
+            stats["latency"].observe(seconds)
+            if seconds >= self.slow_query_seconds:
+                self.slow_queries.append({"sql": sql, "seconds": seconds, "vm_steps": steps, "at": time.time()})
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "methods": {name: {"calls": stats["calls"], "errors": dict(stats["errors"]),
+                                   "latency": stats["latency"].snapshot(),
+                                   "result_size": stats["result_size"].snapshot()}
+                            for name, stats in self.methods.items()},
+                "sql": {statement: {"calls": stats["calls"], "vm_steps": stats["vm_steps"],
+                                    "latency": stats["latency"].snapshot()}
+                        for statement, stats in self.sql.items()},
+                "slow_queries": list(self.slow_queries),
+            }
+
+    @staticmethod
+    def _label(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    @classmethod
+    def _histogram_lines(cls, metric: str, labels: str, histogram: Histogram) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"{metric}_sum{{{labels}}} {histogram.total}")
+        lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+        return lines
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        with self._lock:
+            methods = sorted(self.methods.items())
+            statements = sorted(self.sql.items())
+            lines = ["# HELP autosells_calls_total Calls per AutoSells method.", "# TYPE autosells_calls_total counter"]
+            lines += [f'autosells_calls_total{{method="{name}"}} {stats["calls"]}' for name, stats in methods]
+            lines += ["# HELP autosells_errors_total Failed calls per AutoSells method and exception.",
+                      "# TYPE autosells_errors_total counter"]
+            lines += [f'autosells_errors_total{{method="{name}",error="{error}"}} {count}'
+                      for name, stats in methods for error, count in sorted(stats["errors"].items())]
+            lines += ["# HELP autosells_latency_seconds AutoSells method latency.",
+                      "# TYPE autosells_latency_seconds histogram"]
+            for name, stats in methods:
+                lines += self._histogram_lines("autosells_latency_seconds", f'method="{name}"', stats["latency"])
+            lines += ["# HELP autosells_result_size Items returned per AutoSells call.",
+                      "# TYPE autosells_result_size histogram"]
+            for name, stats in methods:
+                lines += self._histogram_lines("autosells_result_size", f'method="{name}"', stats["result_size"])
+            lines += ["# HELP autosells_sql_seconds Time per SQL statement.", "# TYPE autosells_sql_seconds summary"]
+            for statement, stats in statements:
+                label = f'statement="{self._label(statement)}"'
+                histogram = stats["latency"]
+                for q, value in zip(Histogram.QUANTILES, histogram.percentiles().values()):
+                    if value is not None:
+                        lines.append(f'autosells_sql_seconds{{{label},quantile="{q}"}} {value}')
+                lines.append(f"autosells_sql_seconds_sum{{{label}}} {histogram.total}")
+                lines.append(f"autosells_sql_seconds_count{{{label}}} {histogram.count}")
+            lines += ["# HELP autosells_sql_vm_steps_total SQLite VM steps per statement (approximate).",
+                      "# TYPE autosells_sql_vm_steps_total counter"]
+            lines += [f'autosells_sql_vm_steps_total{{statement="{self._label(statement)}"}} {stats["vm_steps"]}'
+                      for statement, stats in statements]
+        return "\n".join(lines) + "\n"
+
+
+class AbstractAutoSells(ABC):
+    @abstractmethod
+    def add_city(self, city: City):
+        pass
+
+    @abstractmethod
+    def add_automarket(self, automarket: AutoMarket):
+        pass
+
+    @abstractmethod
+    def add_auto(self, auto: Auto):
+        pass
+
+    @abstractmethod
+    def add_cities_bulk(self, cities: Iterable[City]):
+        pass
+
+    @abstractmethod
+    def add_automarkets_bulk(self, automarkets: Iterable[AutoMarket]):
+        pass
+
+    @abstractmethod
+    def add_autos_bulk(self, autos: Iterable[Auto]):
+        pass
+
+    @abstractmethod
+    def find_autos_by_city(self, city_name: str):
+        pass
+
+    @abstractmethod
+    def find_autos_by_price_range(self, min_price: float, max_price: float):
+        pass
+
+    @abstractmethod
+    def find_cheapest_autos(self, count: int):
+        pass
+
+    @abstractmethod
+    def find_most_expensive_autos(self, count: int):
+        pass
+
+    @abstractmethod
+    def find_autos_by_automarket(self, automarket_name: str):
+        pass
+
+    @abstractmethod
+    def find_autos_by_year(self, year: int):
+        pass
+
+    @abstractmethod
+    def query(self, city: Optional[str] = None, automarket: Optional[str] = None,
+              price: Optional[Tuple[Optional[float], Optional[float]]] = None,
+              years: Optional[Tuple[int, int]] = None, order_by: Optional[str] = None,
+              limit: Optional[int] = None):
+        pass
+
+    @abstractmethod
+    def price_stats(self, by: str, key: int):
+        pass
+
+    @abstractmethod
+    def search_names(self, kind: str, text: str, mode: str = "prefix", limit: int = 10):
+        pass
+
+    @abstractmethod
+    def price_stats_by(self, by: str):
+        pass
+
+    @abstractmethod
+    def top_autos(self, by: str, key: int, count: int = 10, most_expensive: bool = False):
+        pass
+
+    @abstractmethod
+    def similar_autos(self, auto_id: int, count: Optional[int] = 20, radius: Optional[float] = None,
+                      same_city: bool = False):
+        pass
+
+    @abstractmethod
+    def iter_autos(self, after_pk: Optional[int] = None, page_size: int = 1000):
+        pass
+
+    @abstractmethod
+    def iter_automarkets(self, after_pk: Optional[int] = None, page_size: int = 1000):
+        pass
+
+    @abstractmethod
+    def iter_cities(self, after_pk: Optional[int] = None, page_size: int = 1000):
+        pass
+
+    @abstractmethod
+    def list_all_autos(self):
+        pass
+
+    @abstractmethod
+    def list_all_automarkets(self):
+        pass
+
+    @abstractmethod
+    def list_all_cities(self):
+        pass
+
+    @abstractmethod
+    def menu(self):
+        pass
+
+
+class AutoSells(AbstractAutoSells):
+
+    _instances: Dict[Tuple[type, str], 'AutoSells'] = {}  # Static field: one instance per class and database
+    DATABASE_VERSION = 2.0  # Static field for database version; its integer part is the schema version
+    BULK_CHUNK_SIZE = 500  # Rows per executemany batch (also bounds the IN (...) list)
+    QUERY_ORDER_FIELDS = ("pk_auto", "price", "year_of_release")  # prefix with '-' for descending
+    PAGE_SIZE = 1000  # Default rows per page for the keyset-paginated iter_* / page_* methods
+    CHANGE_LOG_RETENTION = 100000  # ChangeLog rows kept for instances that refresh late
+    MIGRATION_BATCH_SIZE = 50000  # Rows backfilled per transaction by data migrations
+    TOP_N = 10  # Cheapest and most expensive autos kept per city/automarket/year for top_autos()
+    AGGREGATE_GROUPS = ("city", "automarket", "year")  # price_stats()/top_autos() group by these keys
+    NAME_KINDS = {"city": "Cities", "automarket": "AutoMarkets", "auto": "Autos"}  # search_names() kind -> table
+    WRITE_BEHIND_ROWS = 1000  # Most rows write-behind mode queues before it flushes
+    WRITE_BEHIND_INTERVAL = 1.0  # Seconds between background flushes in write-behind mode
+    HOT_CHECKPOINT_INTERVAL = 30.0  # Seconds between saves of the in-memory database in hot mode
+    HOT_CHECKPOINT_CHANGES = 10000  # ChangeLog entries that make hot mode save before the interval is up
+    HOT_CHECKPOINT_POLL = 0.5  # Seconds between the checkpoint thread's looks at the ChangeLog
+    # Readers of a shared-cache database fail with SQLITE_LOCKED instead of waiting for a writer;
+    # read_uncommitted lets them skip the table locks (writers are serialized by the pool's write_lock)
+    HOT_PRAGMAS = {"journal_mode": "MEMORY", "read_uncommitted": 1}
+    SEARCH_MODES = ("prefix", "substring", "fuzzy")
+    SIMILAR_COUNT = 20  # Autos similar_autos() returns by default
+    SIMILAR_FIRST_REACH = 0.125  # Distance lazy mode's first search box covers
+    SIMILAR_MAX_REACH = 2 ** 14  # Distance at which lazy mode's search box covers any price and date
+    # Table, primary key and the data columns whose changes go to the ChangeLog
+    _TRACKED_TABLES = (("Cities", "pk_city", ("pk_city", "name")),
+                       ("AutoMarkets", "pk_automarket", ("pk_automarket", "name", "fk_city")),
+                       ("Autos", "pk_auto", ("pk_auto", "name", "fk_automarket", "price", "year_of_release")))
+    # Schema v2: release dates as integers next to the ISO text (see _migrate_release_dates)
+    _RELEASE_DAY_SQL = "CAST(julianday({0}) - 1721424.5 AS INTEGER)"  # == date.toordinal()
+    _RELEASE_YEAR_SQL = "CAST(substr({0}, 1, 4) AS INTEGER)"
+    INSTRUMENTED_METHODS = tuple(sorted(AbstractAutoSells.__abstractmethods__ - {"menu"}))
+
+    # Lazy mode: queries used instead of the in-memory dictionaries
+    _AUTO_COLUMNS = "a.pk_auto, a.name, a.fk_automarket, a.price, a.release_day"
+    _AUTO_SELECT = f"SELECT {_AUTO_COLUMNS} FROM Autos a"
+    # CROSS JOIN pins the join order: filter the small tables first, then hit Autos by fk index
+    _AUTO_BY_CITY_SQL = (f"SELECT {_AUTO_COLUMNS} FROM Cities c"
+                         " CROSS JOIN AutoMarkets m ON m.fk_city = c.pk_city"
+                         " CROSS JOIN Autos a ON a.fk_automarket = m.pk_automarket"
+                         " WHERE py_lower(c.name) = ?")
+    _AUTO_BY_AUTOMARKET_SQL = (f"SELECT {_AUTO_COLUMNS} FROM AutoMarkets m"
+                               " CROSS JOIN Autos a ON a.fk_automarket = m.pk_automarket"
+                               " WHERE py_lower(m.name) = ?")
+    _AUTO_BY_YEAR_SQL = _AUTO_SELECT + " WHERE a.release_year = ?"
+    _AUTO_BY_PRICE_SQL = _AUTO_SELECT + " WHERE a.price BETWEEN ? AND ? ORDER BY a.price, a.pk_auto"
+    # Aggregate group -> (group column, FROM clause); an auto belongs to the city of its automarket
+    _GROUP_SQL = {"city": ("m.fk_city", "AutoMarkets m CROSS JOIN Autos a ON a.fk_automarket = m.pk_automarket"),
+                  "automarket": ("a.fk_automarket", "Autos a"),
+                  "year": ("a.release_year", "Autos a")}
+
+    def __new__(cls, db_path="autosells.db", *args, **kwargs):
+        key = (cls, os.path.abspath(db_path))
+        if key not in cls._instances:
+            cls._instances[key] = super().__new__(cls)
+        return cls._instances[key]
+
+
+    def __init__(self, db_path="autosells.db", lazy: bool = False, columnar: bool = False,
+                 cache_size: int = 256, cache_ttl: Optional[float] = None,
+                 metrics: bool = False, snapshot: Optional[str] = None, write_behind: bool = False,
+                 flush_rows: int = WRITE_BEHIND_ROWS, flush_interval: Optional[float] = WRITE_BEHIND_INTERVAL,
+                 hot: bool = False, checkpoint_interval: Optional[float] = HOT_CHECKPOINT_INTERVAL,
+                 checkpoint_changes: Optional[int] = HOT_CHECKPOINT_CHANGES,
+                 shared: Optional[str] = None): # Changed extension to .db
+        if hasattr(self, '_is_initialized'):
+            return  # Prevent re-initialization
+        if write_behind and lazy:
+            raise InvalidInputError("Write-behind mode needs the in-memory catalog, it cannot be lazy.")
+        if shared is not None and (lazy or write_behind or hot):
+            raise InvalidInputError("A shared catalog is read-only and in memory, it cannot be lazy, "
+                                    "write-behind or hot.")
+        if not isinstance(flush_rows, int) or flush_rows <= 0:
+            raise InvalidInputError("Flush rows must be a positive integer.")
+        if flush_interval is not None and (not isinstance(flush_interval, (int, float)) or flush_interval <= 0):
+            raise InvalidInputError("Flush interval must be a positive number.")
+        if checkpoint_interval is not None and (not isinstance(checkpoint_interval, (int, float))
+                                                or checkpoint_interval <= 0):
+            raise InvalidInputError("Checkpoint interval must be a positive number.")
+        if checkpoint_changes is not None and (not isinstance(checkpoint_changes, int) or checkpoint_changes <= 0):
+            raise InvalidInputError("Checkpoint changes must be a positive integer.")
+        self.db_path = db_path
+        self.metrics: Optional[Metrics] = None  # set by enable_metrics()
+        self._cache = QueryCache(cache_size, cache_ttl)  # find_autos_by_* results
+        self.lazy = lazy  # Answer queries with indexed SQL instead of loading every row
+        self.columnar = columnar or shared is not None  # Keep autos in AutoColumns instead of a dict of dataclasses
+        # Write-behind: add_* update memory at once and queue their INSERTs for a grouped commit, so up to
+        # flush_rows rows or flush_interval seconds of writes are lost if the process dies
+        self.write_behind = write_behind
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._pending: List[Tuple[str, tuple]] = []  # (INSERT statement, row) in call order, parents first
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_stop = threading.Event()
+        # Hot mode: every query and write goes to an in-memory copy of db_path, saved back by checkpoint()
+        self.hot = hot
+        self._hot_conn: Optional[sqlite3.Connection] = None  # keeps the in-memory database alive
+        self._saved_seq: Optional[int] = None  # ChangeLog position of the last checkpoint, None before the first
+        self._checkpointer: Optional[threading.Thread] = None
+        self._checkpointer_stop = threading.Event()
+        # Shared mode: the catalog is mapped read-only from the SharedCatalog another AutoSells publishes
+        self.shared = shared
+        self._shared_catalog: Optional[SharedCatalog] = None
+        self._shared_segment: Optional[shared_memory.SharedMemory] = None  # the generation mapped now
+        self._retired_segments: List[shared_memory.SharedMemory] = []  # older ones still in use
+        self._shared_generation = 0
+        self._published: Dict[str, SharedCatalog] = {}  # name -> catalog this instance publishes
+        self._publisher: Optional[threading.Thread] = None
+        self._publisher_stop = threading.Event()
+        self._lock = threading.RLock()  # Guards the in-memory catalog; writers hold it for the whole add_*
+        try:
+            if hot:
+                self._pool = self._open_hot_database()
+            else:
+                self._pool = ConnectionPool(self.db_path, setup=self._setup_connection)  # Per-thread connections
+            if metrics:
+                self.enable_metrics()
+            self._create_tables() # Creates Tables.
+            self._migrate()
+
+            self.cities: Dict[int, City] = {}
+            self.automarkets: Dict[int, AutoMarket] = {}
+            self.autos: Dict[int, Auto] = AutoColumns() if columnar else {}
+
+            # Secondary indexes: lower-cased name -> ids, parent id -> child ids
+            self._city_ids_by_name: Dict[str, List[int]] = {}
+            self._market_ids_by_name: Dict[str, List[int]] = {}
+            self._market_ids_by_city: Dict[int, List[int]] = {}
+            self._auto_ids_by_market: Dict[int, array] = {}
+            self._auto_ids_by_year: Dict[int, array] = {}
+            self._price_index = PriceIndex()
+            self._query_columns: Optional[AutoColumns] = None  # column copy of a dict catalog for query()
+            # Group -> key -> AutoAggregate; None until built, then kept current by _index_*/_unindex_*
+            self._aggregates: Optional[Dict[str, Dict[int, AutoAggregate]]] = None
+            # Kind -> NameIndex, built by the first search_names() and then kept current like the indexes
+            self._name_indexes: Optional[Dict[str, NameIndex]] = None
+            # City pk (None: every auto) -> SimilarityGrid, built by the first similar_autos() there
+            self._similarity_grids: Dict[Optional[int], SimilarityGrid] = {}
+            self._change_seq = self._last_change_seq()  # ChangeLog position the catalog reflects
+            self._poller: Optional[threading.Thread] = None
+            self._poller_stop = threading.Event()
+            if shared is not None:
+                self._shared_catalog = self._open_shared_catalog(shared)
+                self._attach_shared()
+            elif not self.lazy and (snapshot is None or not self._load_snapshot(snapshot)):
+                self._load_data() # Load data from the database into the dictionaries
+                if snapshot is not None:
+                    try:
+                        self.save_snapshot(snapshot)  # so the next start can map it
+                    except DatabaseError as e:
+                        print(f"Error saving snapshot: {e}")
+            if write_behind and flush_interval is not None:
+                self._flusher = threading.Thread(target=self._flush_periodically, args=(flush_interval,),
+                                                 name="autosells-flush", daemon=True)
+                self._flusher.start()
+            if hot and (checkpoint_interval is not None or checkpoint_changes is not None):
+                self._checkpointer = threading.Thread(target=self._checkpoint_periodically,
+                                                      args=(checkpoint_interval, checkpoint_changes),
+                                                      name="autosells-checkpoint", daemon=True)
+                self._checkpointer.start()
+            if hot or write_behind:
+                atexit.register(self.close)  # interpreter shutdown still saves what only memory holds
+
+            self._is_initialized = True
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to connect to database: {e}")
+
+    def _open_hot_database(self) -> ConnectionPool:
+        """Copies db_path into a shared-cache in-memory database with the backup API; returns its pool."""
+        uri = f"file:autosells-hot-{id(self)}?mode=memory&cache=shared"
+        self._hot_conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        if os.path.exists(self.db_path):
+            disk = sqlite3.connect(self.db_path)
+            try:
+                disk.backup(self._hot_conn)
+            finally:
+                disk.close()
+        return ConnectionPool(uri, setup=self._setup_connection, pragmas=self.HOT_PRAGMAS, uri=True)
+
+    def checkpoint(self) -> bool:
+        """Saves the in-memory database of hot mode to db_path; False if nothing changed since the last save.
+
+        The backup API writes the file in one transaction, so a crash while
+        saving leaves the previous save intact. Writers wait meanwhile.
+        """
+        if not self.hot:
+            raise InvalidInputError("Only hot mode has an in-memory database to checkpoint.")
+        self.flush()
+        with self._pool.write_lock:
+            if self._hot_conn is None:
+                return False
+            seq = self._last_change_seq()
+            if seq == self._saved_seq:
+                return False
+            try:
+                disk = sqlite3.connect(self.db_path)
+                try:
+                    self._hot_conn.backup(disk)
+                finally:
+                    disk.close()
+            except sqlite3.Error as e:
+                raise DatabaseError(f"Failed to save {self.db_path}: {e}")
+            self._saved_seq = seq
+            return True
+
+    def _checkpoint_periodically(self, interval: Optional[float], changes: Optional[int]):
+        last_save = time.monotonic()
+        while not self._checkpointer_stop.wait(min(interval or self.HOT_CHECKPOINT_POLL, self.HOT_CHECKPOINT_POLL)):
+            try:
+                due = interval is not None and time.monotonic() - last_save >= interval
+                if not due and changes is not None:
+                    due = self._saved_seq is None or self._last_change_seq() - self._saved_seq >= changes
+                if due:
+                    self.checkpoint()
+                    last_save = time.monotonic()
+            except BaseError as e:
+                print(f"Error saving checkpoint: {e}")
+
+    def _setup_connection(self, conn: sqlite3.Connection):
+        # SQLite's lower() only folds ASCII, names here are mostly Cyrillic
+        conn.create_function("py_lower", 1, lambda value: value.lower() if value is not None else None,
+                             deterministic=True)
+        if self.metrics is not None:
+            self.metrics.install(conn)
+
+    def enable_metrics(self, slow_query_seconds: float = 0.1) -> Metrics:
+        """Starts collecting metrics; until then the methods run unwrapped, at no cost."""
+        if self.metrics is None:
+            self.metrics = Metrics(slow_query_seconds)
+            for name in self.INSTRUMENTED_METHODS:
+                # Instance attributes shadow the class methods, so disabling just deletes them
+                setattr(self, name, self.metrics.wrap(name, getattr(self, name)))
+            self._pool.apply(self.metrics.install)
+        return self.metrics
+
+    def disable_metrics(self):
+        if self.metrics is not None:
+            for name in self.INSTRUMENTED_METHODS:
+                self.__dict__.pop(name, None)
+            self._pool.apply(Metrics.uninstall)
+            self.metrics = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The calling thread's connection."""
+        return self._pool.connection()
+
+    def _load_data(self):
+        """Loads data from the database into the dictionaries."""
+        try:
+            # Taken before reading, so changes made during the load are applied again by refresh()
+            self._change_seq = self._last_change_seq()
+            self.cities = self._load_cities()
+            self.automarkets = self._load_automarkets()
+            self.autos = self._load_autos()
+        except DatabaseError as e:
+            print(f"Error loading data: {e}")
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """Rebuilds the secondary indexes and aggregates from the dictionaries."""
+        self._query_columns = None
+        self._aggregates = None
+        self._name_indexes = None
+        self._similarity_grids = {}
+        self._cache.clear()
+        self._city_ids_by_name = {}
+        self._market_ids_by_name = {}
+        self._market_ids_by_city = {}
+        self._auto_ids_by_market = {}
+        self._auto_ids_by_year = {}
+        for city in self.cities.values():
+            self._index_city(city)
+        for automarket in self.automarkets.values():
+            self._index_automarket(automarket)
+        if isinstance(self.autos, AutoColumns):
+            index_keys = self.autos.index_keys()
+        else:
+            index_keys = ((auto.pk_auto, auto.fk_automarket, auto.year_of_release.year)
+                          for auto in self.autos.values())
+        for auto_id, market_id, year in index_keys:
+            self._auto_ids_by_market.setdefault(market_id, array('q')).append(auto_id)
+            self._auto_ids_by_year.setdefault(year, array('q')).append(auto_id)
+        # one sort instead of n inserts
+        if isinstance(self.autos, AutoColumns):
+            self._price_index = PriceIndex.from_columns(self.autos.prices, self.autos.pks)
+        else:
+            self._price_index = PriceIndex(self.autos.values())
+        self._build_aggregates()
+
+    def _index_city(self, city: City):
+        self._city_ids_by_name.setdefault(city.name.lower(), []).append(city.pk_city)
+        self._index_name("city", city.name)
+
+    def _index_automarket(self, automarket: AutoMarket):
+        self._market_ids_by_name.setdefault(automarket.name.lower(), []).append(automarket.pk_automarket)
+        self._market_ids_by_city.setdefault(automarket.fk_city, []).append(automarket.pk_automarket)
+        self._mark_city_aggregate_stale(automarket)
+        self._similarity_grids.pop(automarket.fk_city, None)  # its autos move with it
+        self._index_name("automarket", automarket.name)
+
+    def _index_auto(self, auto: Auto):
+        self._auto_ids_by_market.setdefault(auto.fk_automarket, array('q')).append(auto.pk_auto)
+        self._auto_ids_by_year.setdefault(auto.year_of_release.year, array('q')).append(auto.pk_auto)
+        self._price_index.add(auto)
+        self._query_columns = None
+        self._aggregate_auto(auto)
+        self._grid_auto(auto)
+        self._index_name("auto", auto.name)
+
+    def _index_autos(self, autos: List[Auto]):
+        for auto in autos:
+            self._auto_ids_by_market.setdefault(auto.fk_automarket, array('q')).append(auto.pk_auto)
+            self._auto_ids_by_year.setdefault(auto.year_of_release.year, array('q')).append(auto.pk_auto)
+            self._aggregate_auto(auto)
+            self._grid_auto(auto)
+            self._index_name("auto", auto.name)
+        self._price_index.add_many(autos)
+        self._query_columns = None
+
+    @staticmethod
+    def _discard_id(index: Dict, key, item_id: int):
+        ids = index.get(key)
+        if ids is not None and item_id in ids:
+            ids.remove(item_id)
+            if not ids:
+                del index[key]
+
+    def _unindex_city(self, city: City):
+        self._discard_id(self._city_ids_by_name, city.name.lower(), city.pk_city)
+        self._index_name("city", city.name, remove=True)
+
+    def _unindex_automarket(self, automarket: AutoMarket):
+        self._discard_id(self._market_ids_by_name, automarket.name.lower(), automarket.pk_automarket)
+        self._discard_id(self._market_ids_by_city, automarket.fk_city, automarket.pk_automarket)
+        self._mark_city_aggregate_stale(automarket)
+        self._similarity_grids.pop(automarket.fk_city, None)
+        self._index_name("automarket", automarket.name, remove=True)
+
+    def _unindex_auto(self, auto: Auto):
+        self._discard_id(self._auto_ids_by_market, auto.fk_automarket, auto.pk_auto)
+        self._discard_id(self._auto_ids_by_year, auto.year_of_release.year, auto.pk_auto)
+        self._price_index.remove(auto)
+        self._query_columns = None
+        self._aggregate_auto(auto, remove=True)
+        self._grid_auto(auto, remove=True)
+        self._index_name("auto", auto.name, remove=True)
+
+    def _grid_auto(self, auto: Auto, remove: bool = False):
+        if not self._similarity_grids:
+            return
+        automarket = self.automarkets.get(auto.fk_automarket)
+        for key in (None, automarket.fk_city) if automarket is not None else (None,):
+            grid = self._similarity_grids.get(key)
+            if grid is None:
+                continue
+            if remove:
+                grid.remove(auto.pk_auto, auto.price, auto.year_of_release.toordinal())
+            else:
+                grid.add(auto.pk_auto, auto.price, auto.year_of_release.toordinal())
+
+    def _similarity_grid(self, city_id: Optional[int]) -> SimilarityGrid:
+        """The grid of one city's autos (None: all autos), built on first use; call with the lock held."""
+        grid = self._similarity_grids.get(city_id)
+        if grid is None:
+            if city_id is None:
+                auto_ids = iter(self.autos)
+            else:
+                auto_ids = (auto_id for market_id in self._market_ids_by_city.get(city_id, ())
+                            for auto_id in self._auto_ids_by_market.get(market_id, ()))
+            if isinstance(self.autos, AutoColumns):
+                columns = self.autos
+                positions = (bisect_left(columns.pks, auto_id) for auto_id in auto_ids)
+                points = ((columns.pks[pos], columns.prices[pos], columns.days[pos]) for pos in positions)
+            else:
+                points = ((auto.pk_auto, auto.price, auto.year_of_release.toordinal())
+                          for auto in map(self.autos.__getitem__, auto_ids))
+            grid = self._similarity_grids[city_id] = SimilarityGrid(points)
+        return grid
+
+    def _build_name_indexes(self):
+        if self.lazy:
+            # Only the distinct names come back, not the rows
+            self._name_indexes = {kind: NameIndex(counts=dict(self._fetch_all(
+                f"SELECT name, COUNT(*) FROM {table} GROUP BY name")))
+                for kind, table in self.NAME_KINDS.items()}
+            return
+        if isinstance(self.autos, AutoColumns):
+            names = self.autos._names
+            auto_names = NameIndex(counts={names[name_id]: count
+                                           for name_id, count in Counter(self.autos.name_ids).items()})
+        else:
+            auto_names = NameIndex(auto.name for auto in self.autos.values())
+        self._name_indexes = {"city": NameIndex(city.name for city in self.cities.values()),
+                              "automarket": NameIndex(automarket.name for automarket in self.automarkets.values()),
+                              "auto": auto_names}
+
+    def _index_name(self, kind: str, name: str, remove: bool = False):
+        if self._name_indexes is not None:
+            if remove:
+                self._name_indexes[kind].remove(name)
+            else:
+                self._name_indexes[kind].add(name)
+
+    def _aggregate_ids(self, auto_ids: Iterable[int]) -> AutoAggregate:
+        if isinstance(self.autos, AutoColumns):
+            # Only the kept autos become Auto objects
+            columns = self.autos
+            pks = columns.pks
+            positions = [bisect_left(pks, auto_id) for auto_id in auto_ids]  # indexed ids are all present
+            return AutoAggregate.from_prices([columns.prices[pos] for pos in positions],
+                                             lambda i: columns._auto_at(positions[i]), self.TOP_N)
+        autos = [self.autos[auto_id] for auto_id in auto_ids]
+        return AutoAggregate.from_prices([auto.price for auto in autos], autos.__getitem__, self.TOP_N)
+
+    def _city_aggregate(self, city_id: int) -> AutoAggregate:
+        aggregate = AutoAggregate(self.TOP_N)
+        for market_id in self._market_ids_by_city.get(city_id, ()):
+            market_aggregate = self._group_aggregate("automarket", market_id)
+            if market_aggregate is not None:
+                aggregate.merge(market_aggregate)
+        return aggregate
+
+    def _build_aggregates(self):
+        """Builds the aggregates from the automarket and year indexes, then the cities from their markets."""
+        self._aggregates = {
+            "city": {},
+            "automarket": {key: self._aggregate_ids(ids) for key, ids in self._auto_ids_by_market.items()},
+            "year": {key: self._aggregate_ids(ids) for key, ids in self._auto_ids_by_year.items()},
+        }
+        self._aggregates["city"] = {city_id: self._city_aggregate(city_id) for city_id in self._market_ids_by_city}
+
+    def _aggregate_keys(self, auto: Auto) -> List[Tuple[str, int]]:
+        keys = [("automarket", auto.fk_automarket), ("year", auto.year_of_release.year)]
+        automarket = self.automarkets.get(auto.fk_automarket)
+        if automarket is not None:
+            keys.append(("city", automarket.fk_city))
+        return keys
+
+    def _aggregate_auto(self, auto: Auto, remove: bool = False):
+        if self._aggregates is None:
+            return
+        for by, key in self._aggregate_keys(auto):
+            groups = self._aggregates[by]
+            aggregate = groups.get(key)
+            if remove:
+                if aggregate is not None:
+                    aggregate.remove(auto)
+            else:
+                if aggregate is None:
+                    aggregate = groups[key] = AutoAggregate(self.TOP_N)
+                aggregate.add(auto)
+
+    def _mark_city_aggregate_stale(self, automarket: AutoMarket):
+        # A market joining or leaving a city moves all of its autos
+        if self._aggregates is not None and automarket.pk_automarket in self._aggregates["automarket"]:
+            self._aggregates["city"].setdefault(automarket.fk_city, AutoAggregate(self.TOP_N)).stale = True
+
+    def _group_autos(self, by: str, key: int) -> Iterator[Auto]:
+        if by == "city":
+            auto_ids = (auto_id for market_id in self._market_ids_by_city.get(key, ())
+                        for auto_id in self._auto_ids_by_market.get(market_id, ()))
+        else:
+            auto_ids = (self._auto_ids_by_market if by == "automarket" else self._auto_ids_by_year).get(key, ())
+        return (self.autos[auto_id] for auto_id in auto_ids)
+
+    def _group_aggregate(self, by: str, key: int) -> Optional[AutoAggregate]:
+        """The current aggregate of one group (None if empty); call with the lock held."""
+        if self._aggregates is None:
+            self._build_aggregates()
+        groups = self._aggregates[by]
+        aggregate = groups.get(key)
+        if aggregate is not None and aggregate.stale:
+            if by == "city":
+                aggregate = self._city_aggregate(key)
+            else:
+                index = self._auto_ids_by_market if by == "automarket" else self._auto_ids_by_year
+                aggregate = self._aggregate_ids(index.get(key, ()))
+            groups[key] = aggregate
+        if aggregate is not None and not aggregate.count:
+            del groups[key]
+            return None
+        return aggregate
+
+
+    def _load_cities(self):
+        try:
+            with self._pool.cursor() as cursor:
+                cursor.execute("SELECT pk_city, name FROM Cities")
+                rows = cursor.fetchall()
+            return {row[0]: City(pk_city=row[0], name=row[1]) for row in rows}
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to load cities: {e}")
+
+    def _load_automarkets(self):
+        try:
+            with self._pool.cursor() as cursor:
+                cursor.execute("SELECT pk_automarket, name, fk_city FROM AutoMarkets")
+                rows = cursor.fetchall()
+            return {row[0]: AutoMarket(pk_automarket=row[0], name=row[1], fk_city=row[2]) for row in rows}
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to load automarkets: {e}")
+
+    def _load_autos(self):
+        try:
+            with self._pool.cursor() as cursor:
+                cursor.execute("SELECT pk_auto, name, fk_automarket, price, release_day FROM Autos")
+                if self.columnar:
+                    # Stream rows straight into the columns, no per-row Auto objects
+                    columns = AutoColumns()
+                    for row in cursor:
+                        columns.append_row(row[0], row[1], row[2], row[3], row[4])
+                    return columns
+                rows = cursor.fetchall()
+            return {row[0]: self._auto_from_row(row) for row in rows}
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to load autos: {e}")
+        except ValueError as e:
+            raise DatabaseError(f"Failed to parse date: {e}")
+
+
+    @staticmethod
+    def _auto_from_row(row) -> Auto:
+        return Auto(pk_auto=row[0], name=row[1], fk_automarket=row[2], price=row[3],
+                    year_of_release=date.fromordinal(row[4]))
+
+    def _fetch_autos(self, sql: str, params: tuple = ()) -> List[Auto]:
+        """Runs an Autos query and materializes only the returned rows."""
+        try:
+            with self._pool.cursor() as cursor:
+                return [self._auto_from_row(row) for row in cursor.execute(sql, params)]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to query autos: {e}")
+        except ValueError as e:
+            raise DatabaseError(f"Failed to parse date: {e}")
+
+    def _fetch_all(self, sql: str, params: tuple = ()) -> list:
+        try:
+            with self._pool.cursor() as cursor:
+                return cursor.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Database error: {e}")
+
+    def _create_tables(self):
+        try:
+            with self._pool.transaction() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS Cities (
+                        pk_city INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL
+                    )
+                """)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS AutoMarkets (
+                        pk_automarket INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        fk_city INTEGER NOT NULL,
+                        FOREIGN KEY (fk_city) REFERENCES Cities (pk_city)
+                    )
+                """)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS Autos (
+                        pk_auto INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        fk_automarket INTEGER NOT NULL,
+                        price REAL NOT NULL,
+                        year_of_release TEXT NOT NULL,  -- Store date as TEXT (ISO format)
+                        FOREIGN KEY (fk_automarket) REFERENCES AutoMarkets (pk_automarket)
+                    )
+                """)
+                # Indexes backing the lazy-mode queries (joins, price bands, release year)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_automarkets_fk_city ON AutoMarkets (fk_city)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_autos_fk_automarket ON Autos (fk_automarket)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_autos_price ON Autos (price)")
+                # Triggers log every changed primary key, so refresh() can reload just those rows
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS ChangeLog (
+                        seq INTEGER PRIMARY KEY AUTOINCREMENT,  -- never reused, even after pruning
+                        table_name TEXT NOT NULL,
+                        pk INTEGER NOT NULL
+                    )
+                """)
+                for table_name, pk_column, columns in self._TRACKED_TABLES:
+                    for event in ("INSERT", "UPDATE", "DELETE"):
+                        cursor.execute(self._change_log_trigger_sql(table_name, pk_column, columns, event))
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to create tables: {e}")
+
+    @staticmethod
+    def _change_log_trigger_sql(table_name: str, pk_column: str, columns: Tuple[str, ...], event: str) -> str:
+        row = "OLD" if event == "DELETE" else "NEW"
+        # An update that changes the primary key also removes the old one
+        old_pk = (f"INSERT INTO ChangeLog (table_name, pk) SELECT '{table_name}', OLD.{pk_column} "
+                  f"WHERE OLD.{pk_column} IS NOT NEW.{pk_column};" if event == "UPDATE" else "")
+        # Only the data columns, so derived columns filled by migrations and triggers aren't logged
+        on = f"UPDATE OF {', '.join(columns)}" if event == "UPDATE" else event
+        return f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table_name.lower()}_{event.lower()}
+            AFTER {on} ON {table_name}
+            BEGIN
+                {old_pk}
+                INSERT INTO ChangeLog (table_name, pk) VALUES ('{table_name}', {row}.{pk_column});
+            END
+        """
+
+    def _schema_version(self) -> int:
+        # Databases created before migrations existed have user_version 0 and the version 1 schema
+        return self._fetch_all("PRAGMA user_version")[0][0] or 1
+
+    def _migrations(self) -> List[Tuple[int, Callable[[], None]]]:
+        """(schema version, migration) pairs in order; each brings the previous version up to its own."""
+        return [(2, self._migrate_release_dates)]
+
+    def _migrate(self):
+        """Upgrades the schema in place to int(DATABASE_VERSION), recorded in PRAGMA user_version."""
+        version = self._schema_version()
+        target = int(self.DATABASE_VERSION)
+        if version > target:
+            raise DatabaseError(f"Database schema version {version} is newer than supported version {target}.")
+        for migration_version, migration in self._migrations():
+            if version < migration_version <= target:
+                migration()
+                try:
+                    with self._pool.transaction() as cursor:
+                        cursor.execute(f"PRAGMA user_version = {migration_version}")
+                except sqlite3.Error as e:
+                    raise DatabaseError(f"Failed to record schema version {migration_version}: {e}")
+                version = migration_version
+
+    def _migrate_release_dates(self):
+        """v2: integer release_day (date ordinal) and release_year columns with indexes.
+
+        Existing rows are backfilled in primary key batches of MIGRATION_BATCH_SIZE,
+        each in its own transaction, so other connections are not locked out for
+        the whole run. An interrupted migration resumes with the rows still NULL.
+        Triggers fill both columns for writers that only set year_of_release.
+        """
+        release_day = self._RELEASE_DAY_SQL
+        release_year = self._RELEASE_YEAR_SQL
+        try:
+            columns = {row[1] for row in self._fetch_all("PRAGMA table_info(Autos)")}
+            with self._pool.transaction() as cursor:
+                cursor.execute("BEGIN")
+                for column in ("release_day", "release_year"):
+                    if column not in columns:
+                        cursor.execute(f"ALTER TABLE Autos ADD COLUMN {column} INTEGER")
+                # Recreated with UPDATE OF, so the backfill below doesn't flood the ChangeLog
+                cursor.execute("DROP TRIGGER IF EXISTS trg_autos_update")
+                cursor.execute(self._change_log_trigger_sql(*self._TRACKED_TABLES[2], "UPDATE"))
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_autos_release_insert
+                    AFTER INSERT ON Autos WHEN NEW.release_day IS NULL
+                    BEGIN
+                        UPDATE Autos SET release_day = {release_day.format("NEW.year_of_release")},
+                                         release_year = {release_year.format("NEW.year_of_release")}
+                        WHERE pk_auto = NEW.pk_auto;
+                    END
+                """)
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_autos_release_update
+                    AFTER UPDATE OF year_of_release ON Autos
+                    BEGIN
+                        UPDATE Autos SET release_day = {release_day.format("NEW.year_of_release")},
+                                         release_year = {release_year.format("NEW.year_of_release")}
+                        WHERE pk_auto = NEW.pk_auto;
+                    END
+                """)
+
+            last_pk = None
+            while True:
+                with self._pool.transaction() as cursor:
+                    cursor.execute("SELECT max(pk_auto) FROM (SELECT pk_auto FROM Autos WHERE pk_auto > ?"
+                                   " ORDER BY pk_auto LIMIT ?)",
+                                   (last_pk if last_pk is not None else -2 ** 63, self.MIGRATION_BATCH_SIZE))
+                    batch_end = cursor.fetchone()[0]
+                    if batch_end is None:
+                        break
+                    cursor.execute(f"UPDATE Autos SET release_day = {release_day.format('year_of_release')},"
+                                   f" release_year = {release_year.format('year_of_release')}"
+                                   " WHERE pk_auto > ? AND pk_auto <= ? AND release_day IS NULL",
+                                   (last_pk if last_pk is not None else -2 ** 63, batch_end))
+                last_pk = batch_end
+
+            with self._pool.transaction() as cursor:
+                cursor.execute("DROP INDEX IF EXISTS idx_autos_release_year")  # v1 index on substr(year_of_release)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_autos_release_year ON Autos (release_year)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_autos_release_day ON Autos (release_day)")
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to migrate release dates: {e}")
+
+    def _check_if_exists(self, table_name: str, pk_column: str, pk_value):
+        try:
+            with self._pool.cursor() as cursor:
+                cursor.execute(f"SELECT 1 FROM {table_name} WHERE {pk_column} = ?", (pk_value,))
+                return cursor.fetchone() is not None
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to check if exists: {e}")
+
+    def _is_new(self, table_name: str, pk_column: str, pk_value, loaded: Dict) -> bool:
+        """Whether the pk is neither loaded nor in the database; write-behind mode asks only the catalog."""
+        if pk_value in loaded:
+            return False
+        return self.write_behind or not self._check_if_exists(table_name, pk_column, pk_value)
+
+    def add_city(self, city: City):
+        with self._lock:
+            if self._is_new("Cities", "pk_city", city.pk_city, self.cities):
+                try:
+                    self._write_row("Cities", ("pk_city", "name"), (city.pk_city, city.name))
+                    if not self.lazy:
+                        self.cities[city.pk_city] = city  # Add to the dictionary
+                        self._index_city(city)
+                    else:
+                        self._index_name("city", city.name)
+                    self._invalidate_city(city)
+                except sqlite3.Error as e:
+                    raise DatabaseError(f"Database error: {e}")
+            else:
+                print(f"City with pk_city {city.pk_city} already exists.")
+
+    def add_automarket(self, automarket: AutoMarket):
+        with self._lock:
+            if self._is_new("AutoMarkets", "pk_automarket", automarket.pk_automarket, self.automarkets):
+                try:
+                    self._write_row("AutoMarkets", ("pk_automarket", "name", "fk_city"),
+                                    (automarket.pk_automarket, automarket.name, automarket.fk_city))
+                    if not self.lazy:
+                        self.automarkets[automarket.pk_automarket] = automarket  # Add to the dictionary
+                        self._index_automarket(automarket)
+                    else:
+                        self._index_name("automarket", automarket.name)
+                    self._invalidate_automarket(automarket)
+                except sqlite3.Error as e:
+                    raise DatabaseError(f"Database error: {e}")
+            else:
+                print(f"AutoMarket with pk_automarket {automarket.pk_automarket} already exists.")
+
+
+    def add_auto(self, auto: Auto):
+        with self._lock:
+            if self._is_new("Autos", "pk_auto", auto.pk_auto, self.autos):
+                try:
+                    self._write_row("Autos", ("pk_auto", "name", "fk_automarket", "price", "year_of_release",
+                                              "release_day", "release_year"),
+                                    (auto.pk_auto, auto.name, auto.fk_automarket, auto.price,
+                                     auto.year_of_release.isoformat(),  # Store date as ISO format string
+                                     auto.year_of_release.toordinal(), auto.year_of_release.year))
+                    if not self.lazy:
+                        self.autos[auto.pk_auto] = auto  # Add to the dictionary
+                        self._index_auto(auto)
+                    else:
+                        self._index_name("auto", auto.name)
+                    self._invalidate_auto(auto)
+                except sqlite3.Error as e:
+                    raise DatabaseError(f"Database error: {e}")
+            else:
+                print(f"Auto with pk_auto {auto.pk_auto} already exists.")
+
+    def _write_row(self, table_name: str, columns: Tuple[str, ...], row: tuple):
+        """Inserts one row, or in write-behind mode queues it, flushing first when flush_rows are queued."""
+        if self.shared is not None:
+            raise InvalidInputError("A shared catalog is read-only, write through the AutoSells that publishes it.")
+        if not self.write_behind:
+            with self._pool.transaction() as cursor:
+                cursor.execute(f"INSERT INTO {table_name} ({', '.join(columns)}) "
+                               f"VALUES ({', '.join('?' for _ in columns)})", row)
+            return
+        if len(self._pending) >= self.flush_rows:
+            self.flush()  # before queueing, so a failed flush leaves the catalog without the new row
+        # OR IGNORE: a row another connection inserted meanwhile must not fail the whole group;
+        # refresh() then loads that row over the queued one
+        self._pending.append((f"INSERT OR IGNORE INTO {table_name} ({', '.join(columns)}) "
+                              f"VALUES ({', '.join('?' for _ in columns)})", row))
+
+    def flush(self) -> int:
+        """Commits the rows queued by write-behind mode in one transaction; returns how many.
+
+        The rows stay queued if the commit fails.
+        """
+        with self._lock:
+            if not self._pending:
+                return 0
+            try:
+                with self._pool.transaction() as cursor:
+                    for sql, rows in groupby(self._pending, key=itemgetter(0)):
+                        cursor.executemany(sql, [row for _, row in rows])
+            except sqlite3.Error as e:
+                raise DatabaseError(f"Failed to flush queued writes: {e}")
+            flushed, self._pending = len(self._pending), []
+            return flushed
+
+    def _flush_periodically(self, interval: float):
+        while not self._flusher_stop.wait(interval):
+            try:
+                self.flush()
+            except BaseError as e:
+                print(f"Error flushing writes: {e}")
+
+    def _bulk_insert(self, table_name: str, pk_column: str, columns: Tuple[str, ...],
+                     items: Iterable, to_row: Callable[[object], tuple], chunk_size: int) -> Tuple[list, int]:
+        """Inserts new rows in chunked executemany batches inside one transaction.
+
+        Returns the inserted items and the number of items skipped because
+        their primary key already exists (in the table or earlier in the batch).
+        """
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise InvalidInputError("Chunk size must be a positive integer.")
+        if self.shared is not None:
+            raise InvalidInputError("A shared catalog is read-only, write through the AutoSells that publishes it.")
+        self.flush()  # the duplicate check below asks the database
+        insert_sql = (f"INSERT INTO {table_name} ({', '.join(columns)}) "
+                      f"VALUES ({', '.join('?' for _ in columns)})")
+        inserted: list = []
+        skipped = 0
+        seen = set()
+        items = iter(items)
+        try:
+            with self._pool.transaction() as cursor:
+                cursor.execute("BEGIN")
+                while True:
+                    chunk = list(islice(items, chunk_size))
+                    if not chunk:
+                        break
+                    fresh = {}
+                    for item in chunk:
+                        pk_value = getattr(item, pk_column)
+                        if pk_value in seen or pk_value in fresh:
+                            skipped += 1
+                        else:
+                            fresh[pk_value] = item
+                    seen.update(fresh)
+                    if fresh:
+                        # One set-based lookup per chunk instead of a SELECT per row
+                        cursor.execute(f"SELECT {pk_column} FROM {table_name} WHERE {pk_column} IN "
+                                       f"({', '.join('?' for _ in fresh)})", tuple(fresh))
+                        for (pk_value,) in cursor.fetchall():
+                            del fresh[pk_value]
+                            skipped += 1
+                        cursor.executemany(insert_sql, [to_row(item) for item in fresh.values()])
+                        inserted.extend(fresh.values())
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Bulk insert into {table_name} failed: {e}")
+        if inserted:
+            self._cache.clear()  # cheaper than working out what a whole batch touches
+        return inserted, skipped
+
+    def _invalidate_city(self, city: City):
+        self._cache.invalidate(("city", city.name.lower()))
+
+    def _invalidate_automarket(self, automarket: AutoMarket):
+        self._cache.invalidate(("automarket", automarket.name.lower()))
+        # The new market may adopt autos that already pointed at its pk
+        for city_name in self._city_names(automarket.fk_city):
+            self._cache.invalidate(("city", city_name.lower()))
+
+    def _invalidate_auto(self, auto: Auto):
+        self._cache.invalidate(("year", auto.year_of_release.year))
+        self._cache.invalidate(("price",), lambda key: key[1] <= auto.price <= key[2])
+        for market_name, city_id in self._automarket_names(auto.fk_automarket):
+            self._cache.invalidate(("automarket", market_name.lower()))
+            for city_name in self._city_names(city_id):
+                self._cache.invalidate(("city", city_name.lower()))
+
+    def _city_names(self, city_id: int) -> List[str]:
+        if self.lazy:
+            return [row[0] for row in self._fetch_all("SELECT name FROM Cities WHERE pk_city = ?", (city_id,))]
+        city = self.cities.get(city_id)
+        return [city.name] if city else []
+
+    def _automarket_names(self, automarket_id: int) -> List[Tuple[str, int]]:
+        if self.lazy:
+            return self._fetch_all("SELECT name, fk_city FROM AutoMarkets WHERE pk_automarket = ?", (automarket_id,))
+        automarket = self.automarkets.get(automarket_id)
+        return [(automarket.name, automarket.fk_city)] if automarket else []
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters of the find_autos_by_* result cache."""
+        return self._cache.stats()
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def _last_change_seq(self) -> int:
+        # sqlite_sequence keeps the highest seq even after the log is pruned or emptied
+        rows = self._fetch_all("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'")
+        return rows[0][0] if rows else 0
+
+    def _table_counts(self) -> List[int]:
+        return list(self._fetch_all("SELECT (SELECT count(*) FROM Cities), (SELECT count(*) FROM AutoMarkets),"
+                                    " (SELECT count(*) FROM Autos)")[0])
+
+    @staticmethod
+    def _postings(index: Dict[int, array]) -> Tuple[array, array, array]:
+        """Flattens key -> ids into keys, offsets and one ids array."""
+        keys, offsets, ids = array('q'), array('q', [0]), array('q')
+        for key, values in index.items():
+            keys.append(key)
+            ids.extend(values)
+            offsets.append(len(ids))
+        return keys, offsets, ids
+
+    @staticmethod
+    def _from_postings(keys: array, offsets: array, ids: array) -> Dict[int, array]:
+        return {key: ids[offsets[n]:offsets[n + 1]] for n, key in enumerate(keys)}
+
+    def _snapshot_state(self) -> Tuple[Dict, Dict[str, array]]:
+        """The loaded catalog and its indexes as a snapshot header and arrays; call with the lock held."""
+        if self.lazy:
+            raise InvalidInputError("A lazy catalog has no loaded state to snapshot.")
+        self.flush()  # the snapshot's change_seq must cover every row it holds
+        columns = self._columns_for_query()  # the store itself when columnar
+        price_prices, price_ids = self._price_index.arrays()
+        market_keys, market_offsets, market_ids = self._postings(self._auto_ids_by_market)
+        year_keys, year_offsets, year_ids = self._postings(self._auto_ids_by_year)
+        header = {
+            "database_version": self.DATABASE_VERSION,
+            "change_seq": self._change_seq,
+            "counts": [len(self.cities), len(self.automarkets), len(self.autos)],
+            "cities": [[city.pk_city, city.name] for city in self.cities.values()],
+            "automarkets": [[market.pk_automarket, market.name, market.fk_city]
+                            for market in self.automarkets.values()],
+            "names": columns._names,
+        }
+        arrays = {
+            "pks": columns.pks, "fk_automarkets": columns.fk_automarkets, "prices": columns.prices,
+            "days": columns.days, "name_ids": columns.name_ids,
+            "price_prices": price_prices, "price_ids": price_ids,
+            "market_keys": market_keys, "market_offsets": market_offsets, "market_ids": market_ids,
+            "year_keys": year_keys, "year_offsets": year_offsets, "year_ids": year_ids,
+        }
+        return header, arrays
+
+    def save_snapshot(self, path: Optional[str] = None) -> str:
+        """Writes the loaded catalog and its indexes to a snapshot file (db_path + '.snapshot' by default)."""
+        path = path or self.db_path + ".snapshot"
+        with self._lock:
+            header, arrays = self._snapshot_state()
+            try:
+                CatalogSnapshot.write(path, header, arrays)
+            except OSError as e:
+                raise DatabaseError(f"Failed to write snapshot: {e}")
+        return path
+
+    def _load_snapshot(self, path: str) -> bool:
+        """Restores the catalog from a snapshot; False if it is missing, unreadable or stale.
+
+        A snapshot behind the database is still used when the ChangeLog covers
+        every change since it was written; refresh() then applies them.
+        """
+        try:
+            header, arrays = CatalogSnapshot.read(path)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            print(f"Ignoring snapshot {path}: {e}")
+            return False
+        seq = header.get("change_seq")
+        if header.get("database_version") != self.DATABASE_VERSION or seq is None:
+            return False
+        current_seq = self._last_change_seq()
+        if seq > current_seq:
+            return False  # written against another database
+        if seq == current_seq and header["counts"] != self._table_counts():
+            return False  # rows changed without passing the triggers
+        if seq < current_seq:
+            first_seq = self._fetch_all("SELECT min(seq) FROM ChangeLog")[0][0]
+            if first_seq is None or first_seq > seq + 1:
+                return False  # the changes since the snapshot were pruned
+
+        with self._lock:
+            self._restore_state(header, arrays)
+            self.refresh()
+        return True
+
+    def _restore_state(self, header: Dict, arrays: Dict[str, array]):
+        """Adopts the catalog and indexes of a snapshot; call with the lock held."""
+        self.cities = {pk: City(pk_city=pk, name=name) for pk, name in header["cities"]}
+        self.automarkets = {pk: AutoMarket(pk_automarket=pk, name=name, fk_city=fk_city)
+                            for pk, name, fk_city in header["automarkets"]}
+        columns = AutoColumns.from_arrays(arrays["pks"], arrays["fk_automarkets"], arrays["prices"],
+                                          arrays["days"], arrays["name_ids"], header["names"])
+        if self.columnar:
+            self.autos, self._query_columns = columns, None
+        else:
+            self.autos, self._query_columns = dict(columns.items()), columns
+        self._city_ids_by_name, self._market_ids_by_name, self._market_ids_by_city = {}, {}, {}
+        self._aggregates = None  # built on first use, keeping the snapshot start cheap
+        self._name_indexes = None  # built by the first search_names()
+        for city in self.cities.values():
+            self._index_city(city)
+        for automarket in self.automarkets.values():
+            self._index_automarket(automarket)
+        self._auto_ids_by_market = self._from_postings(arrays["market_keys"], arrays["market_offsets"],
+                                                       arrays["market_ids"])
+        self._auto_ids_by_year = self._from_postings(arrays["year_keys"], arrays["year_offsets"],
+                                                     arrays["year_ids"])
+        self._price_index = PriceIndex.from_sorted(arrays["price_prices"], arrays["price_ids"])
+        self._similarity_grids = {}
+        self._cache.clear()
+        self._change_seq = header["change_seq"]
+
+    @staticmethod
+    def _open_shared_catalog(name: str, create: bool = False) -> SharedCatalog:
+        try:
+            return SharedCatalog(name, create)
+        except (OSError, ValueError, struct.error) as e:
+            raise DatabaseError(f"Failed to open shared catalog {name}: {e}")
+
+    def _attach_shared(self) -> int:
+        """Maps the newest generation of the shared catalog; returns the ChangeLog entries it moved on by."""
+        try:
+            segment, header, views = self._shared_catalog.attach()
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            raise DatabaseError(f"Failed to attach shared catalog {self.shared}: {e}")
+        if header.get("database") != os.path.abspath(self.db_path):
+            views = None
+            segment.close()
+            raise InvalidInputError(f"Shared catalog {self.shared} holds {header.get('database')}, "
+                                    f"not {self.db_path}.")
+        with self._lock:
+            previous_seq = self._change_seq
+            self._restore_state(header, views)
+            if self._shared_segment is not None:
+                self._retired_segments.append(self._shared_segment)
+            self._shared_segment, self._shared_generation = segment, header["generation"]
+            self._close_retired_segments()
+        return header["change_seq"] - previous_seq
+
+    def _close_retired_segments(self):
+        # A segment closes once nothing views it; one a running iterator still reads is retried later
+        still_viewed = []
+        for segment in self._retired_segments:
+            try:
+                segment.close()
+            except BufferError:
+                still_viewed.append(segment)
+        self._retired_segments = still_viewed
+
+    def publish_shared(self, name: str) -> int:
+        """Publishes the loaded catalog to shared memory under name as a new generation; returns its number.
+
+        Worker processes open AutoSells(db_path, shared=name) and map it
+        read-only instead of loading their own copy: the auto columns,
+        price index and posting lists are shared, only cities, automarkets
+        and indexes built on first use (aggregates, name indexes, grids)
+        are per process. The segments live until close().
+        """
+        with self._lock:
+            catalog = self._published.get(name)
+            if catalog is None:
+                catalog = self._published[name] = self._open_shared_catalog(name, create=True)
+                atexit.register(self.close)  # unlinks the segments at interpreter shutdown
+            self.refresh()  # the generation's change_seq then covers this instance's own writes too
+            header, arrays = self._snapshot_state()
+            try:
+                return catalog.publish(dict(header, database=os.path.abspath(self.db_path)), arrays)
+            except OSError as e:
+                raise DatabaseError(f"Failed to publish shared catalog {name}: {e}")
+
+    def start_publishing(self, name: str, interval: float = 1.0):
+        """Publishes now, then refreshes every interval seconds and publishes each change in the background."""
+        if self._publisher is not None:
+            raise InvalidInputError("Publishing has already started.")
+        if not isinstance(interval, (int, float)) or interval <= 0:
+            raise InvalidInputError("Interval must be a positive number.")
+        self.publish_shared(name)
+        self._publisher_stop.clear()
+        self._publisher = threading.Thread(target=self._publish_periodically, args=(name, interval),
+                                           name="autosells-publish", daemon=True)
+        self._publisher.start()
+
+    def stop_publishing(self):
+        if self._publisher is not None:
+            self._publisher_stop.set()
+            if self._publisher is not threading.current_thread():
+                self._publisher.join()
+            self._publisher = None
+
+    def _publish_periodically(self, name: str, interval: float):
+        published_seq = self._change_seq
+        while not self._publisher_stop.wait(interval):
+            try:
+                self.refresh()  # own writes come back through the ChangeLog as well
+                if self._change_seq != published_seq:
+                    published_seq = self._change_seq
+                    self.publish_shared(name)
+            except BaseError as e:
+                print(f"Error publishing shared catalog: {e}")
+
+    def refresh(self) -> int:
+        """Applies rows changed in the database since the last load or refresh.
+
+        Reads the ChangeLog written by the triggers, so the work follows the
+        number of changed rows, not the size of the catalog. Falls back to a
+        full reload if the log was pruned past this instance's position.
+        Returns the number of changed rows. A shared catalog maps the newest
+        generation instead and returns the ChangeLog entries it moved on by.
+        """
+        if self.shared is not None:
+            with self._lock:
+                if self._shared_catalog.generation == self._shared_generation:
+                    return 0
+                return self._attach_shared()
+        with self._lock:
+            self.flush()  # a full reload would drop the queued rows
+            first_seq = self._fetch_all("SELECT min(seq) FROM ChangeLog")[0][0]
+            changes = self._fetch_all("SELECT seq, table_name, pk FROM ChangeLog WHERE seq > ? ORDER BY seq",
+                                      (self._change_seq,))
+            if not changes:
+                return 0
+            if first_seq > self._change_seq + 1 and not self.lazy:
+                self._load_data()
+                return len(changes)
+
+            pks_by_table: Dict[str, Set[int]] = {}
+            for seq, table_name, pk in changes:
+                pks_by_table.setdefault(table_name, set()).add(pk)
+            if self.lazy:
+                self._cache.clear()  # the old names of changed rows are gone from the database
+                self._name_indexes = None  # rebuilt by the next search_names()
+            else:
+                self._apply_changes(pks_by_table)
+            self._change_seq = changes[-1][0]
+            if first_seq <= self._change_seq - self.CHANGE_LOG_RETENTION:
+                self._prune_change_log()
+            return sum(len(pks) for pks in pks_by_table.values())
+
+    def _apply_changes(self, pks_by_table: Dict[str, Set[int]]):
+        """Replaces the changed rows in the dictionaries and indexes, parents first."""
+        tables = (
+            ("Cities", "pk_city", "pk_city, name", lambda row: City(pk_city=row[0], name=row[1]),
+             self.cities, self._index_city, self._unindex_city, self._invalidate_city),
+            ("AutoMarkets", "pk_automarket", "pk_automarket, name, fk_city",
+             lambda row: AutoMarket(pk_automarket=row[0], name=row[1], fk_city=row[2]),
+             self.automarkets, self._index_automarket, self._unindex_automarket, self._invalidate_automarket),
+            ("Autos", "pk_auto", "pk_auto, name, fk_automarket, price, release_day", self._auto_from_row,
+             self.autos, self._index_auto, self._unindex_auto, self._invalidate_auto),
+        )
+        for table_name, pk_column, columns, from_row, items, index, unindex, invalidate in tables:
+            pks = sorted(pks_by_table.get(table_name, ()))
+            current = {}
+            for start in range(0, len(pks), self.BULK_CHUNK_SIZE):
+                chunk = pks[start:start + self.BULK_CHUNK_SIZE]
+                rows = self._fetch_all(f"SELECT {columns} FROM {table_name} WHERE {pk_column} IN "
+                                       f"({', '.join('?' for _ in chunk)})", tuple(chunk))
+                try:
+                    current.update((row[0], from_row(row)) for row in rows)
+                except ValueError as e:
+                    raise DatabaseError(f"Failed to parse date: {e}")
+            for pk in pks:
+                old, new = items.get(pk), current.get(pk)
+                if old == new:
+                    continue  # e.g. this instance's own write
+                if old is not None:
+                    unindex(old)
+                    del items[pk]
+                    invalidate(old)
+                if new is not None:
+                    items[pk] = new
+                    index(new)
+                    invalidate(new)
+
+    def _prune_change_log(self):
+        try:
+            with self._pool.transaction() as cursor:
+                cursor.execute("DELETE FROM ChangeLog WHERE seq <= ?",
+                               (self._change_seq - self.CHANGE_LOG_RETENTION,))
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to prune change log: {e}")
+
+    def start_refresh_poller(self, interval: float = 1.0):
+        """Calls refresh() from a background thread whenever another connection commits."""
+        if self._poller is not None:
+            return
+        self._poller_stop.clear()
+        self._poller = threading.Thread(target=self._poll_changes, args=(interval,), name="autosells-refresh",
+                                        daemon=True)
+        self._poller.start()
+
+    def stop_refresh_poller(self):
+        if self._poller is not None:
+            self._poller_stop.set()
+            if self._poller is not threading.current_thread():
+                self._poller.join()
+            self._poller = None
+
+    def _poll_changes(self, interval: float):
+        last_version = None
+        while not self._poller_stop.wait(interval):
+            try:
+                if self.shared is not None:
+                    self.refresh()  # the generation is one read of the control block away
+                    continue
+                # data_version changes whenever a connection other than this thread's one commits
+                version = self._fetch_all("PRAGMA data_version")[0][0]
+                if version != last_version:
+                    last_version = version
+                    self.refresh()
+            except BaseError as e:
+                print(f"Error refreshing data: {e}")
+
+    def add_cities_bulk(self, cities: Iterable[City], chunk_size: int = BULK_CHUNK_SIZE) -> BulkInsertResult:
+        with self._lock:
+            inserted, skipped = self._bulk_insert("Cities", "pk_city", ("pk_city", "name"), cities,
+                                                  lambda city: (city.pk_city, city.name), chunk_size)
+            if self.lazy:
+                for city in inserted:
+                    self._index_name("city", city.name)
+                return BulkInsertResult(inserted=len(inserted), skipped=skipped)
+            for city in inserted:
+                self.cities[city.pk_city] = city
+                self._index_city(city)
+            return BulkInsertResult(inserted=len(inserted), skipped=skipped)
+
+    def add_automarkets_bulk(self, automarkets: Iterable[AutoMarket],
+                             chunk_size: int = BULK_CHUNK_SIZE) -> BulkInsertResult:
+        with self._lock:
+            inserted, skipped = self._bulk_insert("AutoMarkets", "pk_automarket",
+                                                  ("pk_automarket", "name", "fk_city"), automarkets,
+                                                  lambda am: (am.pk_automarket, am.name, am.fk_city), chunk_size)
+            if self.lazy:
+                for automarket in inserted:
+                    self._index_name("automarket", automarket.name)
+                return BulkInsertResult(inserted=len(inserted), skipped=skipped)
+            for automarket in inserted:
+                self.automarkets[automarket.pk_automarket] = automarket
+                self._index_automarket(automarket)
+            return BulkInsertResult(inserted=len(inserted), skipped=skipped)
+
+    def add_autos_bulk(self, autos: Iterable[Auto], chunk_size: int = BULK_CHUNK_SIZE) -> BulkInsertResult:
+        with self._lock:
+            inserted, skipped = self._bulk_insert("Autos", "pk_auto",
+                                                  ("pk_auto", "name", "fk_automarket", "price", "year_of_release",
+                                                   "release_day", "release_year"),
+                                                  autos,
+                                                  lambda auto: (auto.pk_auto, auto.name, auto.fk_automarket,
+                                                                auto.price, auto.year_of_release.isoformat(),
+                                                                auto.year_of_release.toordinal(),
+                                                                auto.year_of_release.year),
+                                                  chunk_size)
+            if self.lazy:
+                for auto in inserted:
+                    self._index_name("auto", auto.name)
+                return BulkInsertResult(inserted=len(inserted), skipped=skipped)
+            if isinstance(self.autos, AutoColumns):
+                self.autos.add_many(inserted)
+            else:
+                for auto in inserted:
+                    self.autos[auto.pk_auto] = auto
+            self._index_autos(inserted)
+            return BulkInsertResult(inserted=len(inserted), skipped=skipped)
+
+    def get_auto(self, auto_id: int) -> Optional[Auto]:
+        if self.lazy:
+            found = self._fetch_autos(self._AUTO_SELECT + " WHERE a.pk_auto = ?", (auto_id,))
+            return found[0] if found else None
+        with self._lock:
+            return self.autos.get(auto_id)
+
+    def find_autos_by_city(self, city_name: str) -> List[Auto]:
+        key = ("city", city_name.lower())
+        result = self._cache.get(key)
+        if result is None:
+            generation = self._cache.generation(key)
+            if self.lazy:
+                result = self._fetch_autos(self._AUTO_BY_CITY_SQL, (city_name.lower(),))
+            else:
+                # city name -> cities -> automarkets -> autos, touching only the matches
+                with self._lock:
+                    result = [self.autos[auto_id]
+                              for city_id in self._city_ids_by_name.get(city_name.lower(), ())
+                              for market_id in self._market_ids_by_city.get(city_id, ())
+                              for auto_id in self._auto_ids_by_market.get(market_id, ())]
+            self._cache.put(key, key, generation, result)
+        if not result:
+            raise DataNotFoundError(f"No autos found in city {city_name}")
+        return list(result)
+
+    def find_autos_by_price_range(self, min_price: float, max_price: float) -> List[Auto]:
+         # Input validation
+        if not isinstance(min_price, (int, float)) or not isinstance(max_price, (int, float)):
+            raise InvalidInputError("Price must be a number.")
+        if min_price > max_price:
+            raise InvalidInputError("Min price cannot be greater than max price.")
+        key = ("price", min_price, max_price)
+        result = self._cache.get(key)
+        if result is None:
+            generation = self._cache.generation(key[:1])
+            if self.lazy:
+                result = self._fetch_autos(self._AUTO_BY_PRICE_SQL, key[1:])
+            else:
+                with self._lock:
+                    result = [self.autos[auto_id] for auto_id in self._price_index.range(*key[1:])]
+            self._cache.put(key, key[:1], generation, result)
+        if not result:
+            raise DataNotFoundError(f"No autos found in the price range from {min_price} to {max_price}")
+        return list(result)
+
+    def find_cheapest_autos(self, count: int) -> List[Auto]:
+        if not isinstance(count, int) or count < 0:
+            raise InvalidInputError("Count must be a non-negative integer.")
+        if self.lazy:
+            result = self._fetch_autos(self._AUTO_SELECT + " ORDER BY a.price, a.pk_auto LIMIT ?", (count,))
+        else:
+            with self._lock:
+                result = [self.autos[auto_id] for auto_id in self._price_index.cheapest(count)]
+        if not result and count:
+            raise DataNotFoundError("No autos found in the database.")
+        return result
+
+    def find_most_expensive_autos(self, count: int) -> List[Auto]:
+        if not isinstance(count, int) or count < 0:
+            raise InvalidInputError("Count must be a non-negative integer.")
+        if self.lazy:
+            result = self._fetch_autos(self._AUTO_SELECT + " ORDER BY a.price DESC, a.pk_auto DESC LIMIT ?",
+                                       (count,))
+        else:
+            with self._lock:
+                result = [self.autos[auto_id] for auto_id in self._price_index.most_expensive(count)]
+        if not result and count:
+            raise DataNotFoundError("No autos found in the database.")
+        return result
+
+    def iter_autos_by_price(self, descending: bool = False) -> Iterator[Auto]:
+        """Yields autos ordered by price without sorting the catalog."""
+        if self.lazy:
+            order = "DESC" if descending else "ASC"
+            try:
+                with self._pool.cursor() as cursor:
+                    for row in cursor.execute(self._AUTO_SELECT + f" ORDER BY a.price {order}, a.pk_auto {order}"):
+                        yield self._auto_from_row(row)
+            except sqlite3.Error as e:
+                raise DatabaseError(f"Failed to query autos: {e}")
+            return
+        auto_ids = reversed(self._price_index) if descending else iter(self._price_index)
+        for auto_id in auto_ids:
+            yield self.autos[auto_id]
+
+    def find_autos_by_automarket(self, automarket_name: str) -> List[Auto]:
+        key = ("automarket", automarket_name.lower())
+        result = self._cache.get(key)
+        if result is None:
+            generation = self._cache.generation(key)
+            if self.lazy:
+                result = self._fetch_autos(self._AUTO_BY_AUTOMARKET_SQL, (automarket_name.lower(),))
+            else:
+                with self._lock:
+                    result = [self.autos[auto_id]
+                              for market_id in self._market_ids_by_name.get(automarket_name.lower(), ())
+                              for auto_id in self._auto_ids_by_market.get(market_id, ())]
+            self._cache.put(key, key, generation, result)
+
+        if not result:
+            raise DataNotFoundError(f"No autos found in the automarket {automarket_name}")
+        return list(result)
+
+    def find_autos_by_year(self, year: int) -> List[Auto]:
+        if not isinstance(year, int):
+            raise InvalidInputError("Year must be an integer.")
+
+        key = ("year", year)
+        result = self._cache.get(key)
+        if result is None:
+            generation = self._cache.generation(key)
+            if self.lazy:
+                result = self._fetch_autos(self._AUTO_BY_YEAR_SQL, (year,))
+            else:
+                with self._lock:
+                    result = [self.autos[auto_id] for auto_id in self._auto_ids_by_year.get(year, ())]
+            self._cache.put(key, key, generation, result)
+
+        if not result:
+             raise DataNotFoundError(f"No autos found in the year {year}")
+        return list(result)
+
+    def search_names(self, kind: str, text: str, mode: str = "prefix", limit: int = 10) -> List[str]:
+        """City, automarket or auto names matching text, best first, for autocomplete.
+
+        prefix matches the start of any word of a name, substring any part
+        of it, fuzzy a word start within one or two typos ("Toyta" finds
+        "Toyota Camry"). The name indexes are built on the first call, from
+        the distinct names only in lazy mode.
+        """
+        if kind not in self.NAME_KINDS:
+            raise InvalidInputError(f"Kind must be one of: {', '.join(self.NAME_KINDS)}.")
+        if mode not in self.SEARCH_MODES:
+            raise InvalidInputError(f"Mode must be one of: {', '.join(self.SEARCH_MODES)}.")
+        if not isinstance(text, str) or not text.strip():
+            raise InvalidInputError("Search text must be a non-empty string.")
+        if not isinstance(limit, int) or limit <= 0:
+            raise InvalidInputError("Limit must be a positive integer.")
+        with self._lock:
+            if self._name_indexes is None:
+                self._build_name_indexes()
+            index = self._name_indexes[kind]
+            return getattr(index, mode)(text.strip(), limit)
+
+    def _city_of_automarket(self, automarket_id: int) -> Optional[int]:
+        if self.lazy:
+            rows = self._fetch_all("SELECT fk_city FROM AutoMarkets WHERE pk_automarket = ?", (automarket_id,))
+            return rows[0][0] if rows else None
+        with self._lock:
+            automarket = self.automarkets.get(automarket_id)
+            return automarket.fk_city if automarket is not None else None
+
+    @staticmethod
+    def _check_nearest(price: float, year_of_release: date, count: Optional[int], radius: Optional[float]):
+        if not isinstance(price, (int, float)) or isinstance(price, bool) or not math.isfinite(price):
+            raise InvalidInputError("Price must be a finite number.")
+        if not isinstance(year_of_release, date):
+            raise InvalidInputError("Year of release must be a date.")
+        if count is not None and (not isinstance(count, int) or isinstance(count, bool) or count < 0):
+            raise InvalidInputError("Count must be a non-negative integer.")
+        if radius is not None and (not isinstance(radius, (int, float)) or isinstance(radius, bool)
+                                   or not 0 <= radius < math.inf):  # False for NaN too
+            raise InvalidInputError("Radius must be a non-negative finite number.")
+        if count is None and radius is None:
+            raise InvalidInputError("Give a count, a radius or both.")
+
+    def nearest_autos(self, price: float, year_of_release: date, count: Optional[int] = SIMILAR_COUNT,
+                      radius: Optional[float] = None, city_id: Optional[int] = None,
+                      exclude: Optional[int] = None) -> List[Tuple[float, Auto]]:
+        """(distance, auto) pairs closest to a price and release date, nearest (then lowest pk) first.
+
+        Distance is measured as in SimilarityGrid. radius limits it; count
+        None then returns every auto within it. city_id keeps to one city,
+        exclude leaves one pk_auto out. Returns [] when nothing is found.
+        """
+        self._check_nearest(price, year_of_release, count, radius)
+        day = year_of_release.toordinal()
+        if self.lazy:
+            return self._nearest_sql(price, day, count, radius, city_id, exclude)
+        with self._lock:
+            pairs = self._similarity_grid(city_id).nearest(price, day, count, radius, exclude)
+            return [(distance, self.autos[auto_id]) for distance, auto_id in pairs]
+
+    def _nearest_sql(self, price: float, day: int, count: Optional[int], radius: Optional[float],
+                     city_id: Optional[int], exclude: Optional[int]) -> List[Tuple[float, Auto]]:
+        """Searches a price/date box around the point that doubles until it holds count autos in reach."""
+        x, y = SimilarityGrid.point(price, day)
+        # Autos first: the box is small next to a big city, so the price index beats the city's markets
+        sql = (f"SELECT {self._AUTO_COLUMNS} FROM Autos a" +
+               (" CROSS JOIN AutoMarkets m ON m.pk_automarket = a.fk_automarket" if city_id is not None else "") +
+               " WHERE a.price BETWEEN ? AND ? AND a.release_day BETWEEN ? AND ?" +
+               (" AND m.fk_city = ?" if city_id is not None else ""))
+        reach = radius if radius is not None else self.SIMILAR_FIRST_REACH
+        while True:
+            low, high = (x - reach) * SimilarityGrid.PRICE_STEP, (x + reach) * SimilarityGrid.PRICE_STEP
+            # Days clamped to dates, so a huge reach still binds as an SQLite integer
+            params = (math.expm1(low) if low > -700 else -1.0, math.expm1(high) if high < 700 else math.inf,
+                      max(math.floor((y - reach) * SimilarityGrid.YEAR_DAYS), 0),
+                      min(math.ceil((y + reach) * SimilarityGrid.YEAR_DAYS), date.max.toordinal()))
+            found = []
+            for row in self._fetch_all(sql, params + ((city_id,) if city_id is not None else ())):
+                row_x, row_y = SimilarityGrid.point(row[3], row[4])
+                distance = math.hypot(row_x - x, row_y - y)
+                if distance <= reach and row[0] != exclude:
+                    found.append((distance, row[0], row))
+            # The box holds the whole circle of reach, so the nearest count inside it are the nearest overall
+            if radius is not None or count is not None and len(found) >= count or reach >= self.SIMILAR_MAX_REACH:
+                break
+            reach *= 2
+        found.sort(key=itemgetter(0, 1))
+        return [(distance, self._auto_from_row(row)) for distance, auto_id, row in found[:count]]
+
+    def similar_autos(self, auto_id: int, count: Optional[int] = SIMILAR_COUNT, radius: Optional[float] = None,
+                      same_city: bool = False) -> List[Auto]:
+        """The autos closest to auto_id in price and release date, nearest first.
+
+        One unit of radius is a year or a price 10% apart (see
+        SimilarityGrid); with a radius, count None returns every auto within
+        it. same_city keeps to the city of the auto's automarket. In memory
+        a grid per city answers from a few cells, lazy mode searches growing
+        price/date boxes with the price and release_day indexes.
+        """
+        if not isinstance(auto_id, int) or isinstance(auto_id, bool):
+            raise InvalidInputError("Auto id must be an integer.")
+        auto = self.get_auto(auto_id)
+        if auto is None:
+            raise DataNotFoundError(f"Auto with pk_auto {auto_id} not found.")
+        city_id = None
+        if same_city:
+            city_id = self._city_of_automarket(auto.fk_automarket)
+            if city_id is None:
+                raise DataNotFoundError(f"AutoMarket with pk_automarket {auto.fk_automarket} not found.")
+        result = [similar for distance, similar in self.nearest_autos(auto.price, auto.year_of_release, count,
+                                                                      radius, city_id, exclude=auto_id)]
+        if not result and count != 0:
+            raise DataNotFoundError(f"No autos similar to auto {auto_id} found")
+        return result
+
+    def _check_group(self, by: str, *key):
+        """Validates a group name and, when given, its key."""
+        if by not in self.AGGREGATE_GROUPS:
+            raise InvalidInputError(f"Group must be one of: {', '.join(self.AGGREGATE_GROUPS)}.")
+        if key and (not isinstance(key[0], int) or isinstance(key[0], bool)):
+            raise InvalidInputError("Group key must be an integer.")
+
+    def price_stats(self, by: str, key: int) -> PriceStats:
+        """Count and min/max/average price of one city or automarket (by pk) or release year."""
+        self._check_group(by, key)
+        if self.lazy:
+            column, source = self._GROUP_SQL[by]
+            row = self._fetch_all(f"SELECT COUNT(*), MIN(a.price), MAX(a.price), AVG(a.price) FROM {source}"
+                                  f" WHERE {column} = ?", (key,))[0]
+            return PriceStats(*row)
+        with self._lock:
+            aggregate = self._group_aggregate(by, key)
+            if aggregate is None:
+                return PriceStats(count=0, min_price=None, max_price=None, avg_price=None)
+            return aggregate.stats()
+
+    def price_stats_by(self, by: str) -> Dict[int, PriceStats]:
+        """price_stats() of every non-empty group, keyed by city/automarket pk or year."""
+        self._check_group(by)
+        if self.lazy:
+            column, source = self._GROUP_SQL[by]
+            rows = self._fetch_all(f"SELECT {column}, COUNT(*), MIN(a.price), MAX(a.price), AVG(a.price)"
+                                   f" FROM {source} GROUP BY {column}")
+            return {row[0]: PriceStats(*row[1:]) for row in rows}
+        with self._lock:
+            if self._aggregates is None:
+                self._build_aggregates()
+            result = {}
+            for key in list(self._aggregates[by]):
+                aggregate = self._group_aggregate(by, key)
+                if aggregate is not None:
+                    result[key] = aggregate.stats()
+            return result
+
+    def top_autos(self, by: str, key: int, count: int = TOP_N, most_expensive: bool = False) -> List[Auto]:
+        """The count cheapest (or most expensive) autos of one group in price order.
+
+        Up to TOP_N come straight from the group's heaps; a larger count
+        selects from all autos of the group.
+        """
+        self._check_group(by, key)
+        if not isinstance(count, int) or count < 0:
+            raise InvalidInputError("Count must be a non-negative integer.")
+        if self.lazy:
+            column, source = self._GROUP_SQL[by]
+            order = "DESC" if most_expensive else "ASC"
+            result = self._fetch_autos(f"SELECT {self._AUTO_COLUMNS} FROM {source} WHERE {column} = ?"
+                                       f" ORDER BY a.price {order}, a.pk_auto {order} LIMIT ?", (key, count))
+        else:
+            with self._lock:
+                aggregate = self._group_aggregate(by, key)
+                if aggregate is None:
+                    result = []
+                elif count <= self.TOP_N:
+                    result = aggregate.most_expensive(count) if most_expensive else aggregate.cheapest(count)
+                else:
+                    result = (nlargest if most_expensive else nsmallest)(count, self._group_autos(by, key))
+        if not result and count:
+            raise DataNotFoundError(f"No autos found for {by} {key}")
+        return result
+
+    def query(self, city: Optional[str] = None, automarket: Optional[str] = None,
+              price: Optional[Tuple[Optional[float], Optional[float]]] = None,
+              years: Optional[Tuple[int, int]] = None, order_by: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Auto]:
+        """Finds autos matching all given criteria in a single pass.
+
+        price and years are inclusive (low, high) bounds, a None bound is open.
+        order_by is one of QUERY_ORDER_FIELDS, prefixed with '-' for descending.
+        Unlike the find_* methods an empty result is returned, not raised.
+        """
+        min_price, max_price = price if price is not None else (None, None)
+        for bound in (min_price, max_price):
+            if bound is not None and not isinstance(bound, (int, float)):
+                raise InvalidInputError("Price must be a number.")
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise InvalidInputError("Min price cannot be greater than max price.")
+        first_year, last_year = years if years is not None else (None, None)
+        for bound in (first_year, last_year):
+            if bound is not None and not isinstance(bound, int):
+                raise InvalidInputError("Year must be an integer.")
+        if first_year is not None and last_year is not None and first_year > last_year:
+            raise InvalidInputError("First year cannot be greater than last year.")
+        # Years past date's range (and SQLite's integers) can't narrow the result any further
+        if first_year is not None:
+            first_year = min(max(first_year, MINYEAR), MAXYEAR + 1)
+        if last_year is not None:
+            last_year = min(max(last_year, MINYEAR - 1), MAXYEAR)
+        descending = bool(order_by) and order_by.startswith('-')
+        order_field = order_by.lstrip('-') if order_by else None
+        if order_field is not None and order_field not in self.QUERY_ORDER_FIELDS:
+            raise InvalidInputError(f"Cannot order by {order_by}.")
+        if limit is not None and (not isinstance(limit, int) or limit < 0):
+            raise InvalidInputError("Limit must be a non-negative integer.")
+
+        if self.lazy:
+            return self._query_sql(city, automarket, min_price, max_price, first_year, last_year,
+                                   order_field, descending, limit)
+
+        first_day = last_day = None
+        if first_year is not None:
+            first_day = date(first_year, 1, 1).toordinal() if first_year <= MAXYEAR else date.max.toordinal() + 1
+        if last_year is not None:
+            last_day = date(last_year, 12, 31).toordinal() if last_year >= MINYEAR else 0
+
+        # Writers update the name indexes under the lock, and it keeps them from resizing
+        # arrays while NumPy views them
+        with self._lock:
+            market_ids: Optional[Set[int]] = None
+            if city is not None:
+                market_ids = {market_id
+                              for city_id in self._city_ids_by_name.get(city.lower(), ())
+                              for market_id in self._market_ids_by_city.get(city_id, ())}
+            if automarket is not None:
+                named = set(self._market_ids_by_name.get(automarket.lower(), ()))
+                market_ids = named if market_ids is None else market_ids & named
+            columns = self._columns_for_query()
+            scan = self._query_positions_numpy if np is not None else self._query_positions_python
+            positions = scan(columns, market_ids, min_price, max_price, first_day, last_day,
+                             order_field, descending, limit)
+            if isinstance(self.autos, AutoColumns):
+                return [columns._auto_at(pos) for pos in positions]
+            return [self.autos[columns.pks[pos]] for pos in positions]
+
+    def _columns_for_query(self) -> AutoColumns:
+        if isinstance(self.autos, AutoColumns):
+            return self.autos
+        if self._query_columns is None:
+            columns = AutoColumns()
+            columns.add_many(self.autos.values())
+            self._query_columns = columns
+        return self._query_columns
+
+    @staticmethod
+    def _query_positions_numpy(columns: AutoColumns, market_ids, min_price, max_price, first_day, last_day,
+                               order_field, descending, limit) -> List[int]:
+        if not len(columns):
+            return []
+        # Zero-copy views; they must not outlive the call or the arrays can't grow
+        fk_automarkets = np.frombuffer(columns.fk_automarkets, dtype=np.int64)
+        prices = np.frombuffer(columns.prices, dtype=np.float64)
+        days = np.frombuffer(columns.days, dtype=np.int32)
+        mask = np.ones(len(columns), dtype=bool)
+        if market_ids is not None:
+            mask &= np.isin(fk_automarkets, np.fromiter(market_ids, dtype=np.int64, count=len(market_ids)))
+        if min_price is not None:
+            mask &= prices >= min_price
+        if max_price is not None:
+            mask &= prices <= max_price
+        if first_day is not None:
+            mask &= days >= first_day
+        if last_day is not None:
+            mask &= days <= last_day
+        positions = np.flatnonzero(mask)
+        if order_field is not None:
+            keys = {"pk_auto": np.frombuffer(columns.pks, dtype=np.int64),
+                    "price": prices, "year_of_release": days}[order_field][positions]
+            positions = positions[np.argsort(-keys if descending else keys, kind='stable')]
+        if limit is not None:
+            positions = positions[:limit]
+        return positions.tolist()
+
+    @staticmethod
+    def _query_positions_python(columns: AutoColumns, market_ids, min_price, max_price, first_day, last_day,
+                                order_field, descending, limit) -> List[int]:
+        positions = [pos for pos, (market_id, auto_price, day)
+                     in enumerate(zip(columns.fk_automarkets, columns.prices, columns.days))
+                     if (market_ids is None or market_id in market_ids)
+                     and (min_price is None or auto_price >= min_price)
+                     and (max_price is None or auto_price <= max_price)
+                     and (first_day is None or day >= first_day)
+                     and (last_day is None or day <= last_day)]
+        if order_field is not None:
+            keys = {"pk_auto": columns.pks, "price": columns.prices, "year_of_release": columns.days}[order_field]
+            positions.sort(key=keys.__getitem__, reverse=descending)
+        if limit is not None:
+            positions = positions[:limit]
+        return positions
+
+    def _query_sql(self, city, automarket, min_price, max_price, first_year, last_year,
+                   order_field, descending, limit) -> List[Auto]:
+        conditions: List[str] = []
+        params: list = []
+        if city is not None:
+            conditions.append("a.fk_automarket IN (SELECT m.pk_automarket FROM Cities c"
+                              " CROSS JOIN AutoMarkets m ON m.fk_city = c.pk_city WHERE py_lower(c.name) = ?)")
+            params.append(city.lower())
+        if automarket is not None:
+            conditions.append("a.fk_automarket IN (SELECT pk_automarket FROM AutoMarkets WHERE py_lower(name) = ?)")
+            params.append(automarket.lower())
+        if min_price is not None:
+            conditions.append("a.price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append("a.price <= ?")
+            params.append(max_price)
+        if first_year is not None:
+            conditions.append("a.release_year >= ?")
+            params.append(first_year)
+        if last_year is not None:
+            conditions.append("a.release_year <= ?")
+            params.append(last_year)
+        sql = self._AUTO_SELECT
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if order_field is not None:
+            column = "release_day" if order_field == "year_of_release" else order_field
+            sql += f" ORDER BY a.{column} {'DESC' if descending else 'ASC'}, a.pk_auto"
+        else:
+            sql += " ORDER BY a.pk_auto"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._fetch_autos(sql, tuple(params))
+
+    def list_all_autos(self) -> List[str]:
+        if self.lazy:
+            result = [str(auto) for auto in self._fetch_autos(self._AUTO_SELECT)]
+        else:
+            with self._lock:
+                result = [str(auto) for auto_id, auto in self.autos.items()]
+        if not result:
+            raise DataNotFoundError("No autos found in the database.")
+        return result
+
+    def list_all_automarkets(self) -> List[str]:
+        if self.lazy:
+            result = [str(AutoMarket(pk_automarket=row[0], name=row[1], fk_city=row[2]))
+                      for row in self._fetch_all("SELECT pk_automarket, name, fk_city FROM AutoMarkets")]
+        else:
+            with self._lock:
+                result = [str(automarket) for automarket_id, automarket in self.automarkets.items()]
+        if not result:
+            raise DataNotFoundError("No automarkets found in the database.")
+        return result
+
+    def list_all_cities(self) -> List[str]:
+        if self.lazy:
+            result = [str(City(pk_city=row[0], name=row[1]))
+                      for row in self._fetch_all("SELECT pk_city, name FROM Cities")]
+        else:
+            with self._lock:
+                result = [str(city) for city_id, city in self.cities.items()]
+        if not result:
+            raise DataNotFoundError("No cities found in the database.")
+        return result
+
+    def _page(self, table_name: str, pk_column: str, columns: str, from_row: Callable[[tuple], object],
+              loaded: Dict[int, object], after_pk: Optional[int], page_size: int) -> list:
+        """Returns up to page_size rows with pk > after_pk in pk order (keyset pagination)."""
+        if not isinstance(page_size, int) or page_size <= 0:
+            raise InvalidInputError("Page size must be a positive integer.")
+        if after_pk is not None and not isinstance(after_pk, int):
+            raise InvalidInputError("after_pk must be an integer.")
+        if isinstance(loaded, AutoColumns):
+            with self._lock:
+                start = 0 if after_pk is None else bisect_right(loaded.pks, after_pk)
+                return [loaded._auto_at(pos) for pos in range(start, min(start + page_size, len(loaded)))]
+        if self.lazy:
+            where = "" if after_pk is None else f" WHERE {pk_column} > ?"
+            params = (page_size,) if after_pk is None else (after_pk, page_size)
+            rows = self._fetch_all(f"SELECT {columns} FROM {table_name}{where} ORDER BY {pk_column} LIMIT ?", params)
+            return [from_row(row) for row in rows]
+        # Pages follow the catalog, not the database, so they hold what lookups see until refresh()
+        with self._lock:
+            if loaded is self.autos:
+                pks = self._columns_for_query().pks  # sorted, and kept until the autos change
+                start = 0 if after_pk is None else bisect_right(pks, after_pk)
+                return [loaded[pk] for pk in pks[start:start + page_size]]
+            keys = loaded if after_pk is None else (pk for pk in loaded if pk > after_pk)
+            return [loaded[pk] for pk in nsmallest(page_size, keys)]
+
+    @staticmethod
+    def _iter_pages(fetch_page: Callable[[Optional[int], int], list], pk_column: str,
+                    after_pk: Optional[int], page_size: int) -> Iterator:
+        while True:
+            page = fetch_page(after_pk, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            after_pk = getattr(page[-1], pk_column)
+
+    def page_autos(self, after_pk: Optional[int] = None, page_size: int = PAGE_SIZE) -> List[Auto]:
+        return self._page("Autos", "pk_auto", "pk_auto, name, fk_automarket, price, release_day",
+                          self._auto_from_row, self.autos, after_pk, page_size)
+
+    def page_automarkets(self, after_pk: Optional[int] = None, page_size: int = PAGE_SIZE) -> List[AutoMarket]:
+        return self._page("AutoMarkets", "pk_automarket", "pk_automarket, name, fk_city",
+                          lambda row: AutoMarket(pk_automarket=row[0], name=row[1], fk_city=row[2]),
+                          self.automarkets, after_pk, page_size)
+
+    def page_cities(self, after_pk: Optional[int] = None, page_size: int = PAGE_SIZE) -> List[City]:
+        return self._page("Cities", "pk_city", "pk_city, name", lambda row: City(pk_city=row[0], name=row[1]),
+                          self.cities, after_pk, page_size)
+
+    def iter_autos(self, after_pk: Optional[int] = None, page_size: int = PAGE_SIZE) -> Iterator[Auto]:
+        """Streams autos in pk order one page at a time, so memory stays flat."""
+        return self._iter_pages(self.page_autos, "pk_auto", after_pk, page_size)
+
+    def iter_automarkets(self, after_pk: Optional[int] = None, page_size: int = PAGE_SIZE) -> Iterator[AutoMarket]:
+        return self._iter_pages(self.page_automarkets, "pk_automarket", after_pk, page_size)
+
+    def iter_cities(self, after_pk: Optional[int] = None, page_size: int = PAGE_SIZE) -> Iterator[City]:
+        return self._iter_pages(self.page_cities, "pk_city", after_pk, page_size)
+
+    def clear_console(self):
+        os.system('cls' if os.name == 'nt' else 'clear')
+
+    def scip(self):
+        input("\nНажмите Enter чтобы выйти")
+
+    def menu(self):
+        while True:
+            self.clear_console()
+            print("\nМеню AutoSells:")
+            print("1. Поиск автомобилей по городу")
+            print("2. Поиск автомобилей по диапазону цен")
+            print("3. Поиск автомобилей по автосалону")
+            print("4. Поиск автомобилей по году выпуска")
+            print("5. Список всех автомобилей")
+            print("6. Список всех автосалонов")
+            print("7. Список всех городов")
+            print("8. Вывести всю базу данных")
+            print("9. Сравнить два автомобиля по цене")
+            print("10. Найти похожие автомобили по цене и году выпуска")
+            print("0. Выход")
+
+            choice = input("Выберите опцию: ")
+
+            if choice == '1':
+                self.clear_console()
+                try:
+                    city_name = input("Введите название города: ")
+                    autos = self.find_autos_by_city(city_name)
+                    print(f"Автомобили в городе {city_name}:")
+                    for auto in autos:
+                        print(auto)
+                except DataNotFoundError as e:
+                    print(e)
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
+                finally:
+                    self.scip()
+
+            elif choice == '2':
+                self.clear_console()
+                try:
+                    min_price = float(input("Введите минимальную цену: "))
+                    max_price = float(input("Введите максимальную цену: "))
+                    autos = self.find_autos_by_price_range(min_price, max_price)
+                    print(f"Автомобили в диапазоне цен от {min_price} до {max_price}:")
+                    for auto in autos:
+                        print(auto)
+                except InvalidInputError as e:
+                    print(e)
+                except DataNotFoundError as e:
+                    print(e)
+                except ValueError:
+                    print("Неверный ввод цены. Пожалуйста, введите число.")
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
+                finally:
+                    self.scip()
+
+            elif choice == '3':
+                self.clear_console()
+                try:
+                    automarket_name = input("Введите название автосалона: ")
+                    autos = self.find_autos_by_automarket(automarket_name)
+                    print(f"Автомобили в автосалоне {automarket_name}:")
+                    for auto in autos:
+                        print(auto)
+                except DataNotFoundError as e:
+                    print(e)
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
+                finally:
+                    self.scip()
+
+            elif choice == '4':
+                self.clear_console()
+                try:
+                    year = int(input("Введите год выпуска: "))
+                    autos = self.find_autos_by_year(year)
+                    print(f"Автомобили {year} года выпуска:")
+                    for auto in autos:
+                        print(auto)
+                except InvalidInputError as e:
+                    print(e)
+                except DataNotFoundError as e:
+                    print(e)
+                except ValueError:
+                    print("Неверный ввод года. Пожалуйста, введите целое число.")
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
+                finally:
+                    self.scip()
+
+            elif choice == '5':
+                self.clear_console()
+                try:
+                    autos = self.list_all_autos()
+                    print("Все автомобили:")
+                    for auto in autos:
+                        print(auto)
+                except DataNotFoundError as e:
+                    print(e)
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
+                finally:
+                    self.scip()
+
+            elif choice == '6':
+                self.clear_console()
+                try:
+                    automarkets = self.list_all_automarkets()
+                    print("Все автосалоны:")
+                    for automarket in automarkets:
+                        print(automarket)
+                except DataNotFoundError as e:
+                    print(e)
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
+                finally:
+                    self.scip()
+
+            elif choice == '7':
+                self.clear_console()
+                try:
+                    cities = self.list_all_cities()
+                    print("Все города:")
+                    for city in cities:
+                        print(city)
+                except DataNotFoundError as e:
+                    print(e)
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
+                finally:
+                    self.scip()
+
+            elif choice == '8': # Displays data from db
+                try:
+                    # Streamed page by page instead of building the full lists
+                    print("Cities:")
+                    for city in self.iter_cities():
+                        print(city)
+
+                    print("\nAutomarkets:")
+                    for automarket in self.iter_automarkets():
+                        print(automarket)
+
+                    print("\nAutos:")
+                    for auto in self.iter_autos():
+                        print(auto)
+                except DataNotFoundError as e:
+                    print(e)
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
+                finally:
+                    self.scip()
+
+            elif choice == '9':
+                self.clear_console()
+                try:
+                    auto_id1 = int(input("Введите ID первого автомобиля для сравнения: "))
+                    auto1: Optional[Auto] = self.get_auto(auto_id1)
+                    auto_id2 = int(input("Введите ID второго автомобиля для сравнения: "))
+                    auto2: Optional[Auto] = self.get_auto(auto_id2)
+
+                    if auto1 and auto2:
+                        if auto1 < auto2:
+                            print(f"{auto1.name} дешевле, чем {auto2.name}")
+                        elif auto2 < auto1:
+                            print(f"{auto2.name} дешевле, чем {auto1.name}")
+                        else:
+                            print(f"{auto1.name} и {auto2.name} стоят одинаково")
+                    else:
+                        print("Один или оба автомобиля не найдены.")
+                except ValueError:
+                    print("Неверный ввод ID автомобиля. Пожалуйста, введите число.")
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
+                finally:
+                    self.scip()
+
+            elif choice == '10':
+                self.clear_console()
+                try:
+                    auto_id = int(input("Введите ID автомобиля: "))
+                    count = input(f"Сколько похожих показать (по умолчанию {self.SIMILAR_COUNT}): ").strip()
+                    same_city = input("Только в том же городе? (д/н): ").strip().lower() in ("д", "да", "y", "yes")
+                    autos = self.similar_autos(auto_id, int(count) if count else self.SIMILAR_COUNT,
+                                               same_city=same_city)
+                    print(f"Автомобили, похожие на {auto_id}:")
+                    for auto in autos:
+                        print(auto)
+                except InvalidInputError as e:
+                    print(e)
+                except DataNotFoundError as e:
+                    print(e)
+                except ValueError:
+                    print("Неверный ввод. Пожалуйста, введите целое число.")
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
+                finally:
+                    self.scip()
+
+            elif choice == '0':
+                break
+
+            else:
+                print("Неверный выбор. Попробуйте снова.")
+                self.scip()
+
+    def __str__(self):
+        return f"AutoSells(cities={self.cities}, automarkets={self.automarkets}, autos={self.autos})"
+
+    def close(self):
+        """Flushes queued writes, saves a hot database, stops the background threads and closes every connection."""
+        atexit.unregister(self.close)
+        if hasattr(self, '_poller'):
+            self.stop_refresh_poller()
+        if getattr(self, '_publisher', None) is not None:
+            self.stop_publishing()
+        if getattr(self, '_flusher', None) is not None:
+            self._flusher_stop.set()
+            if self._flusher is not threading.current_thread():
+                self._flusher.join()
+            self._flusher = None
+        if getattr(self, '_pending', None):
+            try:
+                self.flush()
+            except DatabaseError as e:
+                print(f"Error flushing writes: {e}")
+        if getattr(self, '_checkpointer', None) is not None:
+            self._checkpointer_stop.set()
+            if self._checkpointer is not threading.current_thread():
+                self._checkpointer.join()
+            self._checkpointer = None
+        if getattr(self, '_hot_conn', None) is not None:
+            try:
+                self.checkpoint()
+            except DatabaseError as e:
+                print(f"Error saving checkpoint: {e}")
+        if hasattr(self, '_pool'):
+            try:
+                self._pool.close_all()
+            except sqlite3.Error as e:
+                print(f"Error closing database connection: {e}")
+        if getattr(self, '_hot_conn', None) is not None:
+            self._hot_conn.close()  # the last connection: the in-memory database goes with it
+            self._hot_conn = None
+        for catalog in getattr(self, '_published', {}).values():
+            catalog.close()  # workers still mapping the last generation keep it
+        self._published = {}
+        if getattr(self, '_shared_segment', None) is not None:
+            with self._lock:
+                # Drop every view into the mapping, so the segment can close
+                self.autos, self._query_columns, self._price_index = AutoColumns(), None, PriceIndex()
+                self._auto_ids_by_market, self._auto_ids_by_year = {}, {}
+                self._retired_segments.append(self._shared_segment)
+                self._shared_segment = None
+                self._close_retired_segments()
+            for segment in self._retired_segments:
+                print(f"Shared catalog segment {segment.name} is still in use, left open")
+            self._shared_catalog.close()
+        if hasattr(self, 'db_path'):
+            key = (type(self), os.path.abspath(self.db_path))
+            if self._instances.get(key) is self:
+                del self._instances[key]  # the next AutoSells(db_path) opens it afresh
+
+    def __del__(self):  # Close the connections when the object is deleted
+        self.close()
+
+    @staticmethod
+    def get_database_version():
+        return AutoSells.DATABASE_VERSION
+
+    @staticmethod
+    def print_database_version():
+        print(f"Database Version: {AutoSells.DATABASE_VERSION}")
+
+# Example usage:
+if __name__ == '__main__':
+    try:
+        auto_sells = AutoSells()
+        auto_sells.menu()
+
+    except DatabaseError as e:
+        print(f"A database error occurred: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred during initialization: {e}")
@@ -0,0 +1,311 @@
+
+import csv
+import gzip
+import json
+import math
+import os
+from dataclasses import dataclass, field, fields
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from auto_data import AutoSells, City, AutoMarket, Auto, InvalidInputError
+
+# Record type -> (class, primary key, AutoSells bulk method), parents before children
+KINDS = {
+    "city": (City, "pk_city", "add_cities_bulk"),
+    "automarket": (AutoMarket, "pk_automarket", "add_automarkets_bulk"),
+    "auto": (Auto, "pk_auto", "add_autos_bulk"),
+}
+KIND_BY_CLASS = {cls: kind for kind, (cls, pk_column, method) in KINDS.items()}
+# Child record type -> (foreign key field, parent record type)
+PARENTS = {"automarket": ("fk_city", "city"), "auto": ("fk_automarket", "automarket")}
+PARENT_TABLES = {"city": "Cities", "automarket": "AutoMarkets"}
+
+IMPORT_CHUNK_SIZE = 5000  # Records per committed chunk; also the progress checkpoint interval
+MAX_ERRORS = 100  # Invalid-record messages kept in ImportResult.errors
+
+
+@dataclass
+class ImportResult:
+    read: int = 0
+    inserted: int = 0
+    skipped: int = 0  # already in the database or repeated in the file
+    invalid: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def __str__(self):
+        return (f"ImportResult(read={self.read}, inserted={self.inserted}, skipped={self.skipped}, "
+                f"invalid={self.invalid})")
+
+
+def _file_format(path: str, file_format: Optional[str]) -> str:
+    if file_format is None:
+        name = path[:-3] if path.endswith(".gz") else path
+        file_format = os.path.splitext(name)[1].lstrip(".").lower()
+        file_format = {"ndjson": "jsonl", "json": "jsonl"}.get(file_format, file_format)
+    if file_format not in ("csv", "jsonl"):
+        raise InvalidInputError(f"Unsupported file format {file_format!r}, expected csv or jsonl.")
+    return file_format
+
+
+def _open(path: str, mode: str, compressed: Optional[bool] = None, **kwargs):
+    if compressed is None:
+        compressed = path.endswith(".gz")
+    return gzip.open(path, mode, **kwargs) if compressed else open(path, mode, **kwargs)
+
+
+def _read_records(path: str, file_format: str, offset: int) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yields (byte offset after the record, record, error) starting at offset, one line at a time."""
+    with _open(path, "rb") as f:
+        if file_format == "jsonl":
+            f.seek(offset)
+            for raw in f:
+                offset += len(raw)
+                if not raw.strip():
+                    continue
+                try:
+                    record = json.loads(raw)
+                except ValueError as e:
+                    yield offset, None, f"invalid JSON: {e}"
+                    continue
+                if isinstance(record, dict):
+                    yield offset, record, None
+                else:
+                    yield offset, None, "a record must be a JSON object"
+            return
+
+        header = f.readline()
+        fieldnames = next(csv.reader([header.decode("utf-8-sig")]), [])
+        position = [max(offset, len(header))]
+        f.seek(position[0])
+
+        def lines() -> Iterator[str]:
+            # csv pulls whole lines, so the offset after a record is exact
+            for raw in f:
+                position[0] += len(raw)
+                yield raw.decode("utf-8", errors="replace")
+
+        for row in csv.reader(lines()):
+            if not row:
+                continue
+            if len(row) != len(fieldnames):
+                yield position[0], None, f"expected {len(fieldnames)} fields, got {len(row)}"
+            else:
+                yield position[0], dict(zip(fieldnames, row)), None
+
+
+def _int(record: dict, name: str) -> int:
+    value = record[name]
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{name} must be an integer")
+    return int(value)
+
+
+def _name(record: dict) -> str:
+    name = str(record["name"]).strip()
+    if not name:
+        raise ValueError("name must not be empty")
+    return name
+
+
+def parse_record(kind: str, record: dict):
+    """Builds a City, AutoMarket or Auto from a parsed CSV/JSON record."""
+    try:
+        if kind == "city":
+            return City(pk_city=_int(record, "pk_city"), name=_name(record))
+        if kind == "automarket":
+            return AutoMarket(pk_automarket=_int(record, "pk_automarket"), name=_name(record),
+                              fk_city=_int(record, "fk_city"))
+        if kind == "auto":
+            price = float(record["price"])
+            if not math.isfinite(price) or price < 0:
+                raise ValueError("price must be a non-negative number")
+            return Auto(pk_auto=_int(record, "pk_auto"), name=_name(record),
+                        fk_automarket=_int(record, "fk_automarket"), price=price,
+                        year_of_release=date.fromisoformat(str(record["year_of_release"])))
+    except KeyError as e:
+        raise InvalidInputError(f"missing field {e.args[0]}")
+    except (TypeError, ValueError) as e:
+        raise InvalidInputError(str(e))
+    raise InvalidInputError(f"unknown record type {kind!r}")
+
+
+class _Importer:
+    """Buffers parsed records per type and writes them parents-first, one bulk insert per type."""
+
+    def __init__(self, auto_sells: AutoSells, result: ImportResult):
+        self.auto_sells = auto_sells
+        self.result = result
+        self.buffers: Dict[str, list] = {kind: [] for kind in KINDS}
+        self.known: Dict[str, set] = {kind: set() for kind in PARENT_TABLES}  # parent pks seen to exist
+        self.buffered = 0
+
+    def _parent_exists(self, kind: str, pk: int) -> bool:
+        if pk in self.known[kind]:
+            return True
+        if self.auto_sells.lazy:
+            exists = self.auto_sells._check_if_exists(PARENT_TABLES[kind], KINDS[kind][1], pk)
+        else:
+            exists = pk in (self.auto_sells.cities if kind == "city" else self.auto_sells.automarkets)
+        if exists:
+            self.known[kind].add(pk)
+        return exists
+
+    def add(self, kind: str, item):
+        if kind in PARENTS:
+            fk_field, parent_kind = PARENTS[kind]
+            if not self._parent_exists(parent_kind, getattr(item, fk_field)):
+                raise InvalidInputError(f"{fk_field} {getattr(item, fk_field)} does not exist")
+        if kind in self.known:
+            self.known[kind].add(getattr(item, KINDS[kind][1]))
+        self.buffers[kind].append(item)
+        self.buffered += 1
+
+    def flush(self):
+        for kind, (cls, pk_column, method) in KINDS.items():
+            if self.buffers[kind]:
+                written = getattr(self.auto_sells, method)(self.buffers[kind])
+                self.result.inserted += written.inserted
+                self.result.skipped += written.skipped
+                self.buffers[kind] = []
+        self.buffered = 0
+
+
+def _file_identity(path: str) -> Dict:
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def _save_progress(progress_path: str, progress: Dict):
+    tmp_path = progress_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(progress, f, ensure_ascii=False)
+    os.replace(tmp_path, progress_path)
+
+
+def import_file(auto_sells: AutoSells, path: str, kind: Optional[str] = None, file_format: Optional[str] = None,
+                chunk_size: int = IMPORT_CHUNK_SIZE, progress_path: Optional[str] = None,
+                strict: bool = False) -> ImportResult:
+    """Streams a CSV/JSONL(.gz) file of cities, automarkets and autos into the catalog.
+
+    kind fixes the record type for the whole file; without it every record
+    needs a "type" field (city, automarket or auto). Foreign keys must point
+    at rows already in the catalog or earlier in the file. Records are
+    written in transactions of chunk_size, so memory stays bounded. With
+    progress_path the byte offset after each committed chunk is saved and a
+    rerun continues from there; rows written twice after a crash are skipped
+    as duplicates. Invalid records are counted and skipped, or raise
+    InvalidInputError when strict.
+    """
+    if kind is not None and kind not in KINDS:
+        raise InvalidInputError(f"Unknown record type {kind!r}.")
+    if not isinstance(chunk_size, int) or chunk_size <= 0:
+        raise InvalidInputError("Chunk size must be a positive integer.")
+    file_format = _file_format(path, file_format)
+
+    result, offset = ImportResult(), 0
+    identity = _file_identity(path)
+    if progress_path is not None and os.path.exists(progress_path):
+        try:
+            with open(progress_path, encoding="utf-8") as f:
+                progress = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring progress file {progress_path}: {e}")
+            progress = {}
+        if progress.get("file") == identity:
+            offset = progress["offset"]
+            result = ImportResult(**progress["result"])
+            if progress.get("done"):
+                return result
+
+    def checkpoint(done: bool = False):
+        if progress_path is not None:
+            _save_progress(progress_path, {"file": identity, "offset": offset, "done": done,
+                                           "result": vars(result)})
+
+    importer = _Importer(auto_sells, result)
+    previous_end = offset
+    for end_offset, record, error in _read_records(path, file_format, offset):
+        result.read += 1
+        try:
+            if error is not None:
+                raise InvalidInputError(error)
+            record_kind = kind or record.get("type")
+            if record_kind not in KINDS:
+                raise InvalidInputError(f"unknown record type {record_kind!r}")
+            importer.add(record_kind, parse_record(record_kind, record))
+        except InvalidInputError as e:
+            message = f"Record {result.read} (ends at byte {end_offset}): {e}"
+            if strict:
+                importer.flush()
+                offset = previous_end
+                checkpoint()
+                raise InvalidInputError(message)
+            result.invalid += 1
+            if len(result.errors) < MAX_ERRORS:
+                result.errors.append(message)
+        if importer.buffered >= chunk_size:
+            importer.flush()
+            offset = end_offset
+            checkpoint()
+        elif not importer.buffered:
+            offset = end_offset
+        previous_end = end_offset
+    importer.flush()
+    checkpoint(done=True)
+    return result
+
+
+def _row(item) -> dict:
+    row = {"type": KIND_BY_CLASS[type(item)]}
+    for item_field in fields(item):
+        value = getattr(item, item_field.name)
+        row[item_field.name] = value.isoformat() if isinstance(value, date) else value
+    return row
+
+
+def export_records(records: Iterable, path: str, file_format: Optional[str] = None) -> int:
+    """Writes cities, automarkets or autos to CSV/JSONL(.gz) one at a time and returns the count.
+
+    Pass an iterator, e.g. iter_autos() or iter_autos_by_price(), to export
+    without building a list. A CSV file holds one record type; every row
+    carries a "type" column so import_file() reads it back without a kind.
+    The file appears under its name only once it is complete.
+    """
+    file_format = _file_format(path, file_format)
+    tmp_path = path + ".tmp"
+    count = 0
+    try:
+        # The temporary name hides the .gz suffix, so compression follows the final name
+        with _open(tmp_path, "wt", compressed=path.endswith(".gz"), encoding="utf-8", newline="") as f:
+            writer = None
+            for item in records:
+                if type(item) not in KIND_BY_CLASS:
+                    raise InvalidInputError(f"Cannot export {type(item).__name__}.")
+                row = _row(item)
+                if file_format == "jsonl":
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                else:
+                    if writer is None:
+                        csv_type = row["type"]
+                        writer = csv.DictWriter(f, fieldnames=list(row))
+                        writer.writeheader()
+                    elif row["type"] != csv_type:
+                        raise InvalidInputError("A CSV export holds one record type, use JSONL for mixed records.")
+                    writer.writerow(row)
+                count += 1
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def export_table(auto_sells: AutoSells, table: str, path: str, file_format: Optional[str] = None) -> int:
+    """Exports cities, automarkets or autos page by page (keyset pagination)."""
+    iterate = {"cities": auto_sells.iter_cities, "automarkets": auto_sells.iter_automarkets,
+               "autos": auto_sells.iter_autos}.get(table)
+    if iterate is None:
+        raise InvalidInputError(f"Unknown table {table!r}, expected cities, automarkets or autos.")
+    return export_records(iterate(), path, file_format)
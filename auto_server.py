@@ -0,0 +1,346 @@
+
+import csv
+import inspect
+import json
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import date
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Callable, TextIO, Tuple
+from urllib.parse import urlsplit, parse_qsl
+
+from auto_data import AutoSells, City, AutoMarket, Auto, PriceStats, BaseError, InvalidInputError, DataNotFoundError
+
+
+def _listing(iterate: Callable) -> Callable:
+    def run(auto_sells: AutoSells, after_pk: Optional[int] = None, page_size: Optional[int] = None):
+        if page_size is not None and page_size < 0:
+            raise InvalidInputError("Page size must be a non-negative integer.")
+        return list(islice(iterate(auto_sells, after_pk), page_size))
+    return run
+
+
+def _query(auto_sells: AutoSells, city: Optional[str] = None, automarket: Optional[str] = None,
+           min_price: Optional[float] = None, max_price: Optional[float] = None,
+           first_year: Optional[int] = None, last_year: Optional[int] = None,
+           order_by: Optional[str] = None, limit: Optional[int] = None) -> List[Auto]:
+    return auto_sells.query(city=city, automarket=automarket, price=(min_price, max_price),
+                            years=(first_year, last_year), order_by=order_by, limit=limit)
+
+
+def _method(name: str) -> Callable:
+    # Looked up on the instance, so methods wrapped by enable_metrics() are the ones called
+    def run(auto_sells: AutoSells, **kwargs):
+        return getattr(auto_sells, name)(**kwargs)
+    run.__signature__ = inspect.signature(getattr(AutoSells, name))
+    return run
+
+
+# Operation name -> (handler, parameter types); the names double as GET paths
+OPERATIONS: Dict[str, Tuple[Callable, Dict[str, type]]] = {
+    "find_autos_by_city": (_method("find_autos_by_city"), {"city_name": str}),
+    "find_autos_by_price_range": (_method("find_autos_by_price_range"), {"min_price": float, "max_price": float}),
+    "find_cheapest_autos": (_method("find_cheapest_autos"), {"count": int}),
+    "find_most_expensive_autos": (_method("find_most_expensive_autos"), {"count": int}),
+    "find_autos_by_automarket": (_method("find_autos_by_automarket"), {"automarket_name": str}),
+    "find_autos_by_year": (_method("find_autos_by_year"), {"year": int}),
+    "query": (_query, {"city": str, "automarket": str, "min_price": float, "max_price": float,
+                       "first_year": int, "last_year": int, "order_by": str, "limit": int}),
+    "search_names": (_method("search_names"), {"kind": str, "text": str, "mode": str, "limit": int}),
+    "price_stats": (_method("price_stats"), {"by": str, "key": int}),
+    "price_stats_by": (_method("price_stats_by"), {"by": str}),
+    "top_autos": (_method("top_autos"), {"by": str, "key": int, "count": int, "most_expensive": bool}),
+    "similar_autos": (_method("similar_autos"), {"auto_id": int, "count": int, "radius": float, "same_city": bool}),
+    "list_all_autos": (_listing(lambda s, after_pk: s.iter_autos(after_pk)), {"after_pk": int, "page_size": int}),
+    "list_all_automarkets": (_listing(lambda s, after_pk: s.iter_automarkets(after_pk)),
+                             {"after_pk": int, "page_size": int}),
+    "list_all_cities": (_listing(lambda s, after_pk: s.iter_cities(after_pk)), {"after_pk": int, "page_size": int}),
+}
+
+MAX_BATCH_SIZE = 100  # Queries per POST /batch request
+SQLITE_INT_RANGE = (-2 ** 63, 2 ** 63 - 1)  # Integers SQLite can bind
+BATCH_FORMATS = ("jsonl", "csv")  # run_batch() output formats
+
+REQUIRED_PARAMS = {operation: [name for name, param in list(inspect.signature(handler).parameters.items())[1:]
+                               if param.default is inspect.Parameter.empty]
+                   for operation, (handler, types) in OPERATIONS.items()}
+
+
+def _convert(name: str, value, kind: type):
+    """Converts a query string or JSON value to the parameter type."""
+    if kind is bool and isinstance(value, str):
+        if value.lower() not in ("true", "false", "1", "0"):
+            raise InvalidInputError(f"Parameter {name} must be true or false.")
+        return value.lower() in ("true", "1")
+    if kind is bool and isinstance(value, bool):
+        return value
+    if isinstance(value, str) and kind is not str:
+        try:
+            value = kind(value)
+        except ValueError:
+            raise InvalidInputError(f"Parameter {name} must be {kind.__name__}.")
+    elif kind is float and isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = float(value)
+    elif not isinstance(value, kind) or isinstance(value, bool):
+        raise InvalidInputError(f"Parameter {name} must be {kind.__name__}.")
+    if kind is int and not SQLITE_INT_RANGE[0] <= value <= SQLITE_INT_RANGE[1]:
+        raise InvalidInputError(f"Parameter {name} is out of range.")
+    if kind is float and not math.isfinite(value):
+        raise InvalidInputError(f"Parameter {name} must be a finite number.")
+    return value
+
+
+def _to_json(item):
+    if isinstance(item, (City, AutoMarket, Auto, PriceStats)):
+        return vars(item)  # flat dataclasses: no asdict() deep copy, dates come back through here
+    if isinstance(item, date):
+        return item.isoformat()
+    raise TypeError(f"Cannot serialize {type(item).__name__}")
+
+
+def execute(auto_sells: AutoSells, operation: str, params: Dict) -> Tuple[int, object]:
+    """Runs one operation and returns (HTTP status, JSON-ready payload)."""
+    try:
+        if operation not in OPERATIONS:
+            return 404, {"error": f"Unknown operation {operation}."}
+        handler, types = OPERATIONS[operation]
+        unknown = set(params) - set(types)
+        if unknown:
+            raise InvalidInputError(f"Unknown parameters: {', '.join(sorted(unknown))}.")
+        missing = [name for name in REQUIRED_PARAMS[operation] if name not in params]
+        if missing:
+            raise InvalidInputError(f"Missing parameters: {', '.join(missing)}.")
+        kwargs = {name: _convert(name, value, types[name]) for name, value in params.items()}
+        return 200, handler(auto_sells, **kwargs)
+    except InvalidInputError as e:
+        return 400, {"error": str(e)}
+    except DataNotFoundError as e:
+        return 404, {"error": str(e)}
+    except BaseError as e:
+        return 500, {"error": str(e)}
+    except (ValueError, OverflowError) as e:
+        return 400, {"error": f"Invalid parameters: {e}"}
+    except Exception as e:
+        # A bug in one operation answers 500 instead of killing the handler thread
+        print(f"Error running {operation}: {e!r}")
+        return 500, {"error": f"Internal error in {operation}."}
+
+
+def run_query(auto_sells: AutoSells, item: Dict) -> Tuple[int, object]:
+    """Runs one {"op": ..., "params": {...}} query of a batch."""
+    params = item.get("params") or {}
+    if not isinstance(params, dict):
+        return 400, {"error": "Params must be a JSON object."}
+    return execute(auto_sells, str(item.get("op", "")), params)
+
+
+class AutoRequestHandler(BaseHTTPRequestHandler):
+    """GET /<operation>?param=value runs one operation, POST /batch runs a list of them.
+
+    GET /metrics returns the Prometheus text metrics when they are enabled.
+
+    A batch body is a JSON list of {"op": ..., "params": {...}} objects and
+    the response lists {"status": ..., "result": ...} in the same order.
+    """
+
+    protocol_version = "HTTP/1.1"  # Keep-alive: connections stay open between requests
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    server_version = "AutoSells/" + str(AutoSells.DATABASE_VERSION)
+
+    def do_GET(self):
+        # http.server decodes the request line as latin-1; clients that skip percent-encoding send UTF-8
+        try:
+            url = urlsplit(self.path.encode("iso-8859-1").decode("utf-8"))
+        except UnicodeError:
+            url = urlsplit(self.path)
+        if url.path == "/metrics":
+            self._send_metrics()
+            return
+        status, payload = execute(self.server.auto_sells, url.path.strip("/"), dict(parse_qsl(url.query)))
+        self._send(status, payload)
+
+    def do_POST(self):
+        if urlsplit(self.path).path.strip("/") != "batch":
+            self._send(404, {"error": "Only /batch accepts POST."})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            batch = json.loads(self.rfile.read(length)) if length else None
+        except ValueError:
+            self._send(400, {"error": "Body must be JSON."})
+            return
+        if not isinstance(batch, list) or not all(isinstance(item, dict) for item in batch):
+            self._send(400, {"error": "Body must be a JSON list of queries."})
+            return
+        if len(batch) > MAX_BATCH_SIZE:
+            self._send(400, {"error": f"A batch holds at most {MAX_BATCH_SIZE} queries."})
+            return
+        results = []
+        for item in batch:
+            status, result = run_query(self.server.auto_sells, item)
+            results.append({"status": status, "result": result})
+        self._send(200, results)
+
+    def _send_metrics(self):
+        metrics = self.server.auto_sells.metrics
+        if metrics is None:
+            self._send(404, {"error": "Metrics are disabled."})
+            return
+        self._send(200, metrics.prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    def _send(self, status: int, payload, content_type: str = "application/json; charset=utf-8"):
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+        else:
+            body = json.dumps(payload, default=_to_json, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class AutoServer(ThreadingHTTPServer):
+    """Threaded HTTP server sharing one warm AutoSells catalog between all requests."""
+
+    daemon_threads = True
+
+    def __init__(self, auto_sells: AutoSells, host: str = "127.0.0.1", port: int = 8000, verbose: bool = False):
+        super().__init__((host, port), AutoRequestHandler)
+        self.auto_sells = auto_sells
+        self.verbose = verbose
+
+
+def serve(auto_sells: AutoSells, host: str = "127.0.0.1", port: int = 8000, verbose: bool = False):
+    server = AutoServer(auto_sells, host, port, verbose)
+    print(f"Сервер запущен на http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def run_load(host: str, port: int, paths: List[str], total: int = 10000, concurrency: int = 8) -> Dict:
+    """Sends total GET requests over concurrency keep-alive connections and reports throughput."""
+    if not paths:
+        raise InvalidInputError("At least one path is required.")
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(worker_id: int):
+        conn = HTTPConnection(host, port)
+        local, failed = [], 0
+        for n in range(worker_id, total, concurrency):
+            started = time.perf_counter()
+            try:
+                conn.request("GET", paths[n % len(paths)])
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 500:
+                    failed += 1
+            except OSError:
+                failed += 1
+                conn.close()
+                conn = HTTPConnection(host, port)
+            local.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {"requests": len(latencies), "errors": errors[0], "seconds": round(elapsed, 3),
+            "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": _percentile(latencies, 0.50), "p99_ms": _percentile(latencies, 0.99)}
+
+
+def _percentile(latencies: List[float], p: float) -> float:
+    """p-th percentile of sorted latencies in ms."""
+    return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3) if latencies else 0.0
+
+
+def _in_order(executor: Executor, run: Callable, items: Iterable[tuple], window: int) -> Iterator:
+    """Results of run(*item) in input order, with at most window items in flight."""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(run, *item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def run_batch(auto_sells: AutoSells, lines: Iterable[str], out: TextIO, output_format: str = "jsonl",
+              workers: int = 1, timing: bool = False) -> Dict:
+    """Runs JSONL queries, one {"op": ..., "params": {...}} per line, and streams the results to out.
+
+    Results come in input order, as JSON lines with the input line number,
+    op, status and result, or as CSV rows with the result JSON-encoded;
+    timing adds each query's ms. With workers > 1 that many threads share
+    the catalog. Returns the throughput and latency percentiles.
+    """
+    if output_format not in BATCH_FORMATS:
+        raise InvalidInputError(f"Output format must be one of: {', '.join(BATCH_FORMATS)}.")
+    if not isinstance(workers, int) or workers <= 0:
+        raise InvalidInputError("Workers must be a positive integer.")
+
+    def run(number: int, line: str) -> Tuple[int, object, int, object, float]:
+        started = time.perf_counter()
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = None
+        if not isinstance(item, dict):
+            return number, None, 400, {"error": "A query must be a JSON object."}, time.perf_counter() - started
+        status, result = run_query(auto_sells, item)  # execute() answers every error with a status
+        return number, item.get("op"), status, result, time.perf_counter() - started
+
+    writer = None
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["line", "op", "status"] + (["ms"] if timing else []) + ["result"])
+    latencies: List[float] = []
+    errors = 0
+    queries = ((number, line) for number, line in enumerate(lines, 1) if line.strip())
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as executor:
+        outcomes = _in_order(executor, run, queries, workers * 4) if workers > 1 else (run(*q) for q in queries)
+        for number, op, status, result, seconds in outcomes:
+            latencies.append(seconds)
+            errors += status >= 400
+            ms = [round(seconds * 1000, 3)] if timing else []
+            if writer is not None:
+                writer.writerow([number, op, status] + ms
+                                + [json.dumps(result, default=_to_json, ensure_ascii=False)])
+            else:
+                record = {"line": number, "op": op, "status": status}
+                if timing:
+                    record["ms"] = ms[0]
+                record["result"] = result
+                out.write(json.dumps(record, default=_to_json, ensure_ascii=False) + "\n")
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {"queries": len(latencies), "errors": errors, "seconds": round(elapsed, 3),
+            "queries_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": _percentile(latencies, 0.50), "p99_ms": _percentile(latencies, 0.99)}
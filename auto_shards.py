@@ -0,0 +1,509 @@
+
+import os
+import sqlite3
+import sys
+import threading
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from heapq import merge
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from auto_data import (AbstractAutoSells, AutoSells, City, AutoMarket, Auto, BulkInsertResult, PriceStats,
+                       NameIndex, DatabaseError, InvalidInputError, DataNotFoundError)
+
+# Merge keys matching the ORDER BY of the per-shard queries
+_PK_KEY = lambda auto: auto.pk_auto
+_PRICE_KEY = lambda auto: (auto.price, auto.pk_auto)
+_PRICE_DESC_KEY = lambda auto: (-auto.price, -auto.pk_auto)
+_QUERY_ORDER_KEYS = {
+    None: _PK_KEY,
+    "pk_auto": _PK_KEY,
+    "-pk_auto": lambda auto: -auto.pk_auto,
+    "price": _PRICE_KEY,
+    "-price": lambda auto: (-auto.price, auto.pk_auto),
+    "year_of_release": lambda auto: (auto.year_of_release.toordinal(), auto.pk_auto),
+    "-year_of_release": lambda auto: (-auto.year_of_release.toordinal(), auto.pk_auto),
+}
+
+_DISTANCE_KEY = lambda pair: (pair[0], pair[1].pk_auto)
+
+# Methods whose Autos a worker sends back as rows
+_AUTO_METHODS = {"find_autos_by_city", "find_autos_by_automarket", "find_autos_by_price_range",
+                 "find_cheapest_autos", "find_most_expensive_autos", "find_autos_by_year", "query",
+                 "top_autos", "page_autos"}
+_DISTANCE_METHODS = {"nearest_autos"}  # (distance, row) pairs
+
+
+class _RowShard(AutoSells):
+    """Worker-side shard whose auto queries return the raw rows: tuples pickle several times faster."""
+
+    _auto_from_row = staticmethod(tuple)
+
+
+_worker_shards: Dict[str, _RowShard] = {}  # db_path -> shard, per worker process
+
+
+def _open_shard(db_path: str, shard_class=AutoSells, **kwargs) -> AutoSells:
+    """A lazy AutoSells of its own for db_path, past the singleton; creates and migrates the schema."""
+    key = (shard_class, os.path.abspath(db_path))
+    previous = AutoSells._instances.pop(key, None)
+    try:
+        return shard_class(db_path, lazy=True, **kwargs)
+    finally:
+        if previous is None:
+            AutoSells._instances.pop(key, None)
+        else:
+            AutoSells._instances[key] = previous
+
+
+def _call(shard: AutoSells, method: str, args: tuple):
+    try:
+        return getattr(shard, method)(*args)
+    except DataNotFoundError:
+        return []  # the other shards may still have matches
+
+
+def _open_worker_shards(db_paths: List[str]):
+    """Process pool initializer, so no query waits for a shard to open."""
+    for db_path in db_paths:
+        # No result cache: the parent writes to the shards behind the worker's back
+        _worker_shards[db_path] = _open_shard(db_path, _RowShard, cache_size=0)
+
+
+def _call_shard(db_path: str, method: str, args: tuple):
+    """Runs one shard's part of a scattered query in a worker process."""
+    return _call(_worker_shards[db_path], method, args)
+
+
+def _combine_stats(parts: Iterable[PriceStats]) -> PriceStats:
+    parts = [stats for stats in parts if stats.count]
+    if not parts:
+        return PriceStats(count=0, min_price=None, max_price=None, avg_price=None)
+    count = sum(stats.count for stats in parts)
+    return PriceStats(count=count, min_price=min(stats.min_price for stats in parts),
+                      max_price=max(stats.max_price for stats in parts),
+                      avg_price=sum(stats.avg_price * stats.count for stats in parts) / count)
+
+
+def split_database(source_path: str, shard_paths: List[str]) -> List[int]:
+    """Copies a catalog into new shard files and returns the number of autos in each.
+
+    A city goes with its automarkets and their autos to shard pk_city % len(shard_paths);
+    autos of automarkets missing from the source are not copied.
+    """
+    if not shard_paths:
+        raise InvalidInputError("At least one shard path is needed.")
+    if not os.path.exists(source_path):
+        raise InvalidInputError(f"Database {source_path} does not exist.")
+    for path in shard_paths:
+        if os.path.exists(path):
+            raise InvalidInputError(f"Shard {path} already exists.")
+    _open_shard(source_path).close()  # brings the source up to the current schema
+    counts = []
+    for shard_id, path in enumerate(shard_paths):
+        _open_shard(path).close()
+        conn = sqlite3.connect(path)
+        try:
+            # No ChangeLog rows for the copied data; AutoSells recreates the triggers on open
+            for (trigger,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'"
+                                           " AND sql LIKE '%INSERT INTO ChangeLog%'").fetchall():
+                conn.execute(f"DROP TRIGGER {trigger}")
+            conn.execute("ATTACH DATABASE ? AS source", (source_path,))
+            partition = (len(shard_paths), len(shard_paths), len(shard_paths), shard_id)  # SQL % keeps the sign
+            with conn:
+                conn.execute("INSERT INTO Cities (pk_city, name) SELECT pk_city, name FROM source.Cities"
+                             " WHERE (pk_city % ? + ?) % ? = ?", partition)
+                conn.execute("INSERT INTO AutoMarkets (pk_automarket, name, fk_city)"
+                             " SELECT pk_automarket, name, fk_city FROM source.AutoMarkets"
+                             " WHERE (fk_city % ? + ?) % ? = ?", partition)
+                copied = conn.execute("INSERT INTO Autos (pk_auto, name, fk_automarket, price, year_of_release,"
+                                      " release_day, release_year) SELECT a.pk_auto, a.name, a.fk_automarket,"
+                                      " a.price, a.year_of_release, a.release_day, a.release_year"
+                                      " FROM AutoMarkets m CROSS JOIN source.Autos a"
+                                      " ON a.fk_automarket = m.pk_automarket")
+                counts.append(copied.rowcount)
+            conn.execute("DETACH DATABASE source")
+            conn.execute("ANALYZE")
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to fill shard {path}: {e}")
+        finally:
+            conn.close()
+    return counts
+
+
+class ShardedAutoSells(AbstractAutoSells):
+    """The AutoSells catalog partitioned across several SQLite files.
+
+    Every shard is a complete AutoSells database holding some cities with
+    their automarkets and autos; a new city goes to shard pk_city % len(db_paths).
+    Questions about one city or automarket go to its shard only, global
+    ones fan out to all shards through a process pool and the partial
+    results are merged in the order a single catalog returns them. Only
+    cities and automarkets are kept in memory, to route by. Each shard
+    commits its part of a bulk insert on its own.
+    """
+
+    BULK_CHUNK_SIZE = AutoSells.BULK_CHUNK_SIZE
+    PAGE_SIZE = AutoSells.PAGE_SIZE
+    TOP_N = AutoSells.TOP_N
+    AGGREGATE_GROUPS = AutoSells.AGGREGATE_GROUPS
+    NAME_KINDS = AutoSells.NAME_KINDS
+    SEARCH_MODES = AutoSells.SEARCH_MODES
+    SIMILAR_COUNT = AutoSells.SIMILAR_COUNT
+
+    def __init__(self, db_paths: List[str], processes: Optional[int] = None):
+        """processes defaults to one worker per shard (at most the CPU count); 0 runs every shard in-process."""
+        if not db_paths:
+            raise InvalidInputError("At least one shard path is needed.")
+        if processes is not None and (not isinstance(processes, int) or processes < 0):
+            raise InvalidInputError("Processes must be a non-negative integer.")
+        self.db_paths = list(db_paths)
+        self.metrics = None  # per-method metrics are an AutoSells feature
+        self._lock = threading.RLock()  # Guards the directory; writers hold it for the whole add_*
+        self._shards = [_open_shard(path) for path in self.db_paths]
+        if processes is None:
+            processes = min(len(self.db_paths), os.cpu_count() or 1)
+        self._executor = None
+        if processes and len(self.db_paths) > 1:
+            self._executor = ProcessPoolExecutor(processes, initializer=_open_worker_shards,
+                                                 initargs=(self.db_paths,))
+        # Kind -> NameIndex, built by the first search_names() and then kept current by the add_* methods
+        self._name_indexes: Optional[Dict[str, NameIndex]] = None
+        self._load_directory()
+
+    def _load_directory(self):
+        self.cities: Dict[int, City] = {}
+        self.automarkets: Dict[int, AutoMarket] = {}
+        self._shard_of_city: Dict[int, int] = {}
+        self._shard_of_market: Dict[int, int] = {}
+        self._city_ids_by_name: Dict[str, List[int]] = {}
+        self._market_ids_by_name: Dict[str, List[int]] = {}
+        for shard_id, shard in enumerate(self._shards):
+            for pk_city, name in shard._fetch_all("SELECT pk_city, name FROM Cities"):
+                self._index_city(City(pk_city=pk_city, name=name), shard_id)
+            for pk_automarket, name, fk_city in shard._fetch_all(
+                    "SELECT pk_automarket, name, fk_city FROM AutoMarkets"):
+                self._index_automarket(AutoMarket(pk_automarket=pk_automarket, name=name, fk_city=fk_city),
+                                       shard_id)
+
+    def _index_city(self, city: City, shard_id: int):
+        self.cities[city.pk_city] = city
+        self._shard_of_city[city.pk_city] = shard_id
+        self._city_ids_by_name.setdefault(city.name.lower(), []).append(city.pk_city)
+        self._index_name("city", city.name)
+
+    def _index_automarket(self, automarket: AutoMarket, shard_id: int):
+        self.automarkets[automarket.pk_automarket] = automarket
+        self._shard_of_market[automarket.pk_automarket] = shard_id
+        self._market_ids_by_name.setdefault(automarket.name.lower(), []).append(automarket.pk_automarket)
+        self._index_name("automarket", automarket.name)
+
+    def _build_name_indexes(self):
+        auto_names: Dict[str, int] = {}
+        for shard in self._shards:
+            for name, count in shard._fetch_all("SELECT name, COUNT(*) FROM Autos GROUP BY name"):
+                auto_names[name] = auto_names.get(name, 0) + count
+        self._name_indexes = {"city": NameIndex(city.name for city in self.cities.values()),
+                              "automarket": NameIndex(automarket.name for automarket in self.automarkets.values()),
+                              "auto": NameIndex(counts=auto_names)}
+
+    # Shared with AutoSells: they only use the attributes set up above
+    _index_name = AutoSells._index_name
+    _check_group = AutoSells._check_group
+    search_names = AutoSells.search_names
+    similar_autos = AutoSells.similar_autos
+    clear_console = AutoSells.clear_console
+    scip = AutoSells.scip
+    menu = AutoSells.menu
+
+    def _city_shard(self, pk_city: int) -> int:
+        shard_id = self._shard_of_city.get(pk_city)
+        return pk_city % len(self._shards) if shard_id is None else shard_id
+
+    def _market_shard(self, pk_automarket: int) -> int:
+        shard_id = self._shard_of_market.get(pk_automarket)
+        if shard_id is None:
+            raise InvalidInputError(f"AutoMarket with pk_automarket {pk_automarket} does not exist.")
+        return shard_id
+
+    def _scatter(self, shard_ids: Iterable[int], method: str, *args) -> list:
+        """Calls an AutoSells method on the given shards, in parallel when there are several.
+
+        Returns the results in shard order, [] for a shard that found nothing.
+        """
+        shard_ids = sorted(set(shard_ids))
+        if len(shard_ids) == 1 or self._executor is None:
+            return [_call(self._shards[shard_id], method, args) for shard_id in shard_ids]
+        try:
+            futures = [self._executor.submit(_call_shard, self.db_paths[shard_id], method, args)
+                       for shard_id in shard_ids]
+            parts = [future.result() for future in futures]
+        except BrokenProcessPool as e:
+            raise DatabaseError(f"Shard worker failed: {e}")
+        if method in _AUTO_METHODS:
+            return [[AutoSells._auto_from_row(row) for row in part] for part in parts]
+        if method in _DISTANCE_METHODS:
+            return [[(distance, AutoSells._auto_from_row(row)) for distance, row in part] for part in parts]
+        return parts
+
+    def _all_shards(self) -> range:
+        return range(len(self._shards))
+
+    def _owners(self, pks: List[int]) -> Dict[int, int]:
+        """pk_auto -> shard for the given pks already in some shard."""
+        owners = {}
+        for shard_id, shard in enumerate(self._shards):
+            rows = shard._fetch_all(f"SELECT pk_auto FROM Autos WHERE pk_auto IN ({', '.join('?' for _ in pks)})",
+                                    tuple(pks))
+            owners.update((pk, shard_id) for (pk,) in rows)
+        return owners
+
+    def add_city(self, city: City):
+        with self._lock:
+            if city.pk_city in self.cities:
+                print(f"City with pk_city {city.pk_city} already exists.")
+                return
+            shard_id = self._city_shard(city.pk_city)
+            self._shards[shard_id].add_city(city)
+            self._index_city(city, shard_id)
+
+    def add_automarket(self, automarket: AutoMarket):
+        with self._lock:
+            if automarket.pk_automarket in self.automarkets:
+                print(f"AutoMarket with pk_automarket {automarket.pk_automarket} already exists.")
+                return
+            shard_id = self._city_shard(automarket.fk_city)
+            self._shards[shard_id].add_automarket(automarket)
+            self._index_automarket(automarket, shard_id)
+
+    def add_auto(self, auto: Auto):
+        with self._lock:
+            shard_id = self._market_shard(auto.fk_automarket)
+            if self._owners([auto.pk_auto]):
+                print(f"Auto with pk_auto {auto.pk_auto} already exists.")
+                return
+            self._shards[shard_id].add_auto(auto)
+            self._index_name("auto", auto.name)
+
+    def _add_bulk(self, method: str, items: Iterable, pk_of: Callable[[object], int],
+                  shard_of: Callable[[object], int], existing: Callable[[List[int]], Iterable[int]],
+                  on_insert: Callable[[object, int], None], chunk_size: int) -> BulkInsertResult:
+        """Routes every chunk of items to the shards and inserts those whose pk is new to all of them."""
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise InvalidInputError("Chunk size must be a positive integer.")
+        result = BulkInsertResult(inserted=0, skipped=0)
+        seen = set()
+        items = iter(items)
+        with self._lock:
+            while True:
+                chunk = list(islice(items, chunk_size))
+                if not chunk:
+                    break
+                fresh = {}
+                for item in chunk:
+                    if pk_of(item) in seen or pk_of(item) in fresh:
+                        result.skipped += 1
+                    else:
+                        fresh[pk_of(item)] = item
+                seen.update(fresh)
+                for pk in existing(list(fresh)) if fresh else ():
+                    del fresh[pk]
+                    result.skipped += 1
+                groups: Dict[int, list] = {}
+                for item in fresh.values():
+                    groups.setdefault(shard_of(item), []).append(item)
+                for shard_id, group in sorted(groups.items()):
+                    result.inserted += getattr(self._shards[shard_id], method)(group, chunk_size).inserted
+                    for item in group:
+                        on_insert(item, shard_id)
+        return result
+
+    def add_cities_bulk(self, cities: Iterable[City], chunk_size: int = BULK_CHUNK_SIZE) -> BulkInsertResult:
+        return self._add_bulk("add_cities_bulk", cities, lambda city: city.pk_city,
+                              lambda city: self._city_shard(city.pk_city),
+                              lambda pks: [pk for pk in pks if pk in self.cities], self._index_city, chunk_size)
+
+    def add_automarkets_bulk(self, automarkets: Iterable[AutoMarket],
+                             chunk_size: int = BULK_CHUNK_SIZE) -> BulkInsertResult:
+        return self._add_bulk("add_automarkets_bulk", automarkets, lambda automarket: automarket.pk_automarket,
+                              lambda automarket: self._city_shard(automarket.fk_city),
+                              lambda pks: [pk for pk in pks if pk in self.automarkets], self._index_automarket,
+                              chunk_size)
+
+    def add_autos_bulk(self, autos: Iterable[Auto], chunk_size: int = BULK_CHUNK_SIZE) -> BulkInsertResult:
+        return self._add_bulk("add_autos_bulk", autos, lambda auto: auto.pk_auto,
+                              lambda auto: self._market_shard(auto.fk_automarket), self._owners,
+                              lambda auto, shard_id: self._index_name("auto", auto.name), chunk_size)
+
+    def get_auto(self, auto_id: int) -> Optional[Auto]:
+        for shard in self._shards:
+            auto = shard.get_auto(auto_id)
+            if auto is not None:
+                return auto
+        return None
+
+    def find_autos_by_city(self, city_name: str) -> List[Auto]:
+        with self._lock:
+            shard_ids = [self._shard_of_city[city_id] for city_id in self._city_ids_by_name.get(city_name.lower(), ())]
+        result = [auto for part in self._scatter(shard_ids, "find_autos_by_city", city_name) for auto in part]
+        if not result:
+            raise DataNotFoundError(f"No autos found in city {city_name}")
+        return result
+
+    def find_autos_by_automarket(self, automarket_name: str) -> List[Auto]:
+        with self._lock:
+            shard_ids = [self._shard_of_market[market_id]
+                         for market_id in self._market_ids_by_name.get(automarket_name.lower(), ())]
+        result = [auto for part in self._scatter(shard_ids, "find_autos_by_automarket", automarket_name)
+                  for auto in part]
+        if not result:
+            raise DataNotFoundError(f"No autos found in the automarket {automarket_name}")
+        return result
+
+    def find_autos_by_price_range(self, min_price: float, max_price: float) -> List[Auto]:
+        parts = self._scatter(self._all_shards(), "find_autos_by_price_range", min_price, max_price)
+        result = list(merge(*parts, key=_PRICE_KEY))
+        if not result:
+            raise DataNotFoundError(f"No autos found in the price range from {min_price} to {max_price}")
+        return result
+
+    def find_cheapest_autos(self, count: int) -> List[Auto]:
+        parts = self._scatter(self._all_shards(), "find_cheapest_autos", count)
+        result = list(islice(merge(*parts, key=_PRICE_KEY), count))
+        if not result and count:
+            raise DataNotFoundError("No autos found in the database.")
+        return result
+
+    def find_most_expensive_autos(self, count: int) -> List[Auto]:
+        parts = self._scatter(self._all_shards(), "find_most_expensive_autos", count)
+        result = list(islice(merge(*parts, key=_PRICE_DESC_KEY), count))
+        if not result and count:
+            raise DataNotFoundError("No autos found in the database.")
+        return result
+
+    def find_autos_by_year(self, year: int) -> List[Auto]:
+        parts = self._scatter(self._all_shards(), "find_autos_by_year", year)
+        result = list(merge(*parts, key=_PK_KEY))
+        if not result:
+            raise DataNotFoundError(f"No autos found in the year {year}")
+        return result
+
+    def query(self, city: Optional[str] = None, automarket: Optional[str] = None,
+              price: Optional[Tuple[Optional[float], Optional[float]]] = None,
+              years: Optional[Tuple[int, int]] = None, order_by: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Auto]:
+        """AutoSells.query() over the shards holding the named city and automarket (all by default)."""
+        order_by = order_by or None  # '' is unordered, as in AutoSells.query()
+        if order_by not in _QUERY_ORDER_KEYS:
+            raise InvalidInputError(f"Cannot order by {order_by}.")
+        shard_ids = set(self._all_shards())
+        with self._lock:
+            if city is not None:
+                shard_ids &= {self._shard_of_city[city_id] for city_id in self._city_ids_by_name.get(city.lower(), ())}
+            if automarket is not None:
+                shard_ids &= {self._shard_of_market[market_id]
+                              for market_id in self._market_ids_by_name.get(automarket.lower(), ())}
+        # With no shard left the first one still validates the arguments, and finds nothing
+        parts = self._scatter(shard_ids or [0], "query", city, automarket, price, years, order_by, limit)
+        return list(islice(merge(*parts, key=_QUERY_ORDER_KEYS[order_by]), limit))
+
+    def _group_shards(self, by: str, key: int) -> Iterable[int]:
+        if by == "city":
+            return [self._city_shard(key)]
+        if by == "automarket":
+            return [self._shard_of_market.get(key, 0)]
+        return self._all_shards()
+
+    def price_stats(self, by: str, key: int) -> PriceStats:
+        self._check_group(by, key)
+        return _combine_stats(self._scatter(self._group_shards(by, key), "price_stats", by, key))
+
+    def price_stats_by(self, by: str) -> Dict[int, PriceStats]:
+        self._check_group(by)
+        parts: Dict[int, List[PriceStats]] = {}
+        for part in self._scatter(self._all_shards(), "price_stats_by", by):
+            for key, stats in part.items():
+                parts.setdefault(key, []).append(stats)
+        return {key: _combine_stats(stats) for key, stats in parts.items()}
+
+    def top_autos(self, by: str, key: int, count: int = TOP_N, most_expensive: bool = False) -> List[Auto]:
+        self._check_group(by, key)
+        parts = self._scatter(self._group_shards(by, key), "top_autos", by, key, count, most_expensive)
+        result = list(islice(merge(*parts, key=_PRICE_DESC_KEY if most_expensive else _PRICE_KEY), count))
+        if not result and count:
+            raise DataNotFoundError(f"No autos found for {by} {key}")
+        return result
+
+    def _city_of_automarket(self, automarket_id: int) -> Optional[int]:
+        with self._lock:
+            automarket = self.automarkets.get(automarket_id)
+            return automarket.fk_city if automarket is not None else None
+
+    def nearest_autos(self, price: float, year_of_release: date, count: Optional[int] = SIMILAR_COUNT,
+                      radius: Optional[float] = None, city_id: Optional[int] = None,
+                      exclude: Optional[int] = None) -> List[Tuple[float, Auto]]:
+        """AutoSells.nearest_autos() over the shard of city_id, or all shards."""
+        AutoSells._check_nearest(price, year_of_release, count, radius)
+        shard_ids = [self._city_shard(city_id)] if city_id is not None else self._all_shards()
+        parts = self._scatter(shard_ids, "nearest_autos", price, year_of_release, count, radius, city_id, exclude)
+        return list(islice(merge(*parts, key=_DISTANCE_KEY), count))
+
+    def iter_autos(self, after_pk: Optional[int] = None, page_size: int = PAGE_SIZE) -> Iterator[Auto]:
+        return merge(*(shard.iter_autos(after_pk, page_size) for shard in self._shards), key=_PK_KEY)
+
+    def _iter_directory(self, items: Dict[int, object], after_pk: Optional[int], page_size: int) -> Iterator:
+        if not isinstance(page_size, int) or page_size <= 0:
+            raise InvalidInputError("Page size must be a positive integer.")
+        if after_pk is not None and not isinstance(after_pk, int):
+            raise InvalidInputError("after_pk must be an integer.")
+        with self._lock:
+            pks = sorted(pk for pk in items if after_pk is None or pk > after_pk)
+        for pk in pks:
+            yield items[pk]
+
+    def iter_automarkets(self, after_pk: Optional[int] = None, page_size: int = PAGE_SIZE) -> Iterator[AutoMarket]:
+        return self._iter_directory(self.automarkets, after_pk, page_size)
+
+    def iter_cities(self, after_pk: Optional[int] = None, page_size: int = PAGE_SIZE) -> Iterator[City]:
+        return self._iter_directory(self.cities, after_pk, page_size)
+
+    def list_all_autos(self) -> List[str]:
+        parts = self._scatter(self._all_shards(), "page_autos", None, sys.maxsize)
+        result = [str(auto) for auto in merge(*parts, key=_PK_KEY)]
+        if not result:
+            raise DataNotFoundError("No autos found in the database.")
+        return result
+
+    def list_all_automarkets(self) -> List[str]:
+        result = [str(automarket) for automarket in self.iter_automarkets()]
+        if not result:
+            raise DataNotFoundError("No automarkets found in the database.")
+        return result
+
+    def list_all_cities(self) -> List[str]:
+        result = [str(city) for city in self.iter_cities()]
+        if not result:
+            raise DataNotFoundError("No cities found in the database.")
+        return result
+
+    def refresh(self) -> int:
+        """Picks up rows other connections changed in any shard; returns the number of changed rows."""
+        with self._lock:
+            changed = sum(shard.refresh() for shard in self._shards)
+            if changed:
+                self._name_indexes = None
+                self._load_directory()
+            return changed
+
+    def close(self):
+        """Stops the worker processes and closes every shard."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for shard in self._shards:
+            shard.close()
+
+    def __str__(self):
+        return f"ShardedAutoSells(shards={self.db_paths}, cities={len(self.cities)}, automarkets={len(self.automarkets)})"
@@ -0,0 +1,6 @@
+"""Synthetic catalog generator and timing/memory benchmarks for AutoSells.
+
+Run with: python -m benchmarks 10k 100k --output results.json
+"""
+from benchmarks.generate import generate_catalog, generate_rows
+from benchmarks.run import run_benchmarks, benchmark_catalog, compare
@@ -0,0 +1,110 @@
+
+import os
+import random
+import sqlite3
+from bisect import bisect_right
+from datetime import date
+from itertools import accumulate, islice
+from typing import Iterator, List, Tuple
+
+from auto_data import AutoSells
+
+CITY_NAMES = ["Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань", "Нижний Новгород",
+              "Челябинск", "Красноярск", "Самара", "Уфа", "Ростов-на-Дону", "Омск", "Краснодар", "Воронеж",
+              "Пермь", "Волгоград", "Барнаул", "Томск", "Иркутск", "Хабаровск"]
+
+# (model, typical price); earlier models are the more common ones
+MODELS = [("Lada Vesta", 1300000), ("Kia Rio", 1700000), ("Hyundai Solaris", 1600000),
+          ("Toyota Camry", 3500000), ("Volkswagen Polo", 1500000), ("Skoda Octavia", 2200000),
+          ("Renault Logan", 1100000), ("Toyota RAV4", 3800000), ("Kia Sportage", 2900000),
+          ("Nissan Qashqai", 2500000), ("Mazda CX-5", 3300000), ("Honda Civic", 2300000),
+          ("Ford Focus", 1400000), ("Chery Tiggo 7", 2600000), ("Haval Jolion", 2200000),
+          ("BMW X5", 9000000), ("Mercedes-Benz E-Class", 7500000), ("Audi A6", 6500000),
+          ("Lexus RX", 8000000), ("Porsche Cayenne", 14000000), ("Bugatti Chiron", 250000000)]
+
+FIRST_YEAR, LAST_YEAR = 1995, 2024
+BATCH_SIZE = 10000
+
+
+def _zipf_weights(count: int, exponent: float) -> List[float]:
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def _pick(rng: random.Random, cum_weights: List[float]) -> int:
+    return bisect_right(cum_weights, rng.random() * cum_weights[-1])
+
+
+def catalog_shape(autos: int) -> Tuple[int, int]:
+    """Cities and automarkets for a catalog of the given size."""
+    cities = max(5, min(1000, autos // 10000))
+    automarkets = max(cities, min(50000, autos // 200))
+    return cities, automarkets
+
+
+def generate_rows(autos: int, seed: int = 0) -> Tuple[List[tuple], List[tuple], Iterator[tuple]]:
+    """City, automarket and (streamed) auto rows with Zipf-skewed popularity.
+
+    A few big cities hold most automarkets, a few automarkets most autos and
+    a few mass-market models most listings; prices are log-normal around
+    each model's price, release years lean towards recent ones.
+    """
+    rng = random.Random(seed)
+    city_count, market_count = catalog_shape(autos)
+    cities = [(pk, CITY_NAMES[(pk - 1) % len(CITY_NAMES)] + ("" if pk <= len(CITY_NAMES) else f" {pk}"))
+              for pk in range(1, city_count + 1)]
+    city_weights = _zipf_weights(city_count, 1.1)
+    automarkets = []
+    for pk in range(1, market_count + 1):
+        city_pk = _pick(rng, city_weights) + 1
+        automarkets.append((pk, f"Автосалон {cities[city_pk - 1][1]} {pk}", city_pk))
+
+    def auto_rows() -> Iterator[tuple]:
+        market_weights = _zipf_weights(market_count, 0.8)
+        model_weights = _zipf_weights(len(MODELS), 1.2)
+        year_weights = list(accumulate(range(1, LAST_YEAR - FIRST_YEAR + 2)))
+        for pk in range(1, autos + 1):
+            model, base_price = MODELS[_pick(rng, model_weights)]
+            year = FIRST_YEAR + _pick(rng, year_weights)
+            age_discount = 0.92 ** (LAST_YEAR - year)
+            price = round(base_price * age_discount * rng.lognormvariate(0, 0.25), -3)
+            released = date(year, rng.randint(1, 12), rng.randint(1, 28))
+            yield pk, model, _pick(rng, market_weights) + 1, price, released.isoformat(), released.toordinal(), year
+
+    return cities, automarkets, auto_rows()
+
+
+def generate_catalog(db_path: str, autos: int, seed: int = 0) -> str:
+    """Writes a synthetic catalog database with the AutoSells schema; reuses an existing file."""
+    if os.path.exists(db_path):
+        return db_path
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    AutoSells(tmp_path, lazy=True).close()  # Creates the tables and indexes without loading anything
+
+    cities, automarkets, auto_rows = generate_rows(autos, seed)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        # No ChangeLog rows for the generated data (the generator fills release_day/release_year
+        # itself); AutoSells recreates the triggers on open
+        for (trigger,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'"
+                                       " AND sql LIKE '%INSERT INTO ChangeLog%'").fetchall():
+            conn.execute(f"DROP TRIGGER {trigger}")
+        with conn:
+            conn.executemany("INSERT INTO Cities VALUES (?, ?)", cities)
+            conn.executemany("INSERT INTO AutoMarkets VALUES (?, ?, ?)", automarkets)
+            while True:
+                batch = list(islice(auto_rows, BATCH_SIZE))
+                if not batch:
+                    break
+                conn.executemany("INSERT INTO Autos (pk_auto, name, fk_automarket, price, year_of_release,"
+                                 " release_day, release_year) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return db_path
@@ -0,0 +1,173 @@
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+from auto_data import AutoSells, City, AutoMarket, Auto, np
+from benchmarks.generate import generate_catalog, catalog_shape
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+MODES = {"eager": {}, "lazy": {"lazy": True}, "columnar": {"columnar": True},
+         "hot": {"lazy": True, "hot": True, "checkpoint_interval": None, "checkpoint_changes": None}}
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+def _timed(func: Callable, repeat: int, setup: Optional[Callable] = None) -> Dict[str, float]:
+    """Min and median wall time of func over repeat runs; setup runs untimed before each."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return {"min_s": round(min(times), 6), "median_s": round(statistics.median(times), 6), "runs": repeat}
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # bytes on macOS, KiB elsewhere
+
+
+def benchmark_catalog(db_path: str, autos: int, mode: str, repeat: int = 5) -> Dict:
+    """Times startup, every find_*, the add_* paths and the list methods on one database."""
+    # tracemalloc slows allocation down, so the timed startup and the traced one are separate loads
+    tracemalloc.start()
+    AutoSells(db_path, **MODES[mode]).close()
+    _, startup_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    started = time.perf_counter()
+    auto_sells = AutoSells(db_path, **MODES[mode])
+    startup_s = time.perf_counter() - started
+    startup_snapshot_s = None
+    if not auto_sells.lazy:
+        snapshot_path = auto_sells.save_snapshot(f"{db_path}.{mode}.snapshot")
+        auto_sells.close()
+        started = time.perf_counter()
+        auto_sells = AutoSells(db_path, snapshot=snapshot_path, **MODES[mode])
+        startup_snapshot_s = round(time.perf_counter() - started, 6)
+        os.remove(snapshot_path)
+
+    cities, automarkets = catalog_shape(autos)
+    city = auto_sells.conn.execute("SELECT name FROM Cities ORDER BY pk_city LIMIT 1").fetchone()[0]
+    market = auto_sells.conn.execute("SELECT name FROM AutoMarkets ORDER BY pk_automarket LIMIT 1").fetchone()[0]
+    cold = auto_sells.clear_cache
+    timings = {
+        "find_autos_by_city": _timed(lambda: auto_sells.find_autos_by_city(city), repeat, cold),
+        "find_autos_by_city_cached": _timed(lambda: auto_sells.find_autos_by_city(city), repeat),
+        "find_autos_by_price_range": _timed(lambda: auto_sells.find_autos_by_price_range(1000000, 1100000),
+                                            repeat, cold),
+        "find_cheapest_autos": _timed(lambda: auto_sells.find_cheapest_autos(10), repeat, cold),
+        "find_most_expensive_autos": _timed(lambda: auto_sells.find_most_expensive_autos(10), repeat, cold),
+        "find_autos_by_automarket": _timed(lambda: auto_sells.find_autos_by_automarket(market), repeat, cold),
+        "find_autos_by_year": _timed(lambda: auto_sells.find_autos_by_year(2020), repeat, cold),
+        "query": _timed(lambda: auto_sells.query(city=city, price=(None, 2000000), years=(2015, 2020),
+                                                 order_by="price", limit=100), repeat, cold),
+        "price_stats_by_city": _timed(lambda: auto_sells.price_stats_by("city"), repeat),
+        "top_autos_by_city": _timed(lambda: auto_sells.top_autos("city", 1), repeat),
+        "search_names_prefix": _timed(lambda: auto_sells.search_names("automarket", market[:8]), repeat),
+        "search_names_fuzzy": _timed(lambda: auto_sells.search_names("city", city[:2] + city[3:], "fuzzy"), repeat),
+        "similar_autos": _timed(lambda: auto_sells.similar_autos(1), repeat),
+        "similar_autos_same_city": _timed(lambda: auto_sells.similar_autos(1, same_city=True), repeat),
+    }
+
+    # Writes use primary keys past the generated ones, so the database file stays reusable
+    next_pk = iter(range(autos + cities + automarkets + 1, sys.maxsize))
+    timings["add_city"] = _timed(lambda: auto_sells.add_city(City(next(next_pk), "Бенчмарк")), repeat)
+    timings["add_automarket"] = _timed(
+        lambda: auto_sells.add_automarket(AutoMarket(next(next_pk), "Бенчмарк", 1)), repeat)
+    timings["add_auto"] = _timed(
+        lambda: auto_sells.add_auto(Auto(next(next_pk), "Бенчмарк", 1, 1000000.0, date(2020, 1, 1))), repeat)
+    bulk = [Auto(next(next_pk), "Бенчмарк", 1, 1000000.0, date(2020, 1, 1)) for _ in range(10000)]
+    timings["add_autos_bulk_10k"] = _timed(lambda: auto_sells.add_autos_bulk(bulk), 1)
+
+    for name in ("list_all_cities", "list_all_automarkets", "list_all_autos"):
+        timings[name] = _timed(getattr(auto_sells, name), 1)
+
+    with auto_sells._pool.transaction() as cursor:
+        for table, pk_column in (("Cities", "pk_city"), ("AutoMarkets", "pk_automarket"), ("Autos", "pk_auto")):
+            cursor.execute(f"DELETE FROM {table} WHERE {pk_column} > ?", (autos + cities + automarkets,))
+        cursor.execute("DELETE FROM ChangeLog")
+    auto_sells.close()
+
+    return {"autos": autos, "cities": cities, "automarkets": automarkets, "mode": mode,
+            "startup_s": round(startup_s, 6), "startup_snapshot_s": startup_snapshot_s,
+            "startup_python_peak_mb": round(startup_peak / 2 ** 20, 1),
+            "peak_rss_mb": _peak_rss_mb(), "timings": timings}
+
+
+def _run_isolated(db_path: str, autos: int, mode: str, repeat: int) -> Dict:
+    # A fresh interpreter per run keeps peak RSS and the singleton from leaking between runs
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(benchmark_catalog, (db_path, autos, mode, repeat))
+
+
+def run_benchmarks(sizes: List[str], modes: List[str], repeat: int = 5, seed: int = 0,
+                   data_dir: str = DATA_DIR) -> Dict:
+    results = []
+    for size in sizes:
+        autos = SIZES[size]
+        started = time.perf_counter()
+        db_path = generate_catalog(os.path.join(data_dir, f"autos-{size}-seed{seed}.db"), autos, seed)
+        print(f"{size}: база готова за {time.perf_counter() - started:.1f} с", file=sys.stderr)
+        for mode in modes:
+            results.append(_run_isolated(db_path, autos, mode, repeat))
+            print(f"{size} {mode}: запуск {results[-1]['startup_s']:.3f} с, "
+                  f"пик RSS {results[-1]['peak_rss_mb']} МБ", file=sys.stderr)
+    return {"database_version": AutoSells.DATABASE_VERSION, "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "platform": platform.platform(), "numpy": np is not None,
+            "seed": seed, "results": results}
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = 1.5) -> List[str]:
+    """Timings at least threshold times slower than in the baseline report (best runs, less noisy)."""
+    previous = {(r["autos"], r["mode"]): r for r in baseline["results"]}
+    slower = []
+    for result in current["results"]:
+        old = previous.get((result["autos"], result["mode"]))
+        if old is None:
+            continue
+        pairs = [("startup", old["startup_s"], result["startup_s"])]
+        pairs += [(name, old["timings"][name]["min_s"], timing["min_s"])
+                  for name, timing in result["timings"].items() if name in old["timings"]]
+        for name, before, after in pairs:
+            if before > 0 and after / before >= threshold:
+                slower.append(f"{result['autos']} {result['mode']} {name}: {before:.6f} -> {after:.6f} s "
+                              f"(x{after / before:.2f})")
+    return slower
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Бенчмарки AutoSells")
+    parser.add_argument("sizes", nargs="*", default=["10k", "100k"], choices=list(SIZES))
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Файл для JSON-отчёта (по умолчанию stdout)")
+    parser.add_argument("--compare", help="Предыдущий JSON-отчёт для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=1.5, help="Во сколько раз медленнее считать регрессией")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.modes, args.repeat, args.seed)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            slower = compare(json.load(f), report, args.threshold)
+        for line in slower:
+            print(f"Регрессия: {line}", file=sys.stderr)
+        if slower:
+            sys.exit(1)
@@ -1,8 +1,127 @@
-
-from datetime import date
-from auto_data import AutoSells, City, AutoMarket, Auto
-
-if __name__ == "__main__":
-    autosells = AutoSells()
-
-    autosells.menu()
+
+import argparse
+import json
+import sys
+import time
+from datetime import date
+from auto_data import AutoSells, City, AutoMarket, Auto
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Автосалоны: интерактивное меню, пакетные запросы, HTTP-сервер, нагрузочный тест,"
+                                                 " импорт и экспорт")
+    commands = parser.add_subparsers(dest="command")
+
+    serve_parser = commands.add_parser("serve", help="HTTP/JSON сервер поверх AutoSells")
+    serve_parser.add_argument("--db", default="autosells.db")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--verbose", action="store_true", help="Логировать каждый запрос")
+    serve_parser.add_argument("--metrics", action="store_true", help="Собирать метрики (GET /metrics)")
+    serve_parser.add_argument("--snapshot", help="Файл снимка каталога для быстрого старта")
+    serve_parser.add_argument("--shards", nargs="+", help="Файлы шардов (вместо --db)")
+    serve_parser.add_argument("--hot", action="store_true", help="Держать базу в памяти и сохранять на диск в фоне")
+    serve_parser.add_argument("--shared", help="Имя каталога в общей памяти (см. publish) вместо загрузки своей копии")
+
+    publish_parser = commands.add_parser("publish", help="Загрузить каталог в общую память для serve --shared")
+    publish_parser.add_argument("--db", default="autosells.db")
+    publish_parser.add_argument("--name", default="autosells", help="Имя каталога в общей памяти")
+    publish_parser.add_argument("--interval", type=float, default=1.0, help="Секунд между проверками изменений")
+
+    load_parser = commands.add_parser("load", help="Нагрузочный тест запущенного сервера")
+    load_parser.add_argument("--host", default="127.0.0.1")
+    load_parser.add_argument("--port", type=int, default=8000)
+    load_parser.add_argument("--requests", type=int, default=10000)
+    load_parser.add_argument("--concurrency", type=int, default=8)
+    load_parser.add_argument("paths", nargs="*", default=["/find_cheapest_autos?count=10",
+                                                         "/find_autos_by_year?year=2020",
+                                                         "/list_all_cities"])
+
+    import_parser = commands.add_parser("import", help="Импорт CSV/JSONL (можно .gz) в базу")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--db", default="autosells.db")
+    import_parser.add_argument("--kind", choices=["city", "automarket", "auto"],
+                               help="Тип всех записей файла (иначе берётся из поля type)")
+    import_parser.add_argument("--chunk-size", type=int, default=5000)
+    import_parser.add_argument("--progress", help="Файл прогресса для продолжения прерванного импорта")
+    import_parser.add_argument("--strict", action="store_true", help="Остановиться на первой ошибочной записи")
+
+    export_parser = commands.add_parser("export", help="Экспорт таблицы в CSV/JSONL (можно .gz)")
+    export_parser.add_argument("table", choices=["cities", "automarkets", "autos"])
+    export_parser.add_argument("path")
+    export_parser.add_argument("--db", default="autosells.db")
+
+    batch_parser = commands.add_parser("batch", help="Выполнить запросы из JSONL-файла без меню")
+    batch_parser.add_argument("path", nargs="?", default="-",
+                              help='Файл запросов {"op": ..., "params": {...}} по строке, "-" - stdin')
+    batch_parser.add_argument("--db", default="autosells.db")
+    batch_parser.add_argument("--snapshot", help="Файл снимка каталога для быстрого старта")
+    batch_parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    batch_parser.add_argument("--output", help="Файл результатов (по умолчанию stdout)")
+    batch_parser.add_argument("--workers", type=int, default=1, help="Потоков для параллельных запросов")
+    batch_parser.add_argument("--timing", action="store_true", help="Время каждого запроса в мс")
+
+    shard_parser = commands.add_parser("shard", help="Разбить базу по городам на несколько файлов-шардов")
+    shard_parser.add_argument("--db", default="autosells.db")
+    shard_parser.add_argument("paths", nargs="+", help="Новые файлы шардов")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.command == "serve":
+        from auto_server import serve
+        if args.shards:
+            from auto_shards import ShardedAutoSells
+            auto_sells = ShardedAutoSells(args.shards)
+        elif args.shared:
+            auto_sells = AutoSells(args.db, metrics=args.metrics, shared=args.shared)
+            auto_sells.start_refresh_poller()  # picks up each new generation
+        else:
+            auto_sells = AutoSells(args.db, metrics=args.metrics, snapshot=args.snapshot, hot=args.hot)
+        serve(auto_sells, args.host, args.port, args.verbose)
+    elif args.command == "publish":
+        auto_sells = AutoSells(args.db, columnar=True)
+        auto_sells.start_publishing(args.name, args.interval)
+        print(f"Каталог опубликован в общей памяти как {args.name}, Ctrl+C - остановить")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            auto_sells.close()
+    elif args.command == "load":
+        from auto_server import run_load
+        print(json.dumps(run_load(args.host, args.port, args.paths, args.requests, args.concurrency), indent=2))
+    elif args.command == "import":
+        from auto_io import import_file
+        result = import_file(AutoSells(args.db, lazy=True), args.path, args.kind, chunk_size=args.chunk_size,
+                             progress_path=args.progress, strict=args.strict)
+        for error in result.errors:
+            print(error)
+        print(result)
+    elif args.command == "export":
+        from auto_io import export_table
+        print(f"Записей выгружено: {export_table(AutoSells(args.db, lazy=True), args.table, args.path)}")
+    elif args.command == "batch":
+        from auto_server import run_batch
+        auto_sells = AutoSells(args.db, snapshot=args.snapshot)
+        queries = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+        out = sys.stdout if args.output is None else open(args.output, "w", encoding="utf-8", newline="")
+        try:
+            summary = run_batch(auto_sells, queries, out, args.format, args.workers, args.timing)
+        finally:
+            for stream in (queries, out):
+                if stream not in (sys.stdin, sys.stdout):
+                    stream.close()
+        print(json.dumps(summary), file=sys.stderr)
+    elif args.command == "shard":
+        from auto_shards import split_database
+        for path, count in zip(args.paths, split_database(args.db, args.paths)):
+            print(f"{path}: автомобилей {count}")
+    else:
+        autosells = AutoSells()
+
+        autosells.menu()
@@ -0,0 +1,47 @@
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+from auto_data import AutoSells, City, AutoMarket, Auto
+
+# Catalog mode -> AutoSells options
+MODES = {"eager": {}, "lazy": {"lazy": True}, "columnar": {"columnar": True}}
+
+CITIES = [City(pk_city=1, name="Москва"), City(pk_city=2, name="Казань")]
+AUTOMARKETS = [AutoMarket(pk_automarket=1, name="Авто Центр", fk_city=1),
+               AutoMarket(pk_automarket=2, name="Рольф", fk_city=1),
+               AutoMarket(pk_automarket=3, name="Казань Моторс", fk_city=2)]
+AUTOS = [Auto(pk_auto=1, name="Lada Vesta", fk_automarket=1, price=1300000.0, year_of_release=date(2021, 3, 1)),
+         Auto(pk_auto=2, name="Kia Rio", fk_automarket=1, price=1700000.0, year_of_release=date(2020, 5, 12)),
+         Auto(pk_auto=3, name="Toyota Camry", fk_automarket=2, price=3500000.0, year_of_release=date(2021, 7, 30)),
+         Auto(pk_auto=4, name="Kia Sportage", fk_automarket=2, price=2900000.0, year_of_release=date(2019, 1, 15)),
+         Auto(pk_auto=5, name="Lada Granta", fk_automarket=3, price=900000.0, year_of_release=date(2018, 9, 3)),
+         Auto(pk_auto=6, name="Toyota RAV4", fk_automarket=3, price=3800000.0, year_of_release=date(2021, 11, 20))]
+
+
+def make_auto(pk_auto: int, price: float) -> Auto:
+    return Auto(pk_auto=pk_auto, name=f"Auto {pk_auto}", fk_automarket=1, price=price,
+                year_of_release=date(2020, 1, 1))
+
+
+class CatalogTestCase(unittest.TestCase):
+    """A temporary directory per test; catalogs opened through open_catalog() are closed before it goes."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+
+    def path(self, name: str = "catalog.db") -> str:
+        return os.path.join(self.tmp, name)
+
+    def open_catalog(self, name: str = "catalog.db", fill: bool = False, **options) -> AutoSells:
+        auto_sells = AutoSells(self.path(name), **options)
+        self.addCleanup(auto_sells.close)
+        if fill:
+            auto_sells.add_cities_bulk(CITIES)
+            auto_sells.add_automarkets_bulk(AUTOMARKETS)
+            auto_sells.add_autos_bulk(AUTOS)
+        return auto_sells
@@ -0,0 +1,89 @@
+
+import random
+import sqlite3
+import unittest
+from dataclasses import replace
+from datetime import date
+
+from auto_data import Auto, DataNotFoundError, PriceStats
+from support import AUTOMARKETS, CITIES, MODES, CatalogTestCase
+
+CITY_BY_MARKET = {market.pk_automarket: market.fk_city for market in AUTOMARKETS}
+
+
+def group_key(by: str, auto: Auto) -> int:
+    if by == "city":
+        return CITY_BY_MARKET[auto.fk_automarket]
+    return auto.fk_automarket if by == "automarket" else auto.year_of_release.year
+
+
+class AggregateTest(CatalogTestCase):
+    """Group stats and top autos stay exact as autos are added, repriced and deleted."""
+
+    def make_autos(self):
+        rng = random.Random(18)
+        # Enough autos per group that top_autos() has to look past its TOP_N heaps
+        # and distinct prices, since autos of equal price have no order among themselves
+        prices = rng.sample(range(100, 200), 60)
+        self.autos = {pk: Auto(pk_auto=pk, name=f"Auto {pk}", fk_automarket=rng.randint(1, 3),
+                               price=prices[pk - 1] * 1000.0, year_of_release=date(rng.randint(2019, 2021), 1, 1))
+                      for pk in range(1, 61)}
+
+    def assertGroupsMatch(self, auto_sells):
+        for by in ("city", "automarket", "year"):
+            groups = {}
+            for auto in self.autos.values():
+                groups.setdefault(group_key(by, auto), []).append(auto)
+            expected = {key: PriceStats(count=len(autos), min_price=min(auto.price for auto in autos),
+                                        max_price=max(auto.price for auto in autos),
+                                        avg_price=sum(auto.price for auto in autos) / len(autos))
+                        for key, autos in groups.items()}
+            stats = auto_sells.price_stats_by(by)
+            self.assertEqual(stats.keys(), expected.keys(), by)
+            for key, group in groups.items():
+                self.assertEqual(stats[key].count, expected[key].count)
+                self.assertAlmostEqual(stats[key].avg_price, expected[key].avg_price)
+                self.assertEqual(auto_sells.price_stats(by, key), stats[key])
+                self.assertEqual((stats[key].min_price, stats[key].max_price),
+                                 (expected[key].min_price, expected[key].max_price))
+                ordered = sorted(group)
+                for count in (3, len(group)):
+                    self.assertEqual(auto_sells.top_autos(by, key, count), ordered[:count], (by, key, count))
+                    self.assertEqual(auto_sells.top_autos(by, key, count, most_expensive=True),
+                                     ordered[::-1][:count], (by, key, count))
+
+    def test_add_update_delete(self):
+        for mode, options in MODES.items():
+            with self.subTest(mode):
+                self.make_autos()
+                auto_sells = self.open_catalog(f"{mode}.db", **options)
+                auto_sells.add_cities_bulk(CITIES)
+                auto_sells.add_automarkets_bulk(AUTOMARKETS)
+                auto_sells.add_autos_bulk(self.autos.values())
+                self.assertGroupsMatch(auto_sells)  # builds the aggregates
+
+                cheapest = auto_sells.find_cheapest_autos(1)[0]
+                dearest = auto_sells.find_most_expensive_autos(1)[0]
+                added = Auto(pk_auto=100, name="New", fk_automarket=2, price=1.0, year_of_release=date(2022, 5, 1))
+                auto_sells.add_auto(added)
+                self.autos[100] = added
+                conn = sqlite3.connect(self.path(f"{mode}.db"))
+                conn.execute("DELETE FROM Autos WHERE pk_auto IN (?, ?)", (cheapest.pk_auto, dearest.pk_auto))
+                conn.execute("UPDATE Autos SET price = 5e6, fk_automarket = 1 WHERE pk_auto = 30")
+                conn.commit()
+                conn.close()
+                auto_sells.refresh()
+                del self.autos[cheapest.pk_auto], self.autos[dearest.pk_auto]
+                self.autos[30] = replace(self.autos[30], price=5e6, fk_automarket=1)
+                self.assertGroupsMatch(auto_sells)
+
+    def test_empty_group(self):
+        auto_sells = self.open_catalog(fill=True)
+        self.assertEqual(auto_sells.price_stats("year", 1990), PriceStats(0, None, None, None))
+        self.assertNotIn(1990, auto_sells.price_stats_by("year"))
+        with self.assertRaises(DataNotFoundError):
+            auto_sells.top_autos("year", 1990)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from auto_async import AsyncAutoSells
+from auto_data import AutoSells
+from benchmarks.generate import generate_catalog
+
+# Runs until interrupted
+ENDLESS_SQL = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT max(i) FROM n"
+
+
+class CancellationTest(unittest.IsolatedAsyncioTestCase):
+    """Cancelling a call stops its own SQL and keeps its slot until the worker lets go."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.db_path = generate_catalog(os.path.join(cls.tmp, "catalog.db"), 1000, seed=4)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp)
+
+    async def asyncSetUp(self):
+        self.async_sells = AsyncAutoSells(AutoSells(self.db_path, lazy=True), max_workers=1, max_in_flight=1)
+
+    async def asyncTearDown(self):
+        self.async_sells._executor.shutdown()
+        self.async_sells.auto_sells.close()
+
+    async def _cancel(self, task: asyncio.Task):
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+    async def test_slot_held_until_worker_returns(self):
+        entered, finish = threading.Event(), threading.Event()
+
+        def blocking():
+            entered.set()
+            finish.wait(10)
+
+        task = asyncio.create_task(self.async_sells._run_blocking(blocking))
+        await asyncio.to_thread(entered.wait, 10)
+        await self._cancel(task)
+        self.assertTrue(self.async_sells._slots.locked())
+        finish.set()
+        count = await asyncio.wait_for(self.async_sells._run_blocking(lambda: 7), 10)
+        self.assertEqual(count, 7)
+        self.assertFalse(self.async_sells._slots.locked())
+
+    async def test_cancel_interrupts_running_sql(self):
+        errors = []
+        entered = threading.Event()
+
+        def endless():
+            entered.set()
+            try:
+                self.async_sells.auto_sells.conn.execute(ENDLESS_SQL).fetchall()
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+        task = asyncio.create_task(self.async_sells._run_blocking(endless))
+        await asyncio.to_thread(entered.wait, 10)
+        await asyncio.sleep(0.05)
+        await self._cancel(task)
+        # The next call waits for the interrupted one and then runs untouched
+        autos = await asyncio.wait_for(self.async_sells.find_cheapest_autos(3), 10)
+        self.assertEqual(len(autos), 3)
+        self.assertEqual(len(errors), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
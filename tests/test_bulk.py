@@ -0,0 +1,63 @@
+
+import sqlite3
+import unittest
+from dataclasses import replace
+
+from auto_data import BulkInsertResult, City, DatabaseError, InvalidInputError
+from support import AUTOS, AUTOMARKETS, CITIES, MODES, CatalogTestCase
+
+
+class BulkInsertTest(CatalogTestCase):
+    """add_*_bulk() inserts new rows in one transaction and counts the duplicates it skips."""
+
+    def count_rows(self, table_name: str) -> int:
+        conn = sqlite3.connect(self.path())
+        try:
+            return conn.execute(f"SELECT count(*) FROM {table_name}").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_counts(self):
+        for mode, options in MODES.items():
+            with self.subTest(mode):
+                auto_sells = self.open_catalog(f"{mode}.db", **options)
+                self.assertEqual(auto_sells.add_cities_bulk(CITIES), BulkInsertResult(inserted=2, skipped=0))
+                self.assertEqual(auto_sells.add_automarkets_bulk(AUTOMARKETS), BulkInsertResult(inserted=3, skipped=0))
+                self.assertEqual(auto_sells.add_autos_bulk(AUTOS[:3]), BulkInsertResult(inserted=3, skipped=0))
+                # pks 1-3 are stored already and pk 6 comes twice, across chunks
+                result = auto_sells.add_autos_bulk(AUTOS[1:] + [AUTOS[0], AUTOS[5]], chunk_size=2)
+                self.assertEqual(result, BulkInsertResult(inserted=3, skipped=4))
+                self.assertEqual(sorted(auto.pk_auto for auto in auto_sells.find_cheapest_autos(10)),
+                                 [auto.pk_auto for auto in AUTOS])
+
+    def test_first_copy_of_a_repeated_pk_wins(self):
+        auto_sells = self.open_catalog(fill=True)
+        city = City(pk_city=3, name="Омск")
+        result = auto_sells.add_cities_bulk([city, replace(city, name="Томск")], chunk_size=1)
+        self.assertEqual(result, BulkInsertResult(inserted=1, skipped=1))
+        self.assertEqual(auto_sells.cities[3].name, "Омск")
+
+    def test_rows_persist(self):
+        self.open_catalog(fill=True).close()
+        self.assertEqual(self.count_rows("Autos"), len(AUTOS))
+        reopened = self.open_catalog()
+        self.assertEqual(sorted(reopened.autos), [auto.pk_auto for auto in AUTOS])
+        self.assertEqual(reopened.find_autos_by_city("Казань"), AUTOS[4:6])
+
+    def test_failed_batch_rolls_back(self):
+        auto_sells = self.open_catalog()
+        auto_sells.add_cities_bulk(CITIES)
+        with self.assertRaises(DatabaseError):
+            auto_sells.add_automarkets_bulk(AUTOMARKETS[:2] + [replace(AUTOMARKETS[2], name=None)], chunk_size=1)
+        self.assertEqual(self.count_rows("AutoMarkets"), 0)
+        self.assertEqual(auto_sells.automarkets, {})
+
+    def test_invalid_chunk_size(self):
+        auto_sells = self.open_catalog()
+        for chunk_size in (0, -1, 1.5):
+            with self.assertRaises(InvalidInputError):
+                auto_sells.add_cities_bulk(CITIES, chunk_size=chunk_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+
+import time
+import unittest
+from dataclasses import replace
+
+from auto_data import DataNotFoundError, QueryCache
+from support import AUTOS, MODES, CatalogTestCase, make_auto
+
+
+class PriceRangeCacheTest(CatalogTestCase):
+    """Cached price ranges answer exactly like the uncached search."""
+
+    def test_sub_cent_bounds(self):
+        for mode, options in MODES.items():
+            with self.subTest(mode):
+                auto_sells = self.open_catalog(f"{mode}.db", fill=True, **options)
+                auto_sells.add_autos_bulk([make_auto(101, 100.001), make_auto(102, 100.009)])
+                self.assertEqual([auto.pk_auto for auto in auto_sells.find_autos_by_price_range(100.0, 100.01)],
+                                 [101, 102])
+                with self.assertRaises(DataNotFoundError):
+                    auto_sells.find_autos_by_price_range(100.004, 100.006)
+                self.assertEqual(auto_sells.find_autos_by_price_range(100.005, 100.01), [make_auto(102, 100.009)])
+
+    def test_add_drops_only_overlapping_ranges(self):
+        auto_sells = self.open_catalog(fill=True)
+        auto_sells.find_autos_by_price_range(1e6, 2e6)
+        auto_sells.find_autos_by_price_range(3e6, 4e6)
+        auto_sells.add_auto(replace(AUTOS[0], pk_auto=7, price=1.5e6))
+        self.assertEqual(auto_sells.cache_stats()["invalidations"], 1)
+        self.assertEqual([auto.pk_auto for auto in auto_sells.find_autos_by_price_range(1e6, 2e6)], [1, 7, 2])
+        before = auto_sells.cache_stats()
+        auto_sells.find_autos_by_price_range(3e6, 4e6)
+        self.assertEqual(auto_sells.cache_stats()["hits"], before["hits"] + 1)
+
+
+class FinderCacheTest(CatalogTestCase):
+    """find_autos_by_* results are cached per tag and dropped by the writes that change them."""
+
+    def test_stats(self):
+        auto_sells = self.open_catalog(fill=True)
+        for _ in range(3):
+            auto_sells.find_autos_by_city("Москва")
+        auto_sells.find_autos_by_year(2021)
+        stats = auto_sells.cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (2, 2, 2))
+        auto_sells.clear_cache()
+        self.assertEqual(auto_sells.cache_stats()["size"], 0)
+        self.assertEqual(auto_sells.cache_stats()["invalidations"], 2)
+
+    def test_add_refreshes_cached_results(self):
+        for mode, options in MODES.items():
+            with self.subTest(mode):
+                auto_sells = self.open_catalog(f"{mode}.db", fill=True, **options)
+                with self.assertRaises(DataNotFoundError):
+                    auto_sells.find_autos_by_year(2022)  # cached as empty
+                self.assertEqual(len(auto_sells.find_autos_by_city("Казань")), 2)
+                self.assertEqual(len(auto_sells.find_autos_by_automarket("Рольф")), 2)
+                added = replace(AUTOS[2], pk_auto=7, year_of_release=AUTOS[2].year_of_release.replace(year=2022))
+                auto_sells.add_auto(added)
+                self.assertEqual(auto_sells.find_autos_by_year(2022), [added])
+                self.assertEqual(auto_sells.find_autos_by_automarket("Рольф")[-1], added)
+                self.assertEqual(len(auto_sells.find_autos_by_city("Казань")), 2)  # still cached
+
+    def test_no_cache(self):
+        auto_sells = self.open_catalog(fill=True, cache_size=0)
+        auto_sells.find_autos_by_city("Москва")
+        auto_sells.find_autos_by_city("Москва")
+        self.assertEqual(auto_sells.cache_stats()["size"], 0)
+        self.assertEqual(auto_sells.cache_stats()["hits"], 0)
+
+
+class QueryCacheTest(unittest.TestCase):
+    """LRU order, TTL and generations of the cache itself."""
+
+    def test_lru_eviction(self):
+        cache = QueryCache(maxsize=2)
+        for key in ("a", "b"):
+            cache.put(key, key, 0, [key])
+        cache.get("a")
+        cache.put("c", "c", 0, ["c"])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), ("a",))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl(self):
+        cache = QueryCache(ttl=0.01)
+        cache.put("a", "a", 0, [1])
+        time.sleep(0.05)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_stale_put_is_refused(self):
+        cache = QueryCache()
+        generation = cache.generation("tag")
+        cache.invalidate("tag")  # a write lands while the query runs
+        cache.put("key", "tag", generation, [1])
+        self.assertIsNone(cache.get("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+
+import math
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+
+from auto_data import AutoSells, BaseError, InvalidInputError
+from benchmarks.generate import generate_catalog
+
+# Catalog mode -> AutoSells options; every mode must answer alike
+MODES = {"eager": {}, "lazy": {"lazy": True}, "columnar": {"columnar": True}}
+
+
+class CatalogParityTest(unittest.TestCase):
+    """The same database opened eager, lazy and columnar gives the same results and errors."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        source = generate_catalog(os.path.join(cls.tmp, "source.db"), 3000, seed=1)
+        cls.catalogs = {}
+        for mode, options in MODES.items():
+            path = os.path.join(cls.tmp, f"{mode}.db")
+            shutil.copy(source, path)
+            cls.catalogs[mode] = AutoSells(path, **options)
+
+    @classmethod
+    def tearDownClass(cls):
+        for catalog in cls.catalogs.values():
+            catalog.close()
+        shutil.rmtree(cls.tmp)
+
+    def assertParity(self, method: str, *args, **kwargs):
+        results = {}
+        for mode, catalog in self.catalogs.items():
+            try:
+                results[mode] = getattr(catalog, method)(*args, **kwargs)
+            except BaseError as e:
+                results[mode] = type(e)
+        for mode in MODES:
+            self.assertEqual(results[mode], results["eager"], f"{mode} {method}{args}{kwargs}")
+        return results["eager"]
+
+    def test_query(self):
+        self.assertTrue(self.assertParity("query"))
+        self.assertTrue(self.assertParity("query", price=(1e6, 2e6), order_by="price", limit=50))
+        self.assertParity("query", price=(1e6, 2e6), order_by="-year_of_release", limit=50)
+        self.assertParity("query", city="Москва", years=(2010, 2020), order_by="-price")
+        self.assertParity("query", automarket="Автосалон Москва 1", order_by="name")
+        self.assertParity("query", city="Нет такого")
+        self.assertEqual(self.assertParity("query", order_by=""), self.assertParity("query"))
+
+    def test_query_years_outside_date_range(self):
+        self.assertEqual(self.assertParity("query", years=(0, 2000)), self.assertParity("query", years=(None, 2000)))
+        self.assertEqual(self.assertParity("query", years=(-10 ** 20, 10 ** 20)), self.assertParity("query"))
+        self.assertEqual(self.assertParity("query", years=(10 ** 20, None)), [])
+        self.assertEqual(self.assertParity("query", years=(None, 0)), [])
+
+    def test_query_invalid_input(self):
+        self.assertParity("query", years=(2020, 2010))
+        self.assertParity("query", price=(2e6, 1e6))
+        self.assertParity("query", order_by="color")
+        self.assertParity("query", limit=-1)
+
+    def test_find(self):
+        self.assertTrue(self.assertParity("find_autos_by_city", "Москва"))
+        self.assertParity("find_autos_by_city", "Нет такого")
+        self.assertTrue(self.assertParity("find_autos_by_price_range", 1e6, 1.5e6))
+        self.assertParity("find_autos_by_price_range", 2e6, 1e6)
+        self.assertEqual(len(self.assertParity("find_cheapest_autos", 25)), 25)
+        self.assertEqual(len(self.assertParity("find_most_expensive_autos", 25)), 25)
+        self.assertTrue(self.assertParity("find_autos_by_automarket", "Автосалон Москва 1"))
+        self.assertTrue(self.assertParity("find_autos_by_year", 2020))
+        self.assertParity("find_autos_by_year", 1900)
+
+    def test_similar(self):
+        self.assertEqual(len(self.assertParity("similar_autos", 5)), AutoSells.SIMILAR_COUNT)
+        self.assertParity("similar_autos", 5, 10, 0.5)
+        self.assertParity("similar_autos", 5, None, 0.3)
+        self.assertParity("similar_autos", 5, same_city=True)
+        self.assertEqual(self.assertParity("similar_autos", 5, 0), [])
+        self.assertParity("similar_autos", 10 ** 6)
+
+    def test_nearest(self):
+        self.assertTrue(self.assertParity("nearest_autos", 1.5e6, date(2018, 6, 1), 10))
+        self.assertTrue(self.assertParity("nearest_autos", 1.5e6, date(2018, 6, 1), 10, 1e300))
+        self.assertTrue(self.assertParity("nearest_autos", 1e300, date(1, 1, 1), 3))
+        self.assertParity("nearest_autos", 1.5e6, date(2018, 6, 1), None, 0.2, city_id=1)
+
+    def test_nearest_invalid_input(self):
+        for value in (math.nan, math.inf, -math.inf):
+            self.assertIs(self.assertParity("similar_autos", 5, 10, value), InvalidInputError)
+            self.assertIs(self.assertParity("nearest_autos", value, date(2018, 6, 1), 10), InvalidInputError)
+        self.assertIs(self.assertParity("similar_autos", 5, 10, -1.0), InvalidInputError)
+        self.assertIs(self.assertParity("similar_autos", 5, None, None), InvalidInputError)
+
+    def test_pages(self):
+        self.assertParity("page_autos", None, 100)
+        self.assertParity("page_autos", 2950, 100)
+        self.assertParity("page_automarkets", 3, 5)
+        self.assertParity("page_cities", None, 2)
+
+
+class PagingTest(unittest.TestCase):
+    """Pages list the loaded catalog even when the database has moved on."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.source = generate_catalog(os.path.join(self.tmp, "source.db"), 3000, seed=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_external_delete_before_refresh(self):
+        for mode in ("eager", "columnar"):
+            path = shutil.copy(self.source, os.path.join(self.tmp, f"{mode}.db"))
+            auto_sells = AutoSells(path, **MODES[mode])
+            try:
+                expected = sorted(auto_sells.autos)
+                conn = sqlite3.connect(path)
+                with conn:
+                    conn.execute("DELETE FROM Autos WHERE pk_auto BETWEEN 100 AND 199")
+                    conn.execute("DELETE FROM Cities WHERE pk_city NOT IN (SELECT fk_city FROM AutoMarkets)")
+                conn.close()
+                self.assertEqual([auto.pk_auto for auto in auto_sells.iter_autos(page_size=50)], expected)
+                self.assertEqual([city.pk_city for city in auto_sells.iter_cities(page_size=2)],
+                                 sorted(auto_sells.cities))
+                auto_sells.refresh()
+                self.assertEqual(len(list(auto_sells.iter_autos(page_size=50))), len(expected) - 100)
+            finally:
+                auto_sells.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
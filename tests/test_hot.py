@@ -0,0 +1,71 @@
+
+import sqlite3
+import time
+import unittest
+from dataclasses import replace
+from unittest import mock
+
+from auto_data import AutoSells, InvalidInputError
+from support import AUTOS, CITIES, CatalogTestCase
+
+
+class HotModeTest(CatalogTestCase):
+    """Hot mode works on an in-memory copy and saves it to the file at checkpoints."""
+
+    def setUp(self):
+        super().setUp()
+        self.open_catalog(fill=True).close()
+
+    def stored_autos(self) -> int:
+        conn = sqlite3.connect(self.path())
+        try:
+            return conn.execute("SELECT count(*) FROM Autos").fetchone()[0]
+        finally:
+            conn.close()
+
+    def add_autos(self, auto_sells: AutoSells, count: int):
+        for pk in range(7, 7 + count):
+            auto_sells.add_auto(replace(AUTOS[0], pk_auto=pk))
+
+    def test_checkpoint(self):
+        auto_sells = self.open_catalog(hot=True, checkpoint_interval=None, checkpoint_changes=None)
+        self.assertEqual(auto_sells.find_autos_by_city("Казань"), AUTOS[4:6])
+        self.add_autos(auto_sells, 2)
+        self.assertEqual(len(auto_sells.find_autos_by_automarket("Авто Центр")), 4)
+        self.assertEqual(self.stored_autos(), len(AUTOS))
+        self.assertTrue(auto_sells.checkpoint())
+        self.assertEqual(self.stored_autos(), len(AUTOS) + 2)
+        self.assertFalse(auto_sells.checkpoint())  # nothing changed since
+
+    def test_close_saves(self):
+        auto_sells = self.open_catalog(hot=True, checkpoint_interval=None, checkpoint_changes=None)
+        self.add_autos(auto_sells, 1)
+        auto_sells.close()
+        self.assertEqual(self.stored_autos(), len(AUTOS) + 1)
+
+    def test_checkpoint_after_changes(self):
+        with mock.patch.object(AutoSells, "HOT_CHECKPOINT_POLL", 0.01):
+            auto_sells = self.open_catalog(hot=True, checkpoint_interval=None, checkpoint_changes=3)
+            deadline = time.monotonic() + 10
+            while auto_sells._saved_seq is None and time.monotonic() < deadline:
+                time.sleep(0.01)  # the first save comes at once
+            self.add_autos(auto_sells, 2)
+            time.sleep(0.1)
+            self.assertEqual(self.stored_autos(), len(AUTOS))  # below the threshold
+            auto_sells.add_auto(replace(AUTOS[0], pk_auto=9))
+            while self.stored_autos() == len(AUTOS) and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(self.stored_autos(), len(AUTOS) + 3)
+
+    def test_new_database(self):
+        auto_sells = self.open_catalog("new.db", hot=True, checkpoint_interval=None, checkpoint_changes=None)
+        auto_sells.add_cities_bulk(CITIES)
+        auto_sells.close()
+        self.assertEqual(self.open_catalog("new.db").cities, {city.pk_city: city for city in CITIES})
+
+    def test_only_hot_mode(self):
+        with self.assertRaises(InvalidInputError):
+            self.open_catalog("cold.db").checkpoint()
+
+if __name__ == "__main__":
+    unittest.main()
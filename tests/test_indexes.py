@@ -0,0 +1,102 @@
+
+import random
+import unittest
+
+from auto_data import AutoColumns, PriceIndex
+from support import make_auto
+
+
+class PriceIndexTest(unittest.TestCase):
+    """Ids come back in price order, equal prices in insertion order, whether added one by one or in bulk."""
+
+    def setUp(self):
+        rng = random.Random(7)
+        # Few distinct prices, so ties are common
+        self.autos = [make_auto(pk, float(rng.randrange(50))) for pk in range(1, 3001)]
+
+    def expected(self, autos):
+        return [auto.pk_auto for auto in sorted(autos)]  # stable: ties stay in list order
+
+    def test_single_adds_past_the_pending_limit(self):
+        index = PriceIndex()
+        for auto in self.autos:
+            index.add(auto)
+        self.assertEqual(len(index), len(self.autos))
+        self.assertEqual(list(index), self.expected(self.autos))
+        self.assertEqual(list(reversed(index)), self.expected(self.autos)[::-1])
+
+    def test_reads_between_adds(self):
+        index = PriceIndex(self.autos[:1000])
+        for n, auto in enumerate(self.autos[1000:1500], 1001):
+            index.add(auto)
+            if n % 97 == 0:
+                self.assertEqual(index.cheapest(5), self.expected(self.autos[:n])[:5])
+        added = self.autos[:1500]
+        self.assertEqual(index.most_expensive(7), self.expected(added)[::-1][:7])
+        self.assertEqual(index.range(10, 12), [auto.pk_auto for auto in sorted(added) if 10 <= auto.price <= 12])
+        self.assertEqual(index.most_expensive(0), [])
+
+    def test_add_many_after_single_adds(self):
+        index = PriceIndex(self.autos[:100])
+        for auto in self.autos[100:200]:
+            index.add(auto)
+        index.add_many(self.autos[200:])
+        self.assertEqual(list(index), self.expected(self.autos))
+
+    def test_remove_queued_and_merged(self):
+        index = PriceIndex(self.autos[:2000])
+        for auto in self.autos[2000:2100]:
+            index.add(auto)
+        removed = self.autos[1990:2010]  # half merged, half still queued
+        for auto in removed:
+            self.assertTrue(index.remove(auto))
+        self.assertFalse(index.remove(removed[0]))
+        kept = self.autos[:1990] + self.autos[2010:2100]
+        self.assertEqual(len(index), len(kept))
+        self.assertEqual(list(index), self.expected(kept))
+
+    def test_arrays_round_trip(self):
+        index = PriceIndex(self.autos[:10])
+        index.add(make_auto(99, 1.5))
+        prices, ids = index.arrays()
+        self.assertEqual(list(PriceIndex.from_sorted(prices, ids)), list(index))
+        self.assertEqual(list(prices), sorted(prices))
+
+
+class AutoColumnsTest(unittest.TestCase):
+    """AutoColumns behaves like a dict of autos, whatever order rows arrive in."""
+
+    def setUp(self):
+        rng = random.Random(11)
+        self.autos = [make_auto(pk, float(rng.randrange(10 ** 6))) for pk in range(1, 2001)]
+        rng.shuffle(self.autos)
+
+    def assertSameAs(self, columns: AutoColumns, expected: dict):
+        self.assertEqual(list(columns), sorted(expected))
+        self.assertEqual(dict(columns.items()), expected)
+
+    def test_add_many_in_any_order(self):
+        columns, expected = AutoColumns(), {}
+        for start in range(0, len(self.autos), 300):
+            batch = self.autos[start:start + 300]
+            columns.add_many(batch)
+            expected.update((auto.pk_auto, auto) for auto in batch)
+            self.assertSameAs(columns, expected)
+
+    def test_add_many_replaces_and_appends(self):
+        columns = AutoColumns()
+        for auto in self.autos[:500]:
+            columns[auto.pk_auto] = auto
+        changed = [make_auto(auto.pk_auto, 1.0) for auto in self.autos[:50]]
+        appended = [make_auto(pk, 2.0) for pk in (5000, 4000, 4000)]
+        columns.add_many(changed + appended)
+        expected = {auto.pk_auto: auto for auto in self.autos[:500] + changed + appended}
+        self.assertSameAs(columns, expected)
+        del columns[4000]
+        del expected[4000]
+        self.assertSameAs(columns, expected)
+        self.assertNotIn(4000, columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
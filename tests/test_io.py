@@ -0,0 +1,113 @@
+
+import json
+import os
+import unittest
+from itertools import chain
+from unittest import mock
+
+from auto_data import AutoSells, InvalidInputError
+from auto_io import ImportResult, export_records, export_table, import_file
+from support import AUTOS, AUTOMARKETS, CITIES, CatalogTestCase
+
+
+class ExportImportTest(CatalogTestCase):
+    """Exports are written atomically and import back into the same catalog."""
+
+    def test_round_trip(self):
+        for name in ("catalog.jsonl", "catalog.jsonl.gz"):
+            with self.subTest(name):
+                export_records(chain(CITIES, AUTOMARKETS, AUTOS), self.path(name))
+                auto_sells = self.open_catalog(name + ".db")
+                result = import_file(auto_sells, self.path(name), chunk_size=4)
+                self.assertEqual(result, ImportResult(read=11, inserted=11))
+                self.assertEqual(auto_sells.find_cheapest_autos(len(AUTOS)), sorted(AUTOS))
+                self.assertEqual(import_file(auto_sells, self.path(name)), ImportResult(read=11, skipped=11))
+
+    def test_csv_tables(self):
+        source = self.open_catalog(fill=True)
+        auto_sells = self.open_catalog("copy.db")
+        for table in ("cities", "automarkets", "autos"):
+            self.assertEqual(export_table(source, table, self.path(f"{table}.csv")),
+                             {"cities": 2, "automarkets": 3, "autos": 6}[table])
+            import_file(auto_sells, self.path(f"{table}.csv"))
+        self.assertEqual(dict(auto_sells.autos), dict(source.autos))
+
+    def test_failed_export_leaves_the_old_file(self):
+        path = self.path("autos.csv")
+        export_records(AUTOS, path)
+        with open(path, "rb") as f:
+            before = f.read()
+
+        def failing():
+            yield from AUTOS[:3]
+            raise OSError("disk full")
+
+        with self.assertRaises(OSError):
+            export_records(failing(), path)
+        with self.assertRaises(InvalidInputError):
+            export_records(CITIES + AUTOS, path)  # CSV holds one record type
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), before)
+        self.assertEqual(os.listdir(self.tmp), ["autos.csv"])
+
+    def test_invalid_records(self):
+        path = self.path("autos.jsonl")
+        export_records(AUTOS[:2], path)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("{not json\n")
+            f.write(json.dumps(dict(type="auto", pk_auto=9, name="X", fk_automarket=99, price=1,
+                                    year_of_release="2020-01-01")) + "\n")
+            f.write(json.dumps(dict(type="auto", pk_auto=10, name="Y", fk_automarket=1, price="nan",
+                                    year_of_release="2020-01-01")) + "\n")
+        auto_sells = self.open_catalog()
+        auto_sells.add_cities_bulk(CITIES)
+        auto_sells.add_automarkets_bulk(AUTOMARKETS)
+        result = import_file(auto_sells, path)
+        self.assertEqual((result.read, result.inserted, result.invalid), (5, 2, 3))
+        self.assertIn("fk_automarket 99 does not exist", result.errors[1])
+        with self.assertRaises(InvalidInputError):
+            import_file(self.open_catalog("strict.db"), path, strict=True)
+
+
+class ResumableImportTest(CatalogTestCase):
+    """With a progress file, an import that stopped halfway continues after its last committed chunk."""
+
+    def setUp(self):
+        super().setUp()
+        self.source = self.path("catalog.jsonl")
+        export_records(chain(CITIES, AUTOMARKETS, AUTOS), self.source)
+        self.progress = self.path("catalog.progress")
+
+    def test_resume_after_a_crash(self):
+        auto_sells = self.open_catalog()
+        add_autos_bulk = auto_sells.add_autos_bulk
+        calls = []
+
+        def crash_on_second_chunk(autos, *args, **kwargs):
+            calls.append(len(autos))
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return add_autos_bulk(autos, *args, **kwargs)
+
+        with mock.patch.object(auto_sells, "add_autos_bulk", crash_on_second_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                import_file(auto_sells, self.source, chunk_size=7, progress_path=self.progress)
+        self.assertEqual(sorted(auto_sells.autos), [1, 2])
+
+        with mock.patch.object(AutoSells, "add_cities_bulk", side_effect=AssertionError("re-read the cities")):
+            result = import_file(auto_sells, self.source, chunk_size=7, progress_path=self.progress)
+        self.assertEqual(result, ImportResult(read=11, inserted=11))
+        self.assertEqual(sorted(auto_sells.autos), [auto.pk_auto for auto in AUTOS])
+        # A finished import is not repeated
+        self.assertEqual(import_file(auto_sells, self.source, progress_path=self.progress), result)
+
+    def test_changed_file_starts_over(self):
+        auto_sells = self.open_catalog()
+        import_file(auto_sells, self.source, progress_path=self.progress)
+        export_records(chain(CITIES, AUTOMARKETS, AUTOS[:3]), self.source)
+        result = import_file(auto_sells, self.source, progress_path=self.progress)
+        self.assertEqual(result, ImportResult(read=8, skipped=8))
+
+
+if __name__ == "__main__":
+    unittest.main()
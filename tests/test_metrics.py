@@ -0,0 +1,65 @@
+
+import unittest
+
+from auto_data import AutoSells, DataNotFoundError
+from support import AUTOS, CatalogTestCase
+
+
+class MetricsTest(CatalogTestCase):
+    """enable_metrics() counts calls, errors, result sizes and SQL until disable_metrics()."""
+
+    def test_off_by_default(self):
+        auto_sells = self.open_catalog(fill=True)
+        self.assertIsNone(auto_sells.metrics)
+        self.assertNotIn("find_cheapest_autos", vars(auto_sells))
+
+    def test_methods(self):
+        auto_sells = self.open_catalog(fill=True)
+        metrics = auto_sells.enable_metrics()
+        auto_sells.find_cheapest_autos(2)
+        auto_sells.find_cheapest_autos(4)
+        with self.assertRaises(DataNotFoundError):
+            auto_sells.find_autos_by_year(1990)
+        self.assertEqual(len(list(auto_sells.iter_autos(page_size=4))), len(AUTOS))
+        methods = metrics.snapshot()["methods"]
+        self.assertEqual(methods["find_cheapest_autos"]["calls"], 2)
+        self.assertEqual(methods["find_cheapest_autos"]["result_size"]["sum"], 6)
+        self.assertEqual(methods["find_autos_by_year"]["errors"], {"DataNotFoundError": 1})
+        self.assertEqual(methods["iter_autos"]["result_size"]["sum"], len(AUTOS))
+
+        auto_sells.disable_metrics()
+        self.assertIsNone(auto_sells.metrics)
+        self.assertEqual(auto_sells.find_cheapest_autos.__func__, AutoSells.find_cheapest_autos)
+        auto_sells.find_cheapest_autos(1)
+        self.assertEqual(metrics.snapshot()["methods"]["find_cheapest_autos"]["calls"], 2)
+
+    def test_sql_statements(self):
+        auto_sells = self.open_catalog(fill=True, lazy=True)
+        metrics = auto_sells.enable_metrics(slow_query_seconds=0)
+        auto_sells.find_autos_by_city("Москва")
+        auto_sells.find_autos_by_city("Казань")
+        auto_sells.conn.execute("SELECT count(*) FROM Autos WHERE price > 1000000").fetchall()
+        metrics.finish_statement()
+        sql = metrics.snapshot()["sql"]
+        self.assertIn("SELECT count(*) FROM Autos WHERE price > ?", sql)
+        city_statements = [stats for statement, stats in sql.items() if "py_lower(c.name) = ?" in statement]
+        self.assertTrue(city_statements)
+        self.assertEqual(sum(stats["calls"] for stats in city_statements), 2)
+        self.assertTrue(metrics.snapshot()["slow_queries"])
+
+    def test_prometheus(self):
+        auto_sells = self.open_catalog(fill=True)
+        auto_sells.enable_metrics()
+        auto_sells.find_most_expensive_autos(3)
+        with self.assertRaises(DataNotFoundError):
+            auto_sells.find_autos_by_city("Омск")
+        lines = auto_sells.metrics.prometheus().splitlines()
+        self.assertIn('autosells_calls_total{method="find_most_expensive_autos"} 1', lines)
+        self.assertIn('autosells_errors_total{method="find_autos_by_city",error="DataNotFoundError"} 1', lines)
+        self.assertIn('autosells_result_size_bucket{method="find_most_expensive_autos",le="10"} 1', lines)
+        self.assertIn('autosells_result_size_count{method="find_most_expensive_autos"} 1', lines)
+        self.assertIn("# TYPE autosells_latency_seconds histogram", lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+
+import sqlite3
+import unittest
+from unittest import mock
+
+from auto_data import AutoSells, DatabaseError
+from support import AUTOS, AUTOMARKETS, CITIES, CatalogTestCase
+
+# The schema before migrations existed (schema version 1, PRAGMA user_version 0)
+V1_SCHEMA = """
+    CREATE TABLE Cities (pk_city INTEGER PRIMARY KEY, name TEXT NOT NULL);
+    CREATE TABLE AutoMarkets (pk_automarket INTEGER PRIMARY KEY, name TEXT NOT NULL, fk_city INTEGER NOT NULL,
+                              FOREIGN KEY (fk_city) REFERENCES Cities (pk_city));
+    CREATE TABLE Autos (pk_auto INTEGER PRIMARY KEY, name TEXT NOT NULL, fk_automarket INTEGER NOT NULL,
+                        price REAL NOT NULL, year_of_release TEXT NOT NULL,
+                        FOREIGN KEY (fk_automarket) REFERENCES AutoMarkets (pk_automarket));
+"""
+
+
+class MigrationTest(CatalogTestCase):
+    """Opening an older database upgrades it in place to the current schema version."""
+
+    def setUp(self):
+        super().setUp()
+        conn = self.connect()
+        conn.executescript(V1_SCHEMA)
+        conn.executemany("INSERT INTO Cities VALUES (?, ?)", [(city.pk_city, city.name) for city in CITIES])
+        conn.executemany("INSERT INTO AutoMarkets VALUES (?, ?, ?)",
+                         [(market.pk_automarket, market.name, market.fk_city) for market in AUTOMARKETS])
+        conn.executemany("INSERT INTO Autos VALUES (?, ?, ?, ?, ?)",
+                         [(auto.pk_auto, auto.name, auto.fk_automarket, auto.price, auto.year_of_release.isoformat())
+                          for auto in AUTOS])
+        conn.commit()
+        conn.close()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path())
+        self.addCleanup(conn.close)
+        return conn
+
+    def assertMigrated(self):
+        conn = self.connect()
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], int(AutoSells.DATABASE_VERSION))
+        rows = conn.execute("SELECT pk_auto, release_day, release_year FROM Autos ORDER BY pk_auto").fetchall()
+        self.assertEqual(rows, [(auto.pk_auto, auto.year_of_release.toordinal(), auto.year_of_release.year)
+                                for auto in AUTOS])
+
+    def test_upgrade_in_batches(self):
+        with mock.patch.object(AutoSells, "MIGRATION_BATCH_SIZE", 2):
+            auto_sells = self.open_catalog(lazy=True)
+        self.assertMigrated()
+        self.assertEqual(auto_sells.find_autos_by_year(2021), [AUTOS[0], AUTOS[2], AUTOS[5]])
+        self.assertEqual(auto_sells.query(years=(2019, 2020), order_by="pk_auto"), [AUTOS[1], AUTOS[3]])
+
+    def test_interrupted_backfill_resumes(self):
+        conn = self.connect()
+        conn.executescript("ALTER TABLE Autos ADD COLUMN release_day INTEGER;"
+                           "ALTER TABLE Autos ADD COLUMN release_year INTEGER;")
+        conn.execute("UPDATE Autos SET release_day = 0, release_year = 0 WHERE pk_auto <= 3")  # already done
+        conn.commit()
+        self.open_catalog()
+        rows = conn.execute("SELECT release_year FROM Autos ORDER BY pk_auto").fetchall()
+        self.assertEqual(rows, [(0,)] * 3 + [(auto.year_of_release.year,) for auto in AUTOS[3:]])
+
+    def test_writers_without_release_columns(self):
+        auto_sells = self.open_catalog()
+        conn = self.connect()
+        conn.execute("INSERT INTO Autos (pk_auto, name, fk_automarket, price, year_of_release) "
+                     "VALUES (7, 'Haval Jolion', 3, 2000000, '2022-04-01')")
+        conn.execute("UPDATE Autos SET year_of_release = '2017-06-30' WHERE pk_auto = 1")
+        conn.commit()
+        self.assertEqual(conn.execute("SELECT release_year FROM Autos WHERE pk_auto IN (1, 7) ORDER BY pk_auto")
+                         .fetchall(), [(2017,), (2022,)])
+        auto_sells.refresh()
+        self.assertEqual([auto.pk_auto for auto in auto_sells.find_autos_by_year(2017)], [1])
+
+    def test_newer_schema_is_refused(self):
+        conn = self.connect()
+        conn.execute(f"PRAGMA user_version = {int(AutoSells.DATABASE_VERSION) + 1}")
+        conn.commit()
+        with self.assertRaises(DatabaseError):
+            AutoSells(self.path())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+
+import sqlite3
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+from auto_data import ConnectionPool
+from support import AUTOS, CatalogTestCase
+
+
+class ConnectionPoolTest(CatalogTestCase):
+    """One WAL connection per thread; readers don't wait for an open write."""
+
+    def setUp(self):
+        super().setUp()
+        self.pool = ConnectionPool(self.path("pool.db"))
+        self.addCleanup(self.pool.close_all)
+        with self.pool.transaction() as cursor:
+            cursor.execute("CREATE TABLE Items (pk INTEGER PRIMARY KEY)")
+            cursor.executemany("INSERT INTO Items VALUES (?)", [(pk,) for pk in range(10)])
+
+    def count_in_thread(self) -> int:
+        with ThreadPoolExecutor(1) as executor:
+            return executor.submit(
+                lambda: self.pool.connection().execute("SELECT count(*) FROM Items").fetchone()[0]).result(10)
+
+    def test_connection_per_thread(self):
+        conn = self.pool.connection()
+        self.assertIs(self.pool.connection(), conn)
+        with ThreadPoolExecutor(1) as executor:
+            other = executor.submit(self.pool.connection).result()
+        self.assertIsNot(other, conn)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.pool.close_all()
+        self.assertIsNot(self.pool.connection(), conn)
+
+    def test_readers_see_the_last_commit_during_a_write(self):
+        with self.pool.transaction() as cursor:
+            cursor.execute("INSERT INTO Items VALUES (10)")
+            self.assertEqual(self.count_in_thread(), 10)
+        self.assertEqual(self.count_in_thread(), 11)
+
+    def test_failed_transaction_rolls_back(self):
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.pool.transaction() as cursor:
+                cursor.execute("INSERT INTO Items VALUES (20)")
+                cursor.execute("INSERT INTO Items VALUES (0)")
+        self.assertEqual(self.count_in_thread(), 10)
+
+    def test_writers_take_turns(self):
+        def insert(first: int):
+            for pk in range(first, first + 50):
+                with self.pool.transaction() as cursor:
+                    cursor.execute("INSERT INTO Items VALUES (?)", (pk,))
+
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(insert, range(100, 300, 50)))
+        self.assertEqual(self.count_in_thread(), 210)
+
+
+class ConcurrentCatalogTest(CatalogTestCase):
+    """A lazy catalog serves finders from several threads while another adds autos."""
+
+    def test_reads_during_writes(self):
+        auto_sells = self.open_catalog(fill=True, lazy=True)
+        added = [replace(AUTOS[0], pk_auto=pk, price=1e6 + pk) for pk in range(100, 300)]
+        done = threading.Event()
+
+        def read() -> int:
+            rounds = 0
+            while not done.is_set() or not rounds:
+                self.assertGreaterEqual(len(auto_sells.find_autos_by_city("Москва")), 4)
+                self.assertEqual(len(auto_sells.find_cheapest_autos(3)), 3)
+                rounds += 1
+            return rounds
+
+        with ThreadPoolExecutor(4) as executor:
+            readers = [executor.submit(read) for _ in range(3)]
+            try:
+                for auto in added:
+                    auto_sells.add_auto(auto)
+            finally:
+                done.set()
+            self.assertTrue(all(reader.result(30) for reader in readers))
+        self.assertEqual(len(auto_sells.find_autos_by_automarket("Авто Центр")), 2 + len(added))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+
+import sqlite3
+import time
+import unittest
+from datetime import date
+
+from auto_data import Auto, DataNotFoundError
+from support import AUTOS, MODES, CatalogTestCase
+
+
+class RefreshTest(CatalogTestCase):
+    """refresh() applies what other connections committed, as logged by the ChangeLog triggers."""
+
+    def write(self, name: str, *statements: str):
+        conn = sqlite3.connect(self.path(name))
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def test_changes_from_another_connection(self):
+        for mode, options in MODES.items():
+            with self.subTest(mode):
+                auto_sells = self.open_catalog(f"{mode}.db", fill=True, **options)
+                auto_sells.refresh()  # past its own inserts
+                self.assertEqual(len(auto_sells.find_autos_by_city("Казань")), 2)  # cached before the change
+                self.write(f"{mode}.db",
+                           "INSERT INTO Autos (pk_auto, name, fk_automarket, price, year_of_release) "
+                           "VALUES (7, 'Haval Jolion', 3, 2000000, '2022-04-01')",
+                           "UPDATE Autos SET price = 100 WHERE pk_auto = 6",
+                           "DELETE FROM Autos WHERE pk_auto = 5",
+                           "UPDATE Cities SET name = 'Самара' WHERE pk_city = 2")
+                self.assertEqual(auto_sells.refresh(), 4)
+                self.assertEqual(auto_sells.refresh(), 0)
+                added = Auto(pk_auto=7, name="Haval Jolion", fk_automarket=3, price=2e6,
+                             year_of_release=date(2022, 4, 1))
+                self.assertEqual(auto_sells.find_autos_by_year(2022), [added])
+                self.assertEqual(auto_sells.find_cheapest_autos(1)[0].pk_auto, 6)
+                self.assertEqual(sorted(auto.pk_auto for auto in auto_sells.find_autos_by_city("Самара")), [6, 7])
+                with self.assertRaises(DataNotFoundError):
+                    auto_sells.find_autos_by_city("Казань")
+                self.assertEqual(auto_sells.query(price=(1e6, 2e6), order_by="price"),
+                                 [AUTOS[0], AUTOS[1], added])
+
+    def test_pruned_log_reloads(self):
+        auto_sells = self.open_catalog(fill=True)
+        auto_sells.refresh()
+        self.write("catalog.db", "UPDATE Autos SET price = 1 WHERE pk_auto = 1",
+                   "UPDATE Autos SET price = 2 WHERE pk_auto = 2")
+        self.write("catalog.db", "DELETE FROM ChangeLog WHERE seq < (SELECT max(seq) FROM ChangeLog)")
+        self.assertEqual(auto_sells.refresh(), 1)  # what is left of the log, but every row is reloaded
+        self.assertEqual([auto.price for auto in auto_sells.find_cheapest_autos(2)], [1, 2])
+
+    def test_poller(self):
+        auto_sells = self.open_catalog(fill=True)
+        auto_sells.start_refresh_poller(0.01)
+        self.addCleanup(auto_sells.stop_refresh_poller)
+        self.write("catalog.db", "DELETE FROM Autos WHERE pk_auto = 3")
+        deadline = time.monotonic() + 10
+        while 3 in auto_sells.autos and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertNotIn(3, auto_sells.autos)
+
+
+if __name__ == "__main__":
+    unittest.main()
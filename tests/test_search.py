@@ -0,0 +1,69 @@
+
+import sqlite3
+import unittest
+from dataclasses import replace
+
+from auto_data import InvalidInputError, NameIndex
+from support import AUTOS, MODES, CatalogTestCase
+
+
+class SearchNamesTest(CatalogTestCase):
+    """search_names() finds names by word prefix, substring or with typos, and follows the catalog."""
+
+    def test_modes(self):
+        for mode, options in MODES.items():
+            with self.subTest(mode):
+                auto_sells = self.open_catalog(f"{mode}.db", fill=True, **options)
+                self.assertEqual(auto_sells.search_names("auto", "kia"), ["Kia Rio", "Kia Sportage"])
+                self.assertEqual(auto_sells.search_names("auto", "RAV"), ["Toyota RAV4"])  # a later word
+                self.assertEqual(auto_sells.search_names("city", "мос"), ["Москва"])
+                self.assertEqual(auto_sells.search_names("automarket", "моторс"), ["Казань Моторс"])
+                self.assertEqual(auto_sells.search_names("auto", "ota", "substring"), ["Toyota RAV4", "Toyota Camry"])
+                self.assertEqual(auto_sells.search_names("auto", "o", "substring", limit=1), ["Toyota RAV4"])
+                self.assertEqual(auto_sells.search_names("auto", "Toyta", "fuzzy"), ["Toyota RAV4", "Toyota Camry"])
+                self.assertEqual(auto_sells.search_names("auto", "Lda", "fuzzy"), ["Lada Vesta", "Lada Granta"])
+                self.assertEqual(auto_sells.search_names("city", "Казнь", "fuzzy"), ["Казань"])
+                self.assertEqual(auto_sells.search_names("auto", "Volvo", "fuzzy"), [])
+
+    def test_follows_adds_and_deletes(self):
+        for mode, options in MODES.items():
+            with self.subTest(mode):
+                auto_sells = self.open_catalog(f"{mode}.db", fill=True, **options)
+                auto_sells.search_names("auto", "kia")  # builds the indexes
+                auto_sells.add_auto(replace(AUTOS[1], pk_auto=7))  # a second Kia Rio
+                auto_sells.add_auto(replace(AUTOS[1], pk_auto=8, name="Kia Ceed"))
+                self.assertEqual(auto_sells.search_names("auto", "kia"), ["Kia Rio", "Kia Ceed", "Kia Sportage"])
+                conn = sqlite3.connect(self.path(f"{mode}.db"))
+                conn.execute("DELETE FROM Autos WHERE pk_auto IN (2, 4)")
+                conn.commit()
+                conn.close()
+                auto_sells.refresh()
+                self.assertEqual(auto_sells.search_names("auto", "kia"), ["Kia Rio", "Kia Ceed"])
+
+    def test_invalid_arguments(self):
+        auto_sells = self.open_catalog(fill=True)
+        for args in (("model", "kia"), ("auto", "kia", "regex"), ("auto", "  "), ("auto", None),
+                     ("auto", "kia", "prefix", 0)):
+            with self.assertRaises(InvalidInputError):
+                auto_sells.search_names(*args)
+
+
+class NameIndexTest(unittest.TestCase):
+    """Names are counted per row and leave every lookup once their last row goes."""
+
+    def test_counts(self):
+        index = NameIndex(["Kia Rio", "kia rio", "Lada Vesta"])
+        self.assertEqual(len(index), 2)
+        index.remove("KIA RIO")
+        self.assertEqual(index.fuzzy("kai", 5), ["Kia Rio"])  # shown as first added
+        index.remove("Kia Rio")
+        index.remove("Kia Rio")  # already gone
+        self.assertNotIn("kia rio", index)
+        for mode in ("prefix", "substring", "fuzzy"):
+            self.assertEqual(getattr(index, mode)("ki", 5), [])
+        index.remove("Lada Vesta")
+        self.assertEqual((index._starts, index._grams, index._pairs), ([], {}, {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from http.client import HTTPConnection
+from unittest import mock
+
+from auto_data import AutoSells
+from auto_server import AutoServer, execute, run_batch
+from benchmarks.generate import generate_catalog
+
+BIG = 10 ** 20  # Past SQLite's 64-bit integers
+
+
+class ExecuteTest(unittest.TestCase):
+    """execute() answers every bad request with a JSON error and a status, never an exception."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.auto_sells = AutoSells(generate_catalog(os.path.join(cls.tmp, "catalog.db"), 2000, seed=3), lazy=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.auto_sells.close()
+        shutil.rmtree(cls.tmp)
+
+    def assertStatus(self, status: int, operation: str, **params):
+        result = execute(self.auto_sells, operation, params)
+        self.assertEqual(result[0], status, f"{operation} {params}: {result[1]}")
+        if status >= 400:
+            self.assertIsInstance(result[1]["error"], str)
+        return result[1]
+
+    def test_ok(self):
+        self.assertEqual(len(self.assertStatus(200, "find_cheapest_autos", count="5")), 5)
+        self.assertStatus(200, "top_autos", by="city", key=1, count=3, most_expensive="true")
+        self.assertStatus(200, "query", first_year="2010", order_by="-price", limit=10)
+
+    def test_request_errors(self):
+        self.assertStatus(404, "no_such_operation")
+        self.assertStatus(400, "find_cheapest_autos", count=5, color="red")
+        self.assertStatus(400, "find_autos_by_year")
+        self.assertStatus(400, "find_autos_by_year", year="twenty")
+        self.assertStatus(400, "find_autos_by_year", year=True)
+        self.assertStatus(400, "top_autos", by="city", key=1, most_expensive="maybe")
+        self.assertStatus(400, "find_cheapest_autos", count=-1)
+        self.assertStatus(404, "find_autos_by_city", city_name="Нет такого")
+
+    def test_integers_out_of_range(self):
+        for value in (BIG, str(BIG), -BIG):
+            self.assertStatus(400, "find_autos_by_year", year=value)
+            self.assertStatus(400, "price_stats", by="city", key=value)
+            self.assertStatus(400, "top_autos", by="city", key=1, count=value)
+            self.assertStatus(400, "find_cheapest_autos", count=value)
+
+    def test_non_finite_floats(self):
+        for value in ("nan", "inf", "-Infinity", float("nan"), float("inf")):
+            self.assertStatus(400, "find_autos_by_price_range", min_price=value, max_price=1e6)
+            self.assertStatus(400, "find_autos_by_price_range", min_price=0, max_price=value)
+            self.assertStatus(400, "query", min_price=value)
+
+    def test_unexpected_error(self):
+        with mock.patch.object(self.auto_sells, "find_cheapest_autos", side_effect=RuntimeError("boom")), \
+                redirect_stdout(io.StringIO()) as out:
+            self.assertStatus(500, "find_cheapest_autos", count=5)
+        self.assertIn("boom", out.getvalue())
+
+    def test_http_keeps_serving_after_errors(self):
+        server = AutoServer(self.auto_sells, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        conn = HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+        try:
+            for path, status in ((f"/find_autos_by_year?year={BIG}", 400), (f"/top_autos?by=city&key={BIG}", 400),
+                                 ("/find_cheapest_autos?count=2", 200)):
+                conn.request("GET", path)
+                response = conn.getresponse()
+                self.assertEqual(response.status, status, path)
+                json.loads(response.read())
+        finally:
+            conn.close()
+            server.shutdown()
+            server.server_close()
+
+
+class RunBatchTest(unittest.TestCase):
+    """A failing line of a batch gets its own error record and the rest still runs."""
+
+    LINES = ['{"op": "query", "params": {"first_year": 0, "limit": 2}}',
+             'not json',
+             '{"op": "find_autos_by_year", "params": {"year": %d}}' % BIG,
+             '{"op": "boom"}',
+             '{"op": "query", "params": "first_year"}',
+             '',
+             '{"op": "find_cheapest_autos", "params": {"count": 3}}']
+    STATUSES = {1: 200, 2: 400, 3: 400, 4: 404, 5: 400, 7: 200}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.auto_sells = AutoSells(generate_catalog(os.path.join(cls.tmp, "catalog.db"), 2000, seed=3))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.auto_sells.close()
+        shutil.rmtree(cls.tmp)
+
+    def _run(self, workers: int, output_format: str = "jsonl"):
+        out = io.StringIO()
+        summary = run_batch(self.auto_sells, self.LINES, out, output_format, workers)
+        return summary, out.getvalue()
+
+    def test_errors_per_line(self):
+        for workers in (1, 3):
+            summary, output = self._run(workers)
+            records = [json.loads(line) for line in output.splitlines()]
+            self.assertEqual({record["line"]: record["status"] for record in records}, self.STATUSES)
+            self.assertEqual(len(records[0]["result"]), 2)
+            self.assertEqual(len(records[-1]["result"]), 3)
+            self.assertEqual((summary["queries"], summary["errors"]), (6, 4))
+
+    def test_csv(self):
+        summary, output = self._run(1, "csv")
+        self.assertEqual(len(output.splitlines()), 1 + len(self.STATUSES))
+        self.assertEqual(summary["errors"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from auto_data import AutoSells, BaseError
+from auto_shards import ShardedAutoSells, split_database
+from benchmarks.generate import generate_catalog
+
+
+class ShardParityTest(unittest.TestCase):
+    """A sharded catalog answers like the single database it was split from."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        source = generate_catalog(os.path.join(cls.tmp, "source.db"), 3000, seed=5)
+        paths = [os.path.join(cls.tmp, f"shard{n}.db") for n in range(3)]
+        split_database(source, paths)
+        cls.single = AutoSells(source, lazy=True)
+        cls.sharded = ShardedAutoSells(paths, processes=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.sharded.close()
+        cls.single.close()
+        shutil.rmtree(cls.tmp)
+
+    def assertParity(self, method: str, *args, **kwargs):
+        results = []
+        for catalog in (self.single, self.sharded):
+            try:
+                results.append(getattr(catalog, method)(*args, **kwargs))
+            except BaseError as e:
+                results.append(type(e))
+        self.assertEqual(results[1], results[0], f"{method}{args}{kwargs}")
+        return results[0]
+
+    def test_query(self):
+        self.assertTrue(self.assertParity("query", limit=100))
+        self.assertEqual(self.assertParity("query", order_by=""), self.assertParity("query"))
+        for order_by in ("price", "-price", "year_of_release", "-year_of_release", "-pk_auto"):
+            self.assertTrue(self.assertParity("query", price=(1e6, 3e6), order_by=order_by, limit=40))
+        self.assertParity("query", city="Москва", years=(2015, None), order_by="price")
+        self.assertParity("query", order_by="color")
+        self.assertParity("query", order_by="-")
+
+    def test_find(self):
+        self.assertParity("find_cheapest_autos", 20)
+        self.assertParity("find_most_expensive_autos", 20)
+        self.assertParity("find_autos_by_year", 2018)
+        self.assertParity("find_autos_by_city", "Москва")
+
+    def test_similar(self):
+        self.assertParity("similar_autos", 10)
+        self.assertParity("similar_autos", 10, 5, 0.5)
+        self.assertParity("similar_autos", 10, same_city=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
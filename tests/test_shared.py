@@ -0,0 +1,70 @@
+
+import multiprocessing
+import os
+import unittest
+from dataclasses import replace
+
+from auto_data import AutoSells, InvalidInputError
+from support import AUTOS, CatalogTestCase
+
+
+class SharedReader(AutoSells):
+    """Its own instance registry, so a test process can hold a publisher and a reader of one database."""
+
+
+def cheapest_in_child(db_path: str, name: str, results):
+    auto_sells = AutoSells(db_path, shared=name)
+    results.put([auto.pk_auto for auto in auto_sells.find_cheapest_autos(3)])
+    auto_sells.close()
+
+
+class SharedCatalogTest(CatalogTestCase):
+    """Readers map the published generation and move to the next one on refresh()."""
+
+    def setUp(self):
+        super().setUp()
+        self.name = f"ast{os.getpid()}.{self._testMethodName[5:12]}"
+        self.publisher = self.open_catalog(fill=True)
+
+    def open_reader(self, **options) -> AutoSells:
+        reader = SharedReader(self.path(), shared=self.name, **options)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_generations(self):
+        self.assertEqual(self.publisher.publish_shared(self.name), 1)
+        reader = self.open_reader()
+        self.assertEqual(reader.find_autos_by_city("Казань"), AUTOS[4:6])
+        self.assertEqual(reader.query(order_by="price", limit=2), [AUTOS[4], AUTOS[0]])
+        added = replace(AUTOS[4], pk_auto=7, price=1e5)
+        self.publisher.add_auto(added)
+        self.assertEqual(reader.refresh(), 0)  # not published yet
+        self.assertEqual(self.publisher.publish_shared(self.name), 2)
+        self.assertEqual(reader.refresh(), 1)
+        self.assertEqual(reader.find_cheapest_autos(2), [added, AUTOS[4]])
+        self.assertEqual(reader.find_autos_by_city("Казань"), AUTOS[4:6] + [added])
+
+    def test_read_only(self):
+        self.publisher.publish_shared(self.name)
+        reader = self.open_reader()
+        with self.assertRaises(InvalidInputError):
+            reader.add_auto(replace(AUTOS[0], pk_auto=7))
+        self.assertNotIn(7, reader.autos)
+        with self.assertRaises(InvalidInputError):
+            SharedReader(self.path("lazy.db"), shared=self.name, lazy=True)
+
+    def test_other_process(self):
+        self.publisher.publish_shared(self.name)
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        for _ in range(2):  # the first reader exiting must not unlink the segments
+            child = context.Process(target=cheapest_in_child, args=(self.path(), self.name, results))
+            child.start()
+            self.assertEqual(results.get(timeout=60), [5, 1, 2])
+            child.join(60)
+            self.assertEqual(child.exitcode, 0)
+        self.assertEqual(self.open_reader().find_cheapest_autos(1), [AUTOS[4]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+
+import io
+import unittest
+from contextlib import redirect_stdout
+from dataclasses import replace
+from unittest import mock
+
+from auto_data import AutoSells, CatalogSnapshot
+from support import AUTOS, CatalogTestCase
+
+SNAPSHOT_MODES = {"eager": {}, "columnar": {"columnar": True}}
+
+
+class SnapshotTest(CatalogTestCase):
+    """A catalog started from a snapshot answers like one loaded from the database and stays writable."""
+
+    def save_snapshot(self, name: str = "catalog.db") -> str:
+        auto_sells = self.open_catalog(name, fill=True)
+        snapshot = auto_sells.save_snapshot(self.path(name + ".snapshot"))
+        auto_sells.close()
+        return snapshot
+
+    def open_from_snapshot(self, name: str = "catalog.db", **options) -> AutoSells:
+        with mock.patch.object(AutoSells, "_load_data", side_effect=AssertionError("loaded the database")):
+            return self.open_catalog(name, snapshot=self.path(name + ".snapshot"), **options)
+
+    def test_round_trip(self):
+        for mode, options in SNAPSHOT_MODES.items():
+            with self.subTest(mode):
+                self.save_snapshot(f"{mode}.db")
+                auto_sells = self.open_from_snapshot(f"{mode}.db", **options)
+                self.assertEqual(dict(auto_sells.autos.items()), {auto.pk_auto: auto for auto in AUTOS})
+                self.assertEqual(auto_sells.find_autos_by_city("Казань"), AUTOS[4:6])
+                self.assertEqual(auto_sells.find_autos_by_year(2021), [AUTOS[0], AUTOS[2], AUTOS[5]])
+                self.assertEqual(auto_sells.find_cheapest_autos(2), [AUTOS[4], AUTOS[0]])
+                self.assertEqual(auto_sells.query(automarket="Рольф", order_by="-price"), [AUTOS[2], AUTOS[3]])
+                added = replace(AUTOS[0], pk_auto=7, price=1e5)
+                auto_sells.add_auto(added)  # the copied arrays grow in place
+                self.assertEqual(auto_sells.find_cheapest_autos(1), [added])
+
+    def test_changes_since_the_snapshot_are_applied(self):
+        self.save_snapshot()
+        added = replace(AUTOS[1], pk_auto=7, price=5e6)
+        writer = self.open_catalog()
+        writer.add_auto(added)
+        writer.close()
+        auto_sells = self.open_from_snapshot()
+        self.assertEqual(auto_sells.find_most_expensive_autos(1), [added])
+        self.assertEqual(len(auto_sells.autos), len(AUTOS) + 1)
+
+    def test_damaged_snapshot_is_replaced(self):
+        snapshot = self.save_snapshot()
+        with open(snapshot, "r+b") as f:
+            f.truncate(100)
+        with self.assertRaises(ValueError):
+            CatalogSnapshot.read(snapshot)
+        with redirect_stdout(io.StringIO()) as out:
+            auto_sells = self.open_catalog(snapshot=snapshot)
+        self.assertIn("Ignoring snapshot", out.getvalue())
+        self.assertEqual(len(auto_sells.autos), len(AUTOS))
+        header, arrays = CatalogSnapshot.read(snapshot)  # saved again after loading the database
+        self.assertEqual(list(arrays["pks"]), [auto.pk_auto for auto in AUTOS])
+        self.assertEqual(header["counts"], [2, 3, len(AUTOS)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+
+import sqlite3
+import time
+import unittest
+from unittest import mock
+
+from auto_data import AutoSells, DatabaseError, InvalidInputError
+from support import AUTOS, AUTOMARKETS, CITIES, CatalogTestCase
+
+
+class WriteBehindTest(CatalogTestCase):
+    """add_*() answer from memory at once; the rows reach the database in grouped commits."""
+
+    def stored(self, name: str = "catalog.db") -> int:
+        conn = sqlite3.connect(self.path(name))
+        try:
+            return conn.execute("SELECT (SELECT count(*) FROM Cities) + (SELECT count(*) FROM AutoMarkets)"
+                                " + (SELECT count(*) FROM Autos)").fetchone()[0]
+        finally:
+            conn.close()
+
+    def add_all(self, auto_sells: AutoSells):
+        for item, add in ([(city, auto_sells.add_city) for city in CITIES]
+                          + [(market, auto_sells.add_automarket) for market in AUTOMARKETS]
+                          + [(auto, auto_sells.add_auto) for auto in AUTOS]):
+            add(item)
+
+    def test_flush(self):
+        auto_sells = self.open_catalog(write_behind=True, flush_interval=None)
+        self.add_all(auto_sells)
+        self.assertEqual(auto_sells.find_autos_by_city("Казань"), AUTOS[4:6])
+        self.assertEqual(self.stored(), 0)
+        self.assertEqual(auto_sells.flush(), 11)
+        self.assertEqual(self.stored(), 11)
+        self.assertEqual(auto_sells.flush(), 0)
+
+    def test_flush_rows(self):
+        auto_sells = self.open_catalog(write_behind=True, flush_rows=4, flush_interval=None)
+        self.add_all(auto_sells)
+        self.assertEqual(self.stored(), 8)  # two groups of four, three rows still queued
+
+    def test_flush_interval(self):
+        auto_sells = self.open_catalog(write_behind=True, flush_interval=0.01)
+        self.add_all(auto_sells)
+        deadline = time.monotonic() + 10
+        while self.stored() < 11 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.stored(), 11)
+
+    def test_close_flushes(self):
+        auto_sells = self.open_catalog(write_behind=True, flush_interval=None)
+        self.add_all(auto_sells)
+        auto_sells.close()
+        self.assertEqual(self.stored(), 11)
+        self.assertEqual(dict(self.open_catalog().autos), {auto.pk_auto: auto for auto in AUTOS})
+
+    def test_failed_flush_keeps_the_rows(self):
+        auto_sells = self.open_catalog(write_behind=True, flush_interval=None)
+        self.add_all(auto_sells)
+        with mock.patch.object(auto_sells._pool, "transaction", side_effect=sqlite3.OperationalError("disk I/O")):
+            with self.assertRaises(DatabaseError):
+                auto_sells.flush()
+        self.assertEqual(self.stored(), 0)
+        self.assertEqual(auto_sells.flush(), 11)
+        self.assertEqual(self.stored(), 11)
+
+    def test_bulk_and_reads_see_queued_rows(self):
+        auto_sells = self.open_catalog(write_behind=True, flush_interval=None)
+        for city in CITIES:
+            auto_sells.add_city(city)
+        result = auto_sells.add_automarkets_bulk(AUTOMARKETS)  # flushes the queued cities first
+        self.assertEqual(result.inserted, 3)
+        self.assertEqual(self.stored(), 5)
+
+    def test_options(self):
+        with self.assertRaises(InvalidInputError):
+            AutoSells(self.path("lazy.db"), lazy=True, write_behind=True)
+        for options in ({"flush_rows": 0}, {"flush_interval": 0}):
+            with self.assertRaises(InvalidInputError):
+                AutoSells(self.path("options.db"), write_behind=True, **options)
+
+
+if __name__ == "__main__":
+    unittest.main()